@@ -1,22 +1,33 @@
-import matplotlib.pyplot as plt
+import sys
+import time
+# Started before the other imports so that --profile-startup times them
+from startupProfile import StartupProfile
+startup_profile = StartupProfile("--profile-startup" in sys.argv)
+import collections
 import json
-import csv
 import random
 import threading
-import time
-import matplotlib
 import logging
-import sys
 from PyQt6 import QtCore, QtGui, QtWidgets
-from matplotlib.backends.backend_qt import NavigationToolbar2QT as NavigationToolbar
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
-from matplotlib.figure import Figure
-from motorController import MotorController
-from arduinoController import ArduinoController
+# matplotlib, the plot backends and the device controllers are imported
+# where they are first used, so the window is not kept waiting for them
+from sequenceCache import SequenceCache
+from sequenceCheckpoint import SequenceCheckpoint
+from sequenceCompiler import SequenceCompiler, Step
+from sequenceEngine import SequenceEngine, SequenceSimulator
+from sequenceWatcher import SequenceFileWatcher, SequenceSpool
+from timingReport import SequenceTimingRecorder
+from pressureRecorder import PressureRecorder
+from recordingReplay import RecordingReplay
+from livePlot import LivePlot
+from macroSettings import (MOTOR_MACRO_PATH, POSITION_RANGE, TIMER_RANGE, VALVE_MACRO_PATH,
+                           VALVE_STATES, motor_macro_settings, read_motor_macros,
+                           read_valve_macros, valve_macro_settings)
+from calibration import default_calibration, load_calibration
+from recordingFormat import BINARY_EXTENSION, CSV_EXTENSION, export_csv, is_recording_path, recover
 from pathlib import Path
 import os
 os.environ['MPLCONFIGDIR'] = str(Path.home())+"/.matplotlib/"
-matplotlib.use('QtAgg')
 
 
 class Ui_MainWindow(object):
@@ -28,6 +39,11 @@ class Ui_MainWindow(object):
         # how frequently the valve states are checked (ms)
         self.valveCheckInterval = 100
 
+        # Valve states written by the abort path, and the time allowed to
+        # confirm them by readback (ms)
+        self.abort_valve_states = [0, 0, 0, 0, 0, 0, 0, 0]
+        self.abort_budget_ms = 300
+
         # List of valve settings for each step type
         self.valve_settings = {
             'd': [0, 0, 0, 0, 0, 2, 2, 2],
@@ -93,13 +109,12 @@ class Ui_MainWindow(object):
         # Initialise the prev valve states
         self.previous_valve_states = [0, 0, 0, 0, 0, 2, 2, 2]
 
-        self.macro_editor = ValveMacroEditor(self)
-        self.macro_editor.load_data()
-        self.macro_settings = self.macro_editor.get_macro_data_dict()
+        # The editors are only built when first opened, the settings are read straight from their files
+        self.macro_editor = None
+        self.macro_settings = ValveMacroEditor.read_settings()
 
-        self.motor_macro_editor = MotorMacroEditor(self)
-        self.motor_macro_editor.load_data()
-        self.motor_macro_settings = self.motor_macro_editor.get_macro_data_dict()
+        self.motor_macro_editor = None
+        self.motor_macro_settings = MotorMacroEditor.read_settings()
 
         self.motor_connected = False
 
@@ -117,9 +132,55 @@ class Ui_MainWindow(object):
         # Bool to track pressure reading saving
         self.saving = False
 
+        # Extension of new recordings, .csv for text or .prec for binary
+        self.recording_extension = CSV_EXTENSION
+
         # Default save path
         self.default_save_path = os.path.join("C:\\", "ssbubble")
 
+        # Gauge calibration, applied when plotting and stored with recordings
+        self.calibration_path = os.path.join(self.default_save_path, "calibration.json")
+        self.pressure_calibration = load_calibration(
+            self.calibration_path) or default_calibration()
+
+        # GUI settings kept between runs
+        self.settings_path = os.path.join(self.default_save_path, "settings.json")
+
+        # Live plot backend, "matplotlib" or the faster "pyqtgraph"
+        self.plot_backend = self.load_settings().get("plot_backend", "matplotlib")
+
+        # Seconds between recording commits, each one costs an fsync
+        self.recording_fsync_interval = PressureRecorder.FSYNC_INTERVAL_S
+
+        # Writes pressure recordings from a background thread, and journals
+        # open recordings so a crash can be recovered from on the next start
+        self.pressure_recorder = PressureRecorder(
+            fsync_interval=self.recording_fsync_interval,
+            journal_path=os.path.join(self.default_save_path, "recording_journal.json"))
+
+        # Watches for the sequence file Prospa writes in automatic mode
+        self.sequence_watcher = SequenceFileWatcher(
+            os.path.join(self.default_save_path, "sequence.txt"), MainWindow)
+        self.sequence_watcher.sequence_ready.connect(
+            self.on_sequence_file_ready)
+
+        # Spool directory for queueing several numbered sequences back to back
+        self.sequence_spool = SequenceSpool(
+            os.path.join(self.default_save_path, "spool"), MainWindow)
+        self.sequence_spool.sequence_ready.connect(
+            self.on_sequence_file_ready)
+
+        # Compiled sequences waiting to run, as (path, CompiledSequence)
+        self.sequence_queue = collections.deque()
+
+        # Parses sequence files into steps
+        self.sequence_compiler = SequenceCompiler(
+            self.step_types, self.valve_settings)
+
+        # Repeat submissions of the same sequence skip the compiler
+        self.sequence_cache = SequenceCache(
+            self.sequence_compiler, os.path.join(self.default_save_path, "sequence_cache"))
+
         # Array for storing sequence steps
         self.steps = []
 
@@ -128,6 +189,9 @@ class Ui_MainWindow(object):
 
         # Array for keeping track of valve states
         self.valveStates = [0, 0, 0, 0, 0, 0, 0, 0]
+        # Valve state read queued on the worker, and the callbacks waiting for it
+        self.valve_states_requested = False
+        self.valve_state_callbacks = []
 
         # QTimer for updating the sequence step and time display
         self.stepTimer = QtCore.QTimer()
@@ -138,8 +202,30 @@ class Ui_MainWindow(object):
         self.bubbleTimer.setSingleShot(True)
         self.bubbleTimer.timeout.connect(self.bubble_timeout)
 
-        # Bool that avoids "Step complete" message on sequence init
-        self.seq_new = True
+        # Shows the plot's render statistics in the status bar
+        self.statusTimer = QtCore.QTimer()
+        self.statusTimer.timeout.connect(self.update_status_bar)
+        self.statusTimer.start(1000)
+
+        # Step engine for the running sequence, created by load_sequence
+        self.sequence_engine = None
+
+        # Position of the running sequence, kept so it can be resumed after a
+        # disconnect or restart
+        self.sequence_checkpoint = SequenceCheckpoint(
+            os.path.join(self.default_save_path, "sequence_checkpoint.json"))
+        self.resume_step = 0
+
+        # Travel limit (mm) checked by dry runs, None to skip the check
+        self.motor_max_travel = None
+
+        # Coil readback interval (ms) used for sequence timing reports
+        self.timing_readback_interval = 20
+        self.timing_recorder = None
+
+        # Replay of a recorded run, only while the Arduino is disconnected
+        self.replay = None
+        self.replay_steps = 0
 
         # Ensure the prospa file is removed - prospa must be activated once gui already open
         # self.delete_sequence_file()
@@ -898,6 +984,93 @@ class Ui_MainWindow(object):
         self.editValveMacroAction.setObjectName("editValveMacroAction")
         self.motorMacroMenu.addAction(self.editValveMacroAction)
         self.menuBar.addAction(self.motorMacroMenu.menuAction())
+        self.sequenceMenu = QtWidgets.QMenu(parent=self.menuBar)
+        self.sequenceMenu.setObjectName("sequenceMenu")
+        self.dryRunAction = QtGui.QAction(parent=MainWindow)
+        self.dryRunAction.setObjectName("dryRunAction")
+        self.sequenceMenu.addAction(self.dryRunAction)
+        self.timingReportAction = QtGui.QAction(parent=MainWindow)
+        self.timingReportAction.setObjectName("timingReportAction")
+        self.timingReportAction.setCheckable(True)
+        self.sequenceMenu.addAction(self.timingReportAction)
+        self.abortSequenceAction = QtGui.QAction(parent=MainWindow)
+        self.abortSequenceAction.setObjectName("abortSequenceAction")
+        self.abortSequenceAction.setShortcutContext(
+            QtCore.Qt.ShortcutContext.ApplicationShortcut)
+        self.sequenceMenu.addAction(self.abortSequenceAction)
+        self.menuBar.addAction(self.sequenceMenu.menuAction())
+        self.recordingMenu = QtWidgets.QMenu(parent=self.menuBar)
+        self.recordingMenu.setObjectName("recordingMenu")
+        self.binaryRecordingAction = QtGui.QAction(parent=MainWindow)
+        self.binaryRecordingAction.setObjectName("binaryRecordingAction")
+        self.binaryRecordingAction.setCheckable(True)
+        self.recordingMenu.addAction(self.binaryRecordingAction)
+        self.exportRecordingAction = QtGui.QAction(parent=MainWindow)
+        self.exportRecordingAction.setObjectName("exportRecordingAction")
+        self.recordingMenu.addAction(self.exportRecordingAction)
+        self.recordingMenu.addSeparator()
+        self.replayAction = QtGui.QAction(parent=MainWindow)
+        self.replayAction.setObjectName("replayAction")
+        self.recordingMenu.addAction(self.replayAction)
+        self.replayPauseAction = QtGui.QAction(parent=MainWindow)
+        self.replayPauseAction.setObjectName("replayPauseAction")
+        self.replayPauseAction.setCheckable(True)
+        self.replayPauseAction.setEnabled(False)
+        self.recordingMenu.addAction(self.replayPauseAction)
+        self.replayStepAction = QtGui.QAction(parent=MainWindow)
+        self.replayStepAction.setObjectName("replayStepAction")
+        self.replayStepAction.setEnabled(False)
+        self.recordingMenu.addAction(self.replayStepAction)
+        self.replayStopAction = QtGui.QAction(parent=MainWindow)
+        self.replayStopAction.setObjectName("replayStopAction")
+        self.replayStopAction.setEnabled(False)
+        self.recordingMenu.addAction(self.replayStopAction)
+        self.replaySpeedMenu = QtWidgets.QMenu(parent=self.recordingMenu)
+        self.replaySpeedMenu.setObjectName("replaySpeedMenu")
+        self.replaySpeedGroup = QtGui.QActionGroup(MainWindow)
+        self.replaySpeedActions = {}
+        for speed in (1, 10, 100, 1000):
+            action = QtGui.QAction(parent=MainWindow)
+            action.setObjectName(f"replaySpeed{speed}Action")
+            action.setCheckable(True)
+            action.setChecked(speed == 1)
+            self.replaySpeedGroup.addAction(action)
+            self.replaySpeedMenu.addAction(action)
+            self.replaySpeedActions[speed] = action
+        self.recordingMenu.addMenu(self.replaySpeedMenu)
+        self.menuBar.addAction(self.recordingMenu.menuAction())
+        self.plotMenu = QtWidgets.QMenu(parent=self.menuBar)
+        self.plotMenu.setObjectName("plotMenu")
+        self.plotWindowMenu = QtWidgets.QMenu(parent=self.plotMenu)
+        self.plotWindowMenu.setObjectName("plotWindowMenu")
+        self.plotWindowGroup = QtGui.QActionGroup(MainWindow)
+        self.plotWindowActions = {}
+        for seconds in LivePlot.WINDOWS_S:
+            action = QtGui.QAction(parent=MainWindow)
+            action.setObjectName(f"plotWindow{seconds}Action")
+            action.setCheckable(True)
+            action.setChecked(seconds == LivePlot.WINDOWS_S[0])
+            self.plotWindowGroup.addAction(action)
+            self.plotWindowMenu.addAction(action)
+            self.plotWindowActions[seconds] = action
+        self.plotMenu.addMenu(self.plotWindowMenu)
+        self.plotBackendMenu = QtWidgets.QMenu(parent=self.plotMenu)
+        self.plotBackendMenu.setObjectName("plotBackendMenu")
+        self.plotBackendGroup = QtGui.QActionGroup(MainWindow)
+        self.plotBackendActions = {}
+        for backend in ("matplotlib", "pyqtgraph"):
+            action = QtGui.QAction(parent=MainWindow)
+            action.setObjectName(f"{backend}BackendAction")
+            action.setCheckable(True)
+            self.plotBackendGroup.addAction(action)
+            self.plotBackendMenu.addAction(action)
+            self.plotBackendActions[backend] = action
+        self.plotMenu.addMenu(self.plotBackendMenu)
+        self.plotMenu.addSeparator()
+        self.exportPlotAction = QtGui.QAction(parent=MainWindow)
+        self.exportPlotAction.setObjectName("exportPlotAction")
+        self.plotMenu.addAction(self.exportPlotAction)
+        self.menuBar.addAction(self.plotMenu.menuAction())
 
         # Create the graph widgets container
         self.graphContainer = QtWidgets.QWidget(self.centralwidget)
@@ -906,9 +1079,9 @@ class Ui_MainWindow(object):
         self.graphContainer.setStyleSheet(
             "border: 2px Solid LightGray;")  # Add border
 
-        # Create the graph widgets
-        self.figure = Figure()
-        self.sc = RealTimePlot(self)
+        # Create the graph widgets, the plot itself replaces the placeholder once the window is up
+        self.sc = None
+        self.toolbar = None
         self.graphWidget = QtWidgets.QWidget(
             parent=self.centralwidget)
         self.graphWidget.setGeometry(QtCore.QRect(121, 325, 621, 294))
@@ -916,11 +1089,9 @@ class Ui_MainWindow(object):
         self.graphLayout = QtWidgets.QVBoxLayout(self.graphWidget)
         self.graphLayout.setContentsMargins(0, 0, 0, 0)
         self.graphLayout.setObjectName("graphLayout")
-        self.graphLayout.addWidget(self.sc)
-
-        # Create the toolbar and add it to the layout
-        self.toolbar = NavigationToolbar(self.sc, self)
-        self.graphLayout.addWidget(self.toolbar)
+        self.plotPlaceholder = QtWidgets.QLabel("Loading plot...")
+        self.plotPlaceholder.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
+        self.graphLayout.addWidget(self.plotPlaceholder)
 
         # Connect the buttons to their slots
         # QtCore.QMetaObject.connectSlotsByName(MainWindow)
@@ -993,6 +1164,25 @@ class Ui_MainWindow(object):
         # Connect menu actions to their slots
         self.editMotorMacroAction.triggered.connect(self.edit_motor_macro)
         self.editValveMacroAction.triggered.connect(self.edit_valve_macro)
+        self.dryRunAction.triggered.connect(self.dry_run_sequence)
+        self.abortSequenceAction.triggered.connect(self.abort_sequence)
+        self.binaryRecordingAction.toggled.connect(
+            self.on_binaryRecordingAction_toggled)
+        self.exportRecordingAction.triggered.connect(self.export_recording)
+        self.replayAction.triggered.connect(self.start_replay)
+        self.replayPauseAction.toggled.connect(self.on_replayPauseAction_toggled)
+        self.replayStepAction.triggered.connect(self.step_replay)
+        self.replayStopAction.triggered.connect(self.stop_replay)
+        for speed, action in self.replaySpeedActions.items():
+            action.triggered.connect(
+                lambda checked, speed=speed: self.set_replay_speed(speed))
+        for seconds, action in self.plotWindowActions.items():
+            action.triggered.connect(
+                lambda checked, seconds=seconds: self.sc.set_window(seconds))
+        for backend, action in self.plotBackendActions.items():
+            action.triggered.connect(
+                lambda checked, backend=backend: self.set_plot_backend(backend))
+        self.exportPlotAction.triggered.connect(self.export_plot_image)
 
         self.retranslateUi(MainWindow)
         self.update_controls()
@@ -1074,6 +1264,46 @@ class Ui_MainWindow(object):
             _translate("MainWindow", "Edit Motor Macros"))
         self.editValveMacroAction.setText(_translate(
             "MainWindow", "Edit Valve Macros"))
+        self.sequenceMenu.setTitle(_translate("MainWindow", "Sequence"))
+        self.dryRunAction.setText(
+            _translate("MainWindow", "Dry Run Sequence..."))
+        self.timingReportAction.setText(
+            _translate("MainWindow", "Record Timing Report"))
+        self.abortSequenceAction.setText(
+            _translate("MainWindow", "Abort Sequence"))
+        self.abortSequenceAction.setShortcut(
+            _translate("MainWindow", "Ctrl+Shift+A"))
+        self.recordingMenu.setTitle(_translate("MainWindow", "Recording"))
+        self.binaryRecordingAction.setText(
+            _translate("MainWindow", "Save as Binary (.prec)"))
+        self.exportRecordingAction.setText(
+            _translate("MainWindow", "Export Binary Recording to CSV..."))
+        self.replayAction.setText(
+            _translate("MainWindow", "Replay Recording..."))
+        self.replayPauseAction.setText(
+            _translate("MainWindow", "Pause Replay"))
+        self.replayStepAction.setText(
+            _translate("MainWindow", "Step Replay Frame"))
+        self.replayStepAction.setShortcut(
+            _translate("MainWindow", "Ctrl+Right"))
+        self.replayStopAction.setText(
+            _translate("MainWindow", "Stop Replay"))
+        self.replaySpeedMenu.setTitle(
+            _translate("MainWindow", "Replay Speed"))
+        for speed, action in self.replaySpeedActions.items():
+            action.setText(_translate("MainWindow", f"{speed}x"))
+        self.plotMenu.setTitle(_translate("MainWindow", "Plot"))
+        self.plotWindowMenu.setTitle(_translate("MainWindow", "Window"))
+        self.plotBackendMenu.setTitle(_translate("MainWindow", "Backend"))
+        self.plotBackendActions["matplotlib"].setText(
+            _translate("MainWindow", "Matplotlib"))
+        self.plotBackendActions["pyqtgraph"].setText(
+            _translate("MainWindow", "pyqtgraph (fast)"))
+        self.exportPlotAction.setText(
+            _translate("MainWindow", "Export Plot Image..."))
+        for seconds, action in self.plotWindowActions.items():
+            text = f"{seconds // 3600} h" if seconds >= 3600 else f"{seconds // 60} min"
+            action.setText(_translate("MainWindow", f"Last {text}"))
         self.savePathEdit.setText(_translate("MainWindow", "C:\\ssbubble"))
         self.resetButton.setText(_translate("MainWindow", "Reset"))
         self.buildPressureButton.setText(
@@ -1113,8 +1343,15 @@ class Ui_MainWindow(object):
             pass
         if self.watchdog != None:
             self.watchdog.stop()
+        self.sequence_watcher.stop()
+        self.sequence_spool.stop()
+        self.sequence_queue.clear()
+        self.timing_recorder = None
         self.ardConnected = False
         self.valveStates = [0, 0, 0, 0, 0, 0, 0, 0]
+        # A read still queued is never answered once disconnected
+        self.valve_states_requested = False
+        self.valve_state_callbacks.clear()
         self.update_valve_button_states()
         self.ardWarningLabel.setText("Connection closed")
         self.ardWarningLabel.setStyleSheet("color: red")
@@ -1122,8 +1359,12 @@ class Ui_MainWindow(object):
 
     def on_ardConnectButton_clicked(self):
         """Handle Arduino connection/disconnection."""
+        # The plot and step display belong to the device once it connects
+        self.stop_replay()
         if self.ardConnected:
             # If Arduino is already connected, stop the worker and disconnect
+            # A deliberate disconnect abandons the running sequence
+            self.sequence_checkpoint.clear()
             self.disconnect_ard()
 
         # If no mode is selected, display a warning
@@ -1212,87 +1453,65 @@ class Ui_MainWindow(object):
         # Check the connection
         if self.ardConnected:
             if not self.motor_flag or (self.motor_worker.motor.serial_connected and self.motor_worker.calibrated):
-                # Get the current time
-                current_time = time.perf_counter()
-
-                # Initialize last_update_time if it doesn't exist
-                if not hasattr(self, 'last_update_time'):
-                    self.last_update_time = current_time
-
-                # Calculate elapsed time in milliseconds
-                # Convert to milliseconds
-                elapsed_time = (current_time - self.last_update_time) * 1000
-
-                # Update last_update_time
-                self.last_update_time = current_time
-
-                # Increment time trackers by elapsed time
-                self.sequence_running_time += elapsed_time
-                self.step_running_time += elapsed_time
+                # Get the current time in milliseconds
+                current_time = time.perf_counter() * 1000
+
+                # Start the sequence on the first call, then move it on
+                if not self.sequence_engine.started:
+                    transitions = self.sequence_engine.start(
+                        current_time, self.resume_step)
+                    self.resume_step = 0
+                else:
+                    transitions = self.sequence_engine.advance(current_time)
+
+                # Send the commands for every event now due, on every track
+                self.apply_transitions(transitions)
+
+                # Close off the sequence that just ended, once its last events
+                # are sent and recorded, whether or not another follows
+                if self.sequence_engine.finished:
+                    logging.info("Step complete")
+                    self.record_event("sequence", {"state": "complete"})
+                    end_time = self.sequence_engine.end_time
+                    final_valves = self.sequence_engine.compiled.final_valves
+                    self.finish_timing_report()
+                    # Each sequence gets its own recording
+                    if self.saving:
+                        self.on_beginSaveButton_clicked()
+                    # Chain straight into the next queued sequence with no gap
+                    if self.sequence_queue and self.chain_next_sequence(final_valves):
+                        transitions = self.sequence_engine.start(end_time)
+                        transitions += self.sequence_engine.advance(
+                            current_time)
+                        self.apply_transitions(transitions)
+
+                # Check if the sequence is complete, with nothing chained after it
+                if self.sequence_engine.finished:
+                    self.ardWarningLabel.setText("Sequence complete")
+                    self.ardWarningLabel.setStyleSheet("color: green")
+                    self.currentStepTypeEdit.setText("")
+                    self.stepsRemainingLabel.setText("Steps: 0")
+                    self.stepsTimeRemainingLabel.setText("Time: 0.00")
+                    self.currentStepTimeEdit.setText("0.00")
+
+                    # Stop the timer to prevent this function from recurring
+                    self.stepTimer.stop()
+                    self.sequence_checkpoint.clear()
+                    return
+
+                # Record the position for a resume after a disconnect
+                engine = self.sequence_engine
+                self.sequence_checkpoint.update(
+                    current_time, engine.compiled.key, engine.index,
+                    current_time - engine.start_time -
+                    engine.step_starts[engine.index],
+                    self.save_path if self.saving else "")
 
                 # Update the time labels
                 self.currentStepTimeEdit.setText(
-                    f"{(self.current_step_time - self.step_running_time) / 1000:.2f}")
+                    f"{self.sequence_engine.step_remaining(current_time) / 1000:.2f}")
                 self.stepsTimeRemainingLabel.setText(
-                    f"Time: {(self.total_sequence_time - self.sequence_running_time) / 1000:.2f}")
-
-                # Check if the current step is complete
-                if self.step_running_time >= self.current_step_time:
-                    # Check if sequence has been initialized
-                    if self.seq_new == True:
-                        self.seq_new = False
-                    # If not, step is complete
-                    else:
-                        logging.info("Step complete")
-
-                    # Reset the step timer
-                    self.step_running_time = 0
-
-                    # Check if there are more steps
-                    if len(self.steps) == 0:
-                        # If not, sequence is complete
-                        self.ardWarningLabel.setText("Sequence complete")
-                        self.ardWarningLabel.setStyleSheet("color: green")
-                        self.currentStepTypeEdit.setText("")
-                        self.stepsRemainingLabel.setText("Steps: 0")
-                        self.stepsTimeRemainingLabel.setText("Time: 0.00")
-                        self.currentStepTimeEdit.setText("0.00")
-
-                        # Stop the timer to prevent this function from recurring
-                        self.stepTimer.stop()
-
-                        # Stop saving at the end of the sequence
-                        if self.saving:
-                            self.on_beginSaveButton_clicked()
-
-                        # Reset sequence init flag
-                        self.seq_new = True
-                        return
-                    else:
-                        # Get the next step
-                        self.current_step = self.steps.pop(0)
-                        # Get the key values
-                        self.current_step_time = self.current_step.time_length
-                        self.current_step_type = self.current_step.step_type
-                        # Update the labels
-                        self.currentStepTypeEdit.setText(
-                            self.step_types[self.current_step_type])
-
-                        self.stepsRemainingLabel.setText(
-                            f"Steps: {len(self.steps) + 1}")
-
-                        # Update the valves with new step state
-                        self.arduino_worker.set_valve_signal.emit(
-                            self.valve_settings[self.current_step_type])
-
-                        # Update the motor position if motor_flag is True
-                        if self.motor_flag and self.current_step.motor_position >= 0:
-                            self.motor_worker.command_signal.emit(
-                                self.current_step.motor_position)
-
-                        # Log the step type and time
-                        logging.info(f"Step {self.step_types[self.current_step_type]} for {
-                            self.current_step_time} ms")
+                    f"Time: {self.sequence_engine.sequence_remaining(current_time) / 1000:.2f}")
             else:
                 # If motor is not ready, stop the timer and reset all labels
                 logging.error("Motor not connected and calibrated")
@@ -1317,187 +1536,497 @@ class Ui_MainWindow(object):
             # Stop saving if it was started
             if self.saving:
                 self.on_beginSaveButton_clicked()
-
-            # Reset sequence init flag
-            self.seq_new = True
             return
 
         # Recur the function every 10ms until sequence is over
         self.stepTimer.start(10)
 
+    def apply_transitions(self, transitions):
+        """Send the commands for a list of sequence events, on every track."""
+        for transition in transitions:
+            if transition.track == "motor":
+                self.apply_motor_event(transition)
+            else:
+                self.apply_step_transition(transition)
+
+    def apply_step_transition(self, transition):
+        """Send the valve commands for a new step and update the labels."""
+        if transition.index > 0:
+            logging.info("Step complete")
+        self.current_step = transition.step
+        step_name = self.step_types[transition.step.step_type]
+
+        # Update the labels
+        self.currentStepTypeEdit.setText(step_name)
+        self.stepsRemainingLabel.setText(
+            f"Steps: {self.sequence_engine.steps_remaining}")
+
+        self.record_event("step", {"index": transition.index,
+                                   "type": transition.step.step_type,
+                                   "length": transition.step.time_length,
+                                   "scheduled": transition.time})
+
+        # Update the valves, steps that change nothing need no write
+        if transition.valves is not None:
+            self.arduino_worker.set_valve_signal.emit(transition.valves)
+            if self.timing_recorder is not None:
+                self.timing_recorder.command(
+                    transition.index, transition.step.step_type, transition.time,
+                    self.sequence_engine.start_time + transition.time,
+                    time.perf_counter() * 1000, transition.valves)
+
+        # Log the step type and time
+        logging.info(
+            f"Step {step_name} for {transition.step.time_length} ms")
+
+    def apply_motor_event(self, event):
+        """Move the motor for an event on the sequence's motor track."""
+        self.motor_worker.command_signal.emit(event.value)
+        offset = event.time - self.sequence_engine.step_starts[event.index]
+        if offset > 0:
+            logging.info(f"Motor to {event.value} mm, {offset} ms into step")
+
     def calculate_sequence_time(self):
         """Calculate the total time of the sequence."""
-        self.sequence_running_time = -10/1000
-        self.step_running_time = -10/1000
-        self.total_sequence_time = 0
-        self.current_step_time = 0
-        for step in self.steps:
-            self.total_sequence_time += step.time_length
+        self.total_sequence_time = self.sequence_engine.compiled.total_time
         logging.info(f"Sequence length is {self.total_sequence_time} ms")
 
+    def dry_run_sequence(self):
+        """Simulate a sequence file on a virtual clock without touching the hardware."""
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self.centralwidget,
+            "Select Sequence File",
+            self.default_save_path,
+            "Sequence Files (*.txt)"
+        )
+        if not path:
+            return
+        compiled = self.sequence_cache.compile_file(path)
+        if compiled is None:
+            logging.error("Dry run: error loading sequence file")
+            return
+        speedup, ok = QtWidgets.QInputDialog.getDouble(
+            self.centralwidget, "Dry Run", "Speed-up (0 = instant):", 0, 0, 100000, 1)
+        if not ok:
+            return
+
+        current_position = None
+        if self.motor_connected:
+            try:
+                current_position = float(self.curMotorPosEdit.text())
+            except ValueError:
+                pass
+        self.simulator = SequenceSimulator(
+            compiled,
+            motor_start=current_position if current_position is not None else 0,
+            max_travel_mm=self.motor_max_travel)
+        self.simulator.transition.connect(self.on_dry_run_transition)
+        self.simulator.finished.connect(self.on_dry_run_finished)
+        logging.info(f"Dry run of {os.path.basename(path)}")
+        self.simulator.run(speedup if speedup > 0 else None)
+
+    def on_dry_run_transition(self, transition):
+        if self.simulator.speedup is None:
+            return
+        if transition.track == "motor":
+            logging.info(
+                f"[dry run] {transition.time / 1000:.2f} s: Motor to {transition.value} mm")
+        else:
+            logging.info(
+                f"[dry run] {transition.time / 1000:.2f} s: Step {self.step_types[transition.step.step_type]} for {transition.step.time_length} ms")
+
+    def on_dry_run_finished(self, report):
+        for line in report.summary():
+            logging.info(line)
+
     @QtCore.pyqtSlot()
     def find_file(self):
-        self.file_timer = QtCore.QTimer()
-        self.file_timer.timeout.connect(self.find_file)
-        if os.path.exists(r"C:\ssbubble\sequence.txt"):
-            logging.info("Sequence file found")
-            if (self.load_sequence()):
-                logging.info("Sequence loaded successfully")
-                logging.info("Starting sequence")
-                # Calculate time to show on the labels
-                self.calculate_sequence_time()
-                self.currentStepTypeEdit.setText(
-                    self.step_types[self.steps[0].step_type])
-                # logging.info(f"Step {self.steps[0].step_type} for {self.steps[0].time_length} ms")
+        """Wait for Prospa to write the sequence file or spool more sequences."""
+        if self.ardConnected:
+            self.resume_sequence()
+            logging.info("Waiting for sequence file...")
+            self.sequence_watcher.start()
+            self.sequence_spool.start()
+
+    @QtCore.pyqtSlot(str)
+    def on_sequence_file_ready(self, path):
+        """Compile a sequence once a watcher reports a complete file and queue it."""
+        if not self.ardConnected:
+            return
+        logging.info(f"Sequence file found: {os.path.basename(path)}")
+        compiled = self.sequence_cache.compile_file(path)
+        if compiled is None:
+            self.sequence_load_failed(path)
+            return
+        self.sequence_queue.append((path, compiled))
 
-                # Tell prospa that sequence was loaded successfully and is now running
-                self.write_to_prospa(True)
-                self.delete_sequence_file()
+        if self.stepTimer.isActive():
+            # Preloaded, starts as soon as the running sequence finishes
+            logging.info(
+                f"Sequence queued, {len(self.sequence_queue)} waiting")
+        else:
+            # Read the coils so the first step is resolved against the real state
+            self.update_valve_states(self.start_queued_sequence)
 
-                # Update valve states for current step and start recurring timer
-                self.update_step()
+    def start_queued_sequence(self, valve_states):
+        """Start the next queued sequence once the coils have been read."""
+        # Another sequence may have started, or the device gone, while the read was queued
+        if self.stepTimer.isActive() or not self.ardConnected:
+            return
+        if not self.chain_next_sequence(valve_states):
+            return
+        logging.info("Starting sequence")
+        self.start_sequence()
 
-                # Update the UI
-                self.UIUpdateArdConnection()
-                self.ardWarningLabel.setText("Sequence running")
-            else:
-                self.write_to_prospa(False)
-                self.delete_sequence_file()
+    def start_sequence(self):
+        """Run the loaded sequence."""
+        self.currentStepTypeEdit.setText(
+            self.step_types[self.steps[self.resume_step].step_type])
 
-                self.disconnect_ard()
+        # Update valve states for current step and start recurring timer
+        self.update_step()
 
-                # Update the UI
-                self.ardWarningLabel.setText(
-                    "Error loading sequence file")
-                self.ardWarningLabel.setStyleSheet("color: red")
-                logging.error("Error loading sequence file")
+        # Update the UI
+        self.UIUpdateArdConnection()
+        self.ardWarningLabel.setText("Sequence running")
 
-                # Stop the arduino worker
-                self.ardConnected = False
-                self.arduino_worker.stop()
-                self.UIUpdateArdConnection()
+    def on_binaryRecordingAction_toggled(self, checked):
+        self.recording_extension = BINARY_EXTENSION if checked else CSV_EXTENSION
 
-            self.file_timer.stop()
+    def export_recording(self):
+        """Convert a binary recording to the csv layout."""
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self.centralwidget, "Export Binary Recording", self.default_save_path,
+            "Binary Recordings (*.prec)")
+        if not path:
+            return
+        try:
+            csv_path = export_csv(path)
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not export recording: {e}")
+            return
+        logging.info(f"Recording exported to {csv_path}")
+
+    def start_replay(self):
+        """Replay a recorded run through the plot and step display."""
+        if self.ardConnected:
+            logging.info("Disconnect the Arduino to replay a recording")
+            return
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self.centralwidget, "Replay Recording", self.default_save_path,
+            "Recordings (*.prec *.csv *.manifest.json)")
+        if not path:
+            return
+        self.stop_replay()
+        self.replay = RecordingReplay(path, self)
+        self.replay.samples_ready.connect(self.on_replay_samples)
+        self.replay.event_ready.connect(self.on_replay_event)
+        self.replay.finished.connect(self.on_replay_finished)
+        for speed, action in self.replaySpeedActions.items():
+            if action.isChecked():
+                self.replay.set_speed(speed)
+        self.sc.clear()
+        self.replayPauseAction.setChecked(False)
+        for action in (self.replayPauseAction, self.replayStepAction, self.replayStopAction):
+            action.setEnabled(True)
+        self.ardWarningLabel.setText("Replaying")
+        self.ardWarningLabel.setStyleSheet("color: blue")
+        logging.info(f"Replaying {os.path.basename(path)}")
+        self.replay.play()
+
+    def stop_replay(self):
+        """End the replay, if there is one."""
+        if self.replay is None:
+            return
+        self.replay.stop()
+        self.replay.deleteLater()
+        self.replay = None
+        for action in (self.replayPauseAction, self.replayStepAction, self.replayStopAction):
+            action.setEnabled(False)
+        self.currentStepTypeEdit.setText("")
+        self.stepsRemainingLabel.setText("Steps: 0")
+        self.currentStepTimeEdit.setText("0.00")
+        self.ardWarningLabel.setText("")
+
+    def on_replayPauseAction_toggled(self, checked):
+        if self.replay is None:
+            return
+        if checked:
+            self.replay.pause()
         else:
-            if self.ardConnected:
-                logging.info("Sequence file not found, checking again...")
-                self.file_timer.singleShot(500, self.find_file)
+            self.replay.play()
 
-    def load_sequence(self):
-        """Load a sequence from a file."""
+    def step_replay(self):
+        if self.replay is not None:
+            self.replayPauseAction.setChecked(True)
+            self.replay.step_frame()
 
-        try:
-            # Get the file path
-            self.steps = []  # initialise steps
-            with open(r"C:\ssbubble\sequence.txt", "r") as f:
-                # sequence format is a long string e.g. d100e200f400
-                raw_sequence = f.readlines()
-
-                # Check if the sequence file is empty
-                if not raw_sequence:
-                    logging.error("Sequence file is empty")
-                    return False
+    def set_replay_speed(self, speed):
+        if self.replay is not None:
+            self.replay.set_speed(speed)
 
-                # Get the save path from the second line of the sequence file
-                seq_save_path = raw_sequence[1].strip()
-                sequence_string = raw_sequence[0].strip()
-                i = 0
-
-                # Check for capital 'M' in the sequence string
-                self.motor_flag = False
-                if 'M' in sequence_string:
-                    self.motor_flag = True
-                    sequence_string = sequence_string.replace(
-                        'M', '')  # Remove 'M' from the sequence string
-
-                if self.motor_flag:
-                    try:
-                        if not self.motor_worker.motor.serial_connected or not self.motor_worker.calibrated:
-                            logging.error(
-                                "Sequence requires motor, but motor is not ready")
-                            return False
-                    except Exception as e:
-                        # logging.error(f"Error checking motor status: {e}")
-                        logging.error(
-                            "Sequence requires motor, but motor is not ready")
-                        return False
-
-                # Parse the sequence string
-                while i < len(sequence_string):
-                    # Check for valid step types based on dictionaries in the class (at the top of the file)
-                    if sequence_string[i] in self.step_types.keys():
-                        step_type = sequence_string[i]
-                    else:
-                        logging.error("Invalid step type in sequence file")
-                        return False
-
-                    # Get the time length of the step
-                    i += 1
-                    time_length = ""
-                    while i < len(sequence_string) and sequence_string[i].isdigit():
-                        time_length += sequence_string[i]
-                        i += 1
-                    try:
-                        time_length = int(time_length)
-                    except ValueError:
-                        logging.error("Invalid time length in sequence file")
-                        return False
-                    if time_length <= 0:
-                        logging.error("Invalid time length in sequence file")
-                        return False
-
-                    # Get motor position if motor_flag is True
-                    motor_position = 0
-                    if self.motor_flag and i < len(sequence_string) and sequence_string[i] == 'm':
-                        i += 1
-                        motor_position_str = ""
-                        # Check for negative sign
-                        if i < len(sequence_string) and sequence_string[i] == '-':
-                            motor_position_str += sequence_string[i]
-                            i += 1
-                        # Collect digits
-                        while i < len(sequence_string) and sequence_string[i].isdigit():
-                            motor_position_str += sequence_string[i]
-                            i += 1
-                        try:
-                            motor_position = int(motor_position_str)
-                        except ValueError:
-                            logging.error(
-                                "Invalid motor position in sequence file")
-                            return False
-
-                    # Create a step object and add it to the list
-                    step = Step(step_type, time_length, motor_position)
-                    # logging.info("Step loaded: " + str(step.step_type) + " " + str(step.time_length))
-                    self.steps.append(step)
-
-                # Automatically start saving at sequence start
-                if self.saving == False:
-                    # Get the save path from the sequence file
-                    if len(seq_save_path) > 1:    # Look for save path in second line of seqeunce file
-                        if seq_save_path.endswith('.csv'):
-                            self.savePathEdit.setText(seq_save_path)
-                        else:   # Add timestamped csv to the file path if no file specified
-                            self.savePathEdit.setText(os.path.join(
-                                seq_save_path, f"pressure_data_{time.strftime('%m%d-%H%M')}.csv").replace("/", "\\"))
-                    else:
-                        # If no save path is specified, use the default path
-                        self.savePathEdit.setText(
-                            os.path.join(self.default_save_path, f"pressure_data_{time.strftime('%m%d-%H%M')}.csv").replace("/", "\\"))
-
-                    # Simulate save button click
-                    self.on_beginSaveButton_clicked()
+    @QtCore.pyqtSlot(list)
+    def on_replay_samples(self, samples):
+        self.sc.append_samples(samples)
+        self.sc.redraw()
+
+    @QtCore.pyqtSlot(str, object)
+    def on_replay_event(self, kind, data):
+        """Show a recorded event the way the live run showed it."""
+        if kind == "step":
+            self.currentStepTypeEdit.setText(
+                self.step_types.get(data["type"], data["type"]))
+            self.currentStepTimeEdit.setText(f"{data['length'] / 1000:.2f}")
+            self.stepsRemainingLabel.setText(
+                f"Steps: {max(self.replay_steps - data['index'], 0)}")
+        elif kind == "valves":
+            self.valveStates = list(data)
+            self.update_valve_button_states()
+        elif kind == "sequence":
+            if data["state"] == "start":
+                self.replay_steps = data["steps"]
+            logging.info(f"Replay: sequence {data['state']}")
+        elif kind == "motor":
+            logging.info(f"Replay: motor {data}")
+        elif kind == "macro":
+            logging.info(f"Replay: {data['type']} macro {data['number']}")
+        elif kind == "recovery":
+            logging.warning("Replay: recording was interrupted here")
+
+    def on_replay_finished(self):
+        logging.info("Replay finished")
+        self.ardWarningLabel.setText("Replay finished")
+        self.replayPauseAction.setEnabled(False)
+        self.replayStepAction.setEnabled(False)
+
+    def abort_sequence(self):
+        """Stop the running sequence and put the valves and motor in a safe state."""
+        if not self.ardConnected:
+            logging.info("Arduino not connected")
+            return
+        start = time.perf_counter()
+        self.stepTimer.stop()
 
-            return True
+        # Hardware first, bypassing the signal queue
+        confirmed = self.arduino_worker.abort(
+            self.abort_valve_states, self.abort_budget_ms)
+        valve_time = (time.perf_counter() - start) * 1000
+        if self.motor_connected:
+            self.motor_worker.abort()
+        total_time = (time.perf_counter() - start) * 1000
+
+        if not confirmed:
+            logging.error(
+                f"Abort could not confirm the safe valve states ({valve_time:.0f} ms)")
+        elif valve_time > self.abort_budget_ms:
+            logging.warning(
+                f"Safe valve states confirmed in {valve_time:.0f} ms, over the {self.abort_budget_ms} ms budget")
+        else:
+            logging.info(
+                f"Safe valve states confirmed in {valve_time:.0f} ms")
+        logging.info(f"Sequence aborted in {total_time:.0f} ms")
+        self.record_event("sequence", {"state": "aborted"})
+        self.record_event(
+            "valves", list(self.arduino_worker.controller.valve_states))
+
+        # Then tidy up the run
+        self.finish_timing_report()
+        self.sequence_checkpoint.clear()
+        self.reject_queued_sequences()
+        if self.saving:
+            self.on_beginSaveButton_clicked()
+        self.valveStates = list(self.arduino_worker.controller.valve_states)
+        self.update_valve_button_states()
+        self.currentStepTypeEdit.setText("")
+        self.stepsRemainingLabel.setText("Steps: 0")
+        self.currentStepTimeEdit.setText("0.00")
+        self.stepsTimeRemainingLabel.setText("Time: 0.00")
+        self.ardWarningLabel.setText("Sequence aborted")
+        self.ardWarningLabel.setStyleSheet("color: red")
 
-        except FileNotFoundError:
-            logging.error("Sequence file not found")
-            return False
+    def reject_queued_sequences(self):
+        """Tell Prospa that sequences waiting behind an aborted run will not start."""
+        while self.sequence_queue:
+            path, _ = self.sequence_queue.popleft()
+            if path == self.sequence_watcher.path:
+                self.write_to_prospa(False)
+                self.delete_sequence_file()
+                self.sequence_watcher.start()
+            else:
+                self.sequence_spool.acknowledge(path, False)
 
-        except IOError as e:
-            logging.error(f"Error reading sequence file: {e}")
+    def resume_sequence(self):
+        """Resume a sequence interrupted by a disconnect or restart from its checkpoint."""
+        checkpoint = self.sequence_checkpoint.load()
+        if checkpoint is None:
+            return False
+        compiled = self.sequence_cache.get(checkpoint["key"])
+        step = checkpoint["step"]
+        if compiled is None or not 0 <= step < len(compiled.steps):
+            logging.error("Interrupted sequence is no longer cached, cannot resume")
+            self.sequence_checkpoint.clear()
             return False
 
+        # Completed steps are skipped, the interrupted step is run again in full
+        self.update_valve_states(
+            lambda valve_states: self.resume_from_checkpoint(compiled, checkpoint, valve_states))
+        return True
+
+    def resume_from_checkpoint(self, compiled, checkpoint, valve_states):
+        """Start a checkpointed sequence once the coils have been read."""
+        if not self.ardConnected:
+            return
+        step = checkpoint["step"]
+        self.resume_step = step
+        if not self.load_sequence(compiled, valve_states, checkpoint.get("save_path", "")):
+            self.resume_step = 0
+            return
+        logging.info(
+            f"Resuming interrupted sequence at step {step + 1} of {len(compiled.steps)}")
+        self.start_sequence()
+
+    def chain_next_sequence(self, initial_valves):
+        """Make the next queued sequence the active one and acknowledge it."""
+        while self.sequence_queue and self.ardConnected:
+            path, compiled = self.sequence_queue.popleft()
+            if self.load_sequence(compiled, initial_valves):
+                logging.info(
+                    f"Sequence {os.path.basename(path)} loaded successfully")
+                # Calculate time to show on the labels
+                self.calculate_sequence_time()
+                self.acknowledge_sequence(path)
+                return True
+            self.sequence_load_failed(path)
+        return False
+
+    def acknowledge_sequence(self, path):
+        """Tell Prospa that a sequence was loaded successfully and is now running."""
+        if path == self.sequence_watcher.path:
+            self.write_to_prospa(True)
+            self.delete_sequence_file()
+            # Ready for the next hand-off
+            self.sequence_watcher.start()
+        else:
+            self.sequence_spool.acknowledge(path, True)
+
+    def sequence_load_failed(self, path):
+        """Reject a sequence that could not be compiled or started."""
+        if path != self.sequence_watcher.path:
+            # A bad spooled file should not stop the rest of the queue
+            logging.error(
+                f"Error loading spooled sequence {os.path.basename(path)}, skipping")
+            self.sequence_spool.acknowledge(path, False)
+            return
+
+        self.write_to_prospa(False)
+        self.delete_sequence_file()
+
+        self.disconnect_ard()
+
+        # Update the UI
+        self.ardWarningLabel.setText(
+            "Error loading sequence file")
+        self.ardWarningLabel.setStyleSheet("color: red")
+        logging.error("Error loading sequence file")
+
+        # Stop the arduino worker
+        self.ardConnected = False
+        self.arduino_worker.stop()
+        self.UIUpdateArdConnection()
+
+    def load_sequence(self, compiled, initial_valves, resume_save_path=""):
+        """Make a compiled sequence the active one, starting from the given coil states."""
+        self.motor_flag = compiled.motor_flag
+        if self.motor_flag:
+            try:
+                if not self.motor_worker.motor.serial_connected or not self.motor_worker.calibrated:
+                    logging.error(
+                        "Sequence requires motor, but motor is not ready")
+                    return False
+            except Exception as e:
+                # logging.error(f"Error checking motor status: {e}")
+                logging.error(
+                    "Sequence requires motor, but motor is not ready")
+                return False
+
+        self.steps = list(compiled.steps)
+        compiled.resolve_valves(initial_valves)
+        logging.info(
+            f"{len(compiled.valve_writes)} valve writes for {len(compiled.steps)} steps")
+        self.sequence_engine = SequenceEngine(compiled)
+
+        # Automatically start saving at sequence start
+        if self.saving == False:
+            # Get the save path from the sequence file
+            seq_save_path = compiled.save_path
+            if resume_save_path:
+                # Record the rest of a resumed run next to the interrupted file
+                self.savePathEdit.setText(self.unique_save_path(
+                    f"{os.path.splitext(resume_save_path)[0]}_resumed"))
+            elif len(seq_save_path) > 1:    # Look for save path in second line of seqeunce file
+                if is_recording_path(seq_save_path):
+                    self.savePathEdit.setText(seq_save_path)
+                else:   # Add timestamped csv to the file path if no file specified
+                    self.savePathEdit.setText(
+                        self.timestamped_save_path(seq_save_path))
+            else:
+                # If no save path is specified, use the default path
+                self.savePathEdit.setText(
+                    self.timestamped_save_path(self.default_save_path))
+
+            # Simulate save button click
+            self.on_beginSaveButton_clicked()
+        self.record_event("sequence", {"state": "start",
+                                       "key": compiled.key,
+                                       "steps": len(compiled.steps),
+                                       "total_time": compiled.total_time})
+
+        if self.timingReportAction.isChecked():
+            self.timing_recorder = SequenceTimingRecorder(
+                self.timing_readback_interval)
+            self.arduino_worker.start_readback(self.timing_readback_interval)
+
+        return True
+
+    @QtCore.pyqtSlot(float, list)
+    def on_coil_readback(self, timestamp, states):
+        if self.timing_recorder is not None:
+            self.timing_recorder.observe(timestamp, states)
+
+    def finish_timing_report(self):
+        """Stop the coil readback and write the timing report for the sequence that just ended."""
+        if self.timing_recorder is None:
+            return
+        self.arduino_worker.stop_readback()
+        recorder = self.timing_recorder
+        self.timing_recorder = None
+        # The report sits next to the pressure file recorded for the sequence
+        if self.saving:
+            pressure_path = self.save_path
+        else:
+            pressure_path = self.timestamped_save_path(self.default_save_path)
+        report_path = recorder.write_report(pressure_path)
+        if report_path is not None:
+            stats = recorder.summary()
+            if stats["observed"]:
+                logging.info(
+                    f"Timing: mean {stats['mean_ms']:.1f} ms, p99 {stats['p99_ms']:.1f} ms, max {stats['max_ms']:.1f} ms, jitter {stats['max_jitter_ms']:.1f} ms")
+            logging.info(f"Timing report saved to {report_path}")
+
+    def timestamped_save_path(self, directory):
+        """Timestamped csv path that does not overwrite an earlier run in the same minute."""
+        return self.unique_save_path(os.path.join(
+            directory, f"pressure_data_{time.strftime('%m%d-%H%M')}"))
+
+    def unique_save_path(self, stem):
+        """Recording path built from stem, numbered if it would overwrite an existing file."""
+        path = f"{stem}{self.recording_extension}"
+        n = 1
+        while os.path.exists(path):
+            path = f"{stem}_{n}{self.recording_extension}"
+            n += 1
+        return path.replace("/", "\\")
+
     def write_to_prospa(self, start):
         """Write the file to Prospa."""
         if start:
@@ -1510,8 +2039,7 @@ class Ui_MainWindow(object):
     def delete_sequence_file(self):
         """Delete the sequence file that Prospa makes."""
         try:
-            os.remove(r"C:\ssbubble\sequence.txt")
-            pass
+            os.remove(self.sequence_watcher.path)
         except FileNotFoundError:
             pass
 
@@ -1542,17 +2070,45 @@ class Ui_MainWindow(object):
             self.manualRadioButton.setEnabled(False)
             self.ardWarningLabel.setText("Connected")
             self.ardWarningLabel.setStyleSheet("color: green")
+        self.replayAction.setEnabled(not self.ardConnected)
         self.update_controls()
 
-    """Update the valve states with a thread safe call."""
+    def update_valve_states(self, callback=None):
+        """
+        Ask the Arduino worker to read the valve states, without waiting for them.
 
-    def update_valve_states(self):
-        # Event loop ensures that state is updated before continuing
-        loop = QtCore.QEventLoop()
-        self.arduino_worker.valve_states_updated.connect(loop.quit)
-        QtCore.QMetaObject.invokeMethod(
-            self.arduino_worker, "get_valve_states", QtCore.Qt.ConnectionType.QueuedConnection)
-        loop.exec()
+        The states arrive through on_valve_states_updated(). Until then
+        valveStates holds the states last read or written, and every write
+        refreshes it through on_valve_states_written(), so handlers act on
+        it straight away. Requests made while a read is queued share that
+        read.
+
+        Args:
+            callback: Called with the states once read, for code that needs
+                the coils as they are now
+        """
+        if callback is not None:
+            self.valve_state_callbacks.append(callback)
+        if self.valve_states_requested or getattr(self, "arduino_worker", None) is None:
+            return
+        self.valve_states_requested = True
+        self.arduino_worker.get_valve_signal.emit()
+
+    @QtCore.pyqtSlot(list)
+    def on_valve_states_written(self, states):
+        """Take valve states written by the Arduino worker, a pending read still follows."""
+        self.valveStates = list(states)
+        self.update_valve_button_states()
+
+    @QtCore.pyqtSlot(list)
+    def on_valve_states_updated(self, states):
+        """Take valve states read by the Arduino worker and pass them to the waiting callbacks."""
+        self.valve_states_requested = False
+        self.valveStates = list(states)
+        self.update_valve_button_states()
+        callbacks, self.valve_state_callbacks = self.valve_state_callbacks, []
+        for callback in callbacks:
+            callback(list(states))
 
     """Toggle valve 1"""
 
@@ -1674,16 +2230,16 @@ class Ui_MainWindow(object):
     """
 
     def on_pressure1RadioButton_clicked(self):
-        pass
+        self.sc.redraw()
 
     def on_pressure2RadioButton_clicked(self):
-        pass
+        self.sc.redraw()
 
     def on_pressure3RadioButton_clicked(self):
-        pass
+        self.sc.redraw()
 
     def on_pressure4RadioButton_clicked(self):
-        pass
+        self.sc.redraw()
 
     """Opens a file dialog to select the save path."""
 
@@ -1697,9 +2253,9 @@ class Ui_MainWindow(object):
         """
         self.save_path, _ = QtWidgets.QFileDialog.getOpenFileName(
             self.savePathEdit,
-            "Select CSV File",
+            "Select Recording File",
             self.savePathEdit.text(),
-            "CSV Files (*.csv)"
+            "Recordings (*.csv *.prec)"
         )
 
         if self.save_path:
@@ -1707,7 +2263,7 @@ class Ui_MainWindow(object):
             self.savePathEdit.setText(self.save_path)
         else:
             self.savePathEdit.setText(os.path.join(
-                self.default_save_path, f"pressure_data_{time.strftime('%m%d-%H%M')}.csv").replace("/", "\\"))
+                self.default_save_path, f"pressure_data_{time.strftime('%m%d-%H%M')}{self.recording_extension}").replace("/", "\\"))
 
     @QtCore.pyqtSlot()
     def on_resetButton_clicked(self):
@@ -1726,7 +2282,7 @@ class Ui_MainWindow(object):
         logging.debug("Quick vent button clicked")
         self.update_valve_states()
         if self.ardConnected:
-            if self.vent_flag or self.sc.p2_data[-1] < 0.1:
+            if self.vent_flag or self.sc.latest_pressure(2) < 0.1:
                 self.quickVentButton.setChecked(False)
                 self.arduino_worker.set_valve_signal.emit(
                     self.previous_valve_states)
@@ -1747,7 +2303,7 @@ class Ui_MainWindow(object):
         logging.debug("Slow vent button clicked")
         self.update_valve_states()
         if self.ardConnected:
-            if self.vent_flag or self.sc.p2_data[-1] < 0.1:
+            if self.vent_flag or self.sc.latest_pressure(2) < 0.1:
                 self.slowVentButton.setChecked(False)
                 self.arduino_worker.set_valve_signal.emit(
                     self.previous_valve_states)
@@ -1770,6 +2326,7 @@ class Ui_MainWindow(object):
         if self.ardConnected:
             if self.saving:
                 self.saving = False
+                self.pressure_recorder.stop()
                 self.beginSaveButton.setChecked(False)
                 self.beginSaveButton.setText("Begin Saving")
             else:
@@ -1850,6 +2407,7 @@ class Ui_MainWindow(object):
     def on_valveMacro1Button_clicked(self):
         logging.debug("Valve macro 1 button clicked")
         if self.ardConnected:
+            self.record_macro_event("valve", "1")
             # Save current valve states
             self.previous_valve_states = self.valveStates.copy()
             # Set the new valve states
@@ -1868,6 +2426,7 @@ class Ui_MainWindow(object):
     def on_valveMacro2Button_clicked(self):
         logging.debug("Valve macro 2 button clicked")
         if self.ardConnected:
+            self.record_macro_event("valve", "2")
             # Save current valve states
             self.previous_valve_states = self.valveStates.copy()
             # Set the new valve states
@@ -1886,6 +2445,7 @@ class Ui_MainWindow(object):
     def on_valveMacro3Button_clicked(self):
         logging.debug("Valve macro 3 button clicked")
         if self.ardConnected:
+            self.record_macro_event("valve", "3")
             # Save current valve states
             self.previous_valve_states = self.valveStates.copy()
             # Set the new valve states
@@ -1904,6 +2464,7 @@ class Ui_MainWindow(object):
     def on_valveMacro4Button_clicked(self):
         logging.debug("Valve macro 4 button clicked")
         if self.ardConnected:
+            self.record_macro_event("valve", "4")
             # Save current valve states
             self.previous_valve_states = self.valveStates.copy()
             # Set the new valve states
@@ -1920,23 +2481,187 @@ class Ui_MainWindow(object):
             self.bubbleTimer.start(timer_duration)
 
     def start_saving(self):
-        if self.savePathEdit.text().endswith(".csv"):
+        if is_recording_path(self.savePathEdit.text()):
             self.save_path = self.savePathEdit.text()
         else:
             self.save_path = os.path.join(
-                self.savePathEdit.text(), f"pressure_data_{time.strftime('%m%d-%H%M')}.csv").replace("/", "\\")
+                self.savePathEdit.text(), f"pressure_data_{time.strftime('%m%d-%H%M')}{self.recording_extension}").replace("/", "\\")
             self.savePathEdit.setText(self.save_path)
+        if self.pressure_recorder.start(
+                self.save_path, ["Pressure 1", "Pressure 2", "Pressure 3", "Pressure 4"],
+                self.pressure_calibration):
+            logging.info(
+                f"Recording with calibration {self.pressure_calibration.id}")
+            self.saving = True
+            return True
+        self.saving = False
+        return False
+
+    def recover_recordings(self):
+        """Close off recordings left unfinished by a crash, keeping everything written intact."""
+        for path in self.pressure_recorder.unfinished_recordings():
+            try:
+                summary = recover(path)
+            except FileNotFoundError:
+                logging.warning(f"Unfinished recording {path} no longer exists")
+            except (OSError, ValueError, KeyError) as e:
+                logging.error(f"Could not recover recording {path}: {e}")
+                continue
+            else:
+                if summary is not None:
+                    logging.warning(
+                        f"Recovered unfinished recording {path}: {summary['samples']} samples kept, {summary['lost_bytes']} bytes discarded")
+            self.pressure_recorder.forget(path)
+
+    def record_event(self, kind, data):
+        """
+        Add an event to the recording being saved, if any.
+
+        Args:
+            kind (str): Event kind, one of recordingFormat.EVENT_KINDS
+            data: JSON-serialisable details of the event
+        """
+        if self.saving:
+            self.pressure_recorder.record_event(
+                time.perf_counter_ns(), kind, data)
+
+    def record_macro_event(self, macro_type, number):
+        """Record that a valve or motor macro was run."""
+        settings = self.macro_settings if macro_type == "valve" else self.motor_macro_settings
+        self.record_event("macro", {"type": macro_type,
+                                    "number": int(number),
+                                    "label": settings.get(number, {}).get("Label", "")})
+
+    def load_settings(self):
+        """
+        Read the GUI settings file.
+
+        Returns:
+            dict: Saved settings, empty if there are none
+        """
         try:
-            with open(self.save_path, "w", newline="") as f:
-                writer = csv.writer(f)
-                writer.writerow(
-                    ["Time", "Pressure 1", "Pressure 2", "Pressure 3", "Pressure 4"])
-                self.saving = True
-                return True
-        except Exception as e:
-            logging.error("Could not open save file")
-            self.saving = False
-            return False
+            with open(self.settings_path, "r") as f:
+                return dict(json.load(f))
+        except FileNotFoundError:
+            return {}
+        except (OSError, json.JSONDecodeError, TypeError, ValueError):
+            logging.error("Discarding unreadable settings file")
+            return {}
+
+    def save_setting(self, key, value):
+        """Store one setting in the GUI settings file."""
+        settings = self.load_settings()
+        settings[key] = value
+        try:
+            directory = os.path.dirname(self.settings_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            with open(self.settings_path, "w") as f:
+                json.dump(settings, f, indent=4)
+        except OSError as e:
+            logging.error(f"Could not save settings: {e}")
+
+    def init_plot(self):
+        """Create the live plot in place of its placeholder."""
+        if self.sc is not None:
+            return
+        self.sc = self.create_plot(self.plot_backend)
+        self.graphLayout.replaceWidget(self.plotPlaceholder, self.sc)
+        self.plotPlaceholder.deleteLater()
+        self.toolbar = self.sc.create_toolbar(self)
+        if self.toolbar is not None:
+            self.graphLayout.addWidget(self.toolbar)
+
+    def create_plot(self, backend, history=None):
+        """
+        Create the live plot widget for a backend.
+
+        Args:
+            backend (str): "matplotlib" or "pyqtgraph"
+            history (MinMaxHistory): Samples to carry over from the current plot
+
+        Returns:
+            The plot, matplotlib if pyqtgraph is not installed
+        """
+        if backend == "pyqtgraph":
+            try:
+                from pyqtgraphPlot import PyqtgraphPlot
+            except ImportError as e:
+                logging.error(f"pyqtgraph plotting unavailable, using matplotlib: {e}")
+            else:
+                plot = PyqtgraphPlot(self, history)
+                self.plotBackendActions["pyqtgraph"].setChecked(True)
+                return plot
+        from matplotlibPlot import RealTimePlot
+        self.plotBackendActions["matplotlib"].setChecked(True)
+        return RealTimePlot(self, history)
+
+    def set_plot_backend(self, backend):
+        """
+        Swap the live plot for one drawn by another backend, keeping its samples.
+
+        Args:
+            backend (str): "matplotlib" or "pyqtgraph"
+        """
+        old = self.sc
+        new = self.create_plot(backend, old.history)
+        if type(new) is type(old):
+            new.stop_rendering()
+            new.deleteLater()
+            return
+        old.stop_rendering()
+        new.set_window(old.window_s)
+        if getattr(self, "arduino_worker", None) is not None:
+            try:
+                self.arduino_worker.data_signal.disconnect(old.update_plot)
+            except TypeError:
+                pass    # The worker was never connected
+            else:
+                self.arduino_worker.data_signal.connect(new.update_plot)
+        self.graphLayout.replaceWidget(old, new)
+        if self.toolbar is not None:
+            self.graphLayout.removeWidget(self.toolbar)
+            self.toolbar.deleteLater()
+        self.toolbar = new.create_toolbar(self)
+        if self.toolbar is not None:
+            self.graphLayout.addWidget(self.toolbar)
+        old.deleteLater()
+        self.sc = new
+        self.plot_backend = new.BACKEND
+        self.save_setting("plot_backend", self.plot_backend)
+        logging.info(f"Plotting with {self.plot_backend}")
+
+    def export_plot_image(self):
+        """Save the plotted window as an image, drawn with matplotlib whichever backend is live."""
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self.centralwidget, "Export Plot Image", self.default_save_path,
+            "Images (*.png *.pdf *.svg)")
+        if not path:
+            return
+        from matplotlib.figure import Figure
+        figure = Figure(figsize=(8, 4))
+        ax = figure.subplots()
+        for color, data in zip(LivePlot.COLORS, self.sc.line_data()):
+            if data is not None:
+                ax.plot(*data, lw=1, color=color)
+        ax.set_xlim(-self.sc.window_s, 0)
+        ax.set_ylim(0, 11)
+        ax.set_xlabel('Time (s)')
+        ax.set_ylabel('mBar')
+        try:
+            figure.savefig(path)
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not export plot: {e}")
+            return
+        logging.info(f"Plot saved to {path}")
+
+    def update_status_bar(self):
+        if self.sc is None:
+            return
+        stats = self.sc.stats()
+        self.statusbar.showMessage(
+            f"Plot {stats['fps']:.0f} fps, render {stats['render_ms']:.1f} ms "
+            f"(max {stats['max_render_ms']:.1f} ms), {stats['dropped']} frames dropped")
 
     def setup_arduino_watchdog(self):
         self.watchdog = QtCore.QTimer()
@@ -2058,36 +2783,42 @@ class Ui_MainWindow(object):
     def on_motorMacro1Button_clicked(self):
         logging.info("Motor macro 1 button clicked")
         if self.motor_connected:
+            self.record_macro_event("motor", "1")
             self.motor_worker.command_signal.emit(
                 self.motor_macro_settings["1"]["Position"])
 
     def on_motorMacro2Button_clicked(self):
         logging.info("Motor macro 2 button clicked")
         if self.motor_connected:
+            self.record_macro_event("motor", "2")
             self.motor_worker.command_signal.emit(
                 self.motor_macro_settings["2"]["Position"])
 
     def on_motorMacro3Button_clicked(self):
         logging.info("Motor macro 3 button clicked")
         if self.motor_connected:
+            self.record_macro_event("motor", "3")
             self.motor_worker.command_signal.emit(
                 self.motor_macro_settings["3"]["Position"])
 
     def on_motorMacro4Button_clicked(self):
         logging.info("Motor macro 4 button clicked")
         if self.motor_connected:
+            self.record_macro_event("motor", "4")
             self.motor_worker.command_signal.emit(
                 self.motor_macro_settings["4"]["Position"])
 
     def on_motorMacro5Button_clicked(self):
         logging.info("Motor macro 5 button clicked")
         if self.motor_connected:
+            self.record_macro_event("motor", "5")
             self.motor_worker.command_signal.emit(
                 self.motor_macro_settings["5"]["Position"])
 
     def on_motorMacro6Button_clicked(self):
         logging.info("Motor macro 6 button clicked")
         if self.motor_connected:
+            self.record_macro_event("motor", "6")
             self.motor_worker.command_signal.emit(
                 self.motor_macro_settings["6"]["Position"])
 
@@ -2105,10 +2836,13 @@ class Ui_MainWindow(object):
                   step.time_length}")
 
     def edit_motor_macro(self):
+        if self.motor_macro_editor is None:
+            self.motor_macro_editor = MotorMacroEditor(self)
         self.motor_macro_editor.exec()
 
     def edit_valve_macro(self):
-        # dialog = ValveMacroEditor(self)
+        if self.macro_editor is None:
+            self.macro_editor = ValveMacroEditor(self)
         self.macro_editor.exec()
 
     def toggle_valve_controls(self, state):
@@ -2328,8 +3062,15 @@ class Ui_MainWindow(object):
             self.arduino_worker.send_command)
         self.arduino_worker.set_valve_signal.connect(
             self.arduino_worker.set_valve_states)
+        # Queued, so a request returns at once and the read runs on a later pass of the event loop
         self.arduino_worker.get_valve_signal.connect(
-            self.arduino_worker.get_valve_states)
+            self.arduino_worker.get_valve_states, QtCore.Qt.ConnectionType.QueuedConnection)
+        self.arduino_worker.valve_states_updated.connect(
+            self.on_valve_states_updated)
+        self.arduino_worker.valve_states_written.connect(
+            self.on_valve_states_written)
+        self.arduino_worker.coil_readback_signal.connect(
+            self.on_coil_readback)
 
     def connect_motor_signals(self):
         self.motor_worker.command_signal.connect(
@@ -2340,13 +3081,6 @@ class Ui_MainWindow(object):
         self.motor_worker.top_signal.connect(self.motor_worker.to_top)
 
 
-class Step:
-    def __init__(self, step_type, time_length, motor_position=0):
-        self.step_type = step_type
-        self.time_length = time_length
-        self.motor_position = motor_position
-
-
 class QTextEditLogger(logging.Handler, QtCore.QObject):  # Console window
     appendPlainText = QtCore.pyqtSignal(str)
 
@@ -2405,49 +3139,30 @@ class MotorMacroEditor(QtWidgets.QDialog):  # Motor Macro Editor
         # Resize the Label column
         self.table.setColumnWidth(1, 130)  # Label column is now index 1
 
-    def load_data(self):
-        json_path = os.path.join("C:\\ssbubble", 'motor_macro_data.json')
-        if os.path.exists(json_path):
-            try:
-                with open(json_path, 'r') as f:
-                    data = json.load(f)
-                for i, macro in enumerate(data):
-                    # Macro No.
-                    item = QtWidgets.QTableWidgetItem(macro["Macro No."])
-                    # Make the item read-only
-                    item.setFlags(item.flags() & ~
-                                  QtCore.Qt.ItemFlag.ItemIsEditable)
-                    self.table.setItem(i, 0, item)
-                    # Label
-                    label_text = macro.get("Label", "")
-                    label_item = QtWidgets.QTableWidgetItem(label_text)
-                    self.table.setItem(i, 1, label_item)
-                    # Position SpinBox
-                    position_spinbox = QtWidgets.QSpinBox()
-                    # Adjust range as needed
-                    position_spinbox.setRange(0, 2500000)
-                    position_val = macro.get("Position", 0)   # Default to 0
-                    position_spinbox.setValue(position_val)
-                    self.table.setCellWidget(i, 2, position_spinbox)
-            except (json.JSONDecodeError, KeyError, IndexError):
-                self.set_default_values()
-        else:
-            self.set_default_values()
+    @staticmethod
+    def read_settings():
+        """
+        Read the macro settings without building the editor.
 
-    def set_default_values(self):
-        for i in range(6):
+        Returns:
+            dict: Settings as get_macro_data_dict() would return them
+        """
+        return motor_macro_settings(read_motor_macros())
+
+    def load_data(self):
+        for i, macro in enumerate(read_motor_macros()):
             # Macro No.
-            item = QtWidgets.QTableWidgetItem(f"Macro {i+1}")
+            item = QtWidgets.QTableWidgetItem(macro["Macro No."])
             # Make the item read-only
             item.setFlags(item.flags() & ~QtCore.Qt.ItemFlag.ItemIsEditable)
             self.table.setItem(i, 0, item)
             # Label
-            label_item = QtWidgets.QTableWidgetItem(f"Motor Macro {i+1}")
+            label_item = QtWidgets.QTableWidgetItem(macro["Label"])
             self.table.setItem(i, 1, label_item)
             # Position SpinBox
             position_spinbox = QtWidgets.QSpinBox()
-            position_spinbox.setRange(0, 2500000)  # Adjust range as needed
-            position_spinbox.setValue(0)  # Default position value
+            position_spinbox.setRange(*POSITION_RANGE)
+            position_spinbox.setValue(macro["Position"])
             self.table.setCellWidget(i, 2, position_spinbox)
 
     def get_macro_data(self):
@@ -2483,7 +3198,7 @@ class MotorMacroEditor(QtWidgets.QDialog):  # Motor Macro Editor
         self.parent.motor_macro_settings = self.get_macro_data_dict()
         # Save data to JSON
         data = self.get_macro_data()
-        json_path = os.path.join("C:\\ssbubble", 'motor_macro_data.json')
+        json_path = MOTOR_MACRO_PATH
         json_dir = os.path.dirname(json_path)
 
         # Ensure the directory exists
@@ -2535,65 +3250,39 @@ class ValveMacroEditor(QtWidgets.QDialog):  # Valve Macro Editor
         # Resize the Timer column
         self.table.setColumnWidth(7, 80)  # Timer column is now index 7
 
-    def load_data(self):
-        json_path = os.path.join("C:\\ssbubble", 'valve_macro_data.json')
-        if os.path.exists(json_path):
-            try:
-                with open(json_path, 'r') as f:
-                    data = json.load(f)
-                for i, macro in enumerate(data):
-                    # Macro No.
-                    item = QtWidgets.QTableWidgetItem(macro["Macro No."])
-                    # Make the item read-only
-                    item.setFlags(item.flags() & ~
-                                  QtCore.Qt.ItemFlag.ItemIsEditable)
-                    self.table.setItem(i, 0, item)
-                    # Label
-                    label_text = macro.get("Label", "")
-                    label_item = QtWidgets.QTableWidgetItem(label_text)
-                    self.table.setItem(i, 1, label_item)
-                    # Valve States
-                    # Only process the first 5 values
-                    # start from column 2
-                    for j, state in enumerate(macro["Valves"][:5], start=2):
-                        combo = QtWidgets.QComboBox()
-                        combo.addItems(["Open", "Closed", "Ignore"])
-                        combo.setCurrentText(state)
-                        self.table.setCellWidget(i, j, combo)
-                    # Timer SpinBox
-                    timer_spinbox = QtWidgets.QDoubleSpinBox()
-                    timer_spinbox.setRange(0.1, 3600)
-                    timer_spinbox.setSingleStep(0.1)
-                    timer_val = macro.get("Timer", 1.0)   # Default to 1 second
-                    timer_spinbox.setValue(timer_val)
-                    # Timer column index is 7
-                    self.table.setCellWidget(i, 7, timer_spinbox)
-            except (json.JSONDecodeError, KeyError, IndexError):
-                self.set_default_values()
-        else:
-            self.set_default_values()
+    @staticmethod
+    def read_settings():
+        """
+        Read the macro settings without building the editor.
 
-    def set_default_values(self):
-        for i in range(4):
+        Returns:
+            dict: Settings as get_macro_data_dict() would return them
+        """
+        return valve_macro_settings(read_valve_macros())
+
+    def load_data(self):
+        for i, macro in enumerate(read_valve_macros()):
             # Macro No.
-            item = QtWidgets.QTableWidgetItem(f"Macro {i+1}")
+            item = QtWidgets.QTableWidgetItem(macro["Macro No."])
             # Make the item read-only
             item.setFlags(item.flags() & ~QtCore.Qt.ItemFlag.ItemIsEditable)
             self.table.setItem(i, 0, item)
             # Label
-            label_item = QtWidgets.QTableWidgetItem("")
+            label_item = QtWidgets.QTableWidgetItem(macro["Label"])
             self.table.setItem(i, 1, label_item)
             # Valve States
-            for j in range(2, 7):  # Columns 2 to 6 for V1 to V5
+            # Only the first 5 valves are shown, starting from column 2
+            for j, state in enumerate(macro["Valves"][:5], start=2):
                 combo = QtWidgets.QComboBox()
-                combo.addItems(["Open", "Closed", "Ignore"])
-                combo.setCurrentIndex(1)  # Default to "Closed"
+                combo.addItems(VALVE_STATES)
+                combo.setCurrentText(state)
                 self.table.setCellWidget(i, j, combo)
             # Timer SpinBox
             timer_spinbox = QtWidgets.QDoubleSpinBox()
-            timer_spinbox.setRange(0.1, 3600)
+            timer_spinbox.setRange(*TIMER_RANGE)
             timer_spinbox.setSingleStep(0.1)
-            timer_spinbox.setValue(1.0)  # Default timer value
+            timer_spinbox.setValue(macro["Timer"])
+            # Timer column index is 7
             self.table.setCellWidget(i, 7, timer_spinbox)
 
     def get_macro_data(self):
@@ -2644,7 +3333,7 @@ class ValveMacroEditor(QtWidgets.QDialog):  # Valve Macro Editor
         self.parent.macro_settings = self.get_macro_data_dict()
         # Save data to JSON
         data = self.get_macro_data()
-        json_path = os.path.join("C:\\ssbubble", 'valve_macro_data.json')
+        json_path = VALVE_MACRO_PATH
         json_dir = os.path.dirname(json_path)
 
         # Ensure the directory exists
@@ -2661,119 +3350,30 @@ class ValveMacroEditor(QtWidgets.QDialog):  # Valve Macro Editor
         super().closeEvent(event)
 
 
-class RealTimePlot(FigureCanvasQTAgg, QtCore.QObject):
-
-    def __init__(self, parent):
-        self.fig, self.ax = plt.subplots()
-        FigureCanvasQTAgg.__init__(self, self.fig)
-        QtCore.QObject.__init__(self)
-
-        self.parent = parent
-        self.max_points = 500
-
-        # Initialize data
-        self.p1_data = []
-        self.p2_data = []
-        self.p3_data = []
-        self.p4_data = []
-        self.x_data = []
-        self.parent = parent
-        # Initialize an empty plot
-        self.line1, = self.ax.plot([], [], lw=2, color="red")
-        # Initialize an empty plot
-        self.line2, = self.ax.plot([], [], lw=2, color="blue")
-        # Initialize an empty plot
-        self.line3, = self.ax.plot([], [], lw=2, color="green")
-        # Initialize an empty plot
-        self.line4, = self.ax.plot([], [], lw=2, color="purple")
-
-        # Set plot limits and labels
-        self.ax.set_xlim(0, self.max_points)
-        self.ax.set_ylim(0, 11)
-        self.ax.set_xlabel('Time')
-        self.ax.set_ylabel('mBar')
-
-    @QtCore.pyqtSlot(list)
-    def update_plot(self, pressure_values):
-        if pressure_values:
-            # Update x_data and y_data with the newest value
-            # Append new x (time) point
-            if self.x_data == []:
-                self.x_data.append(0)
-            else:
-                self.x_data.append(self.x_data[-1] + 1)
-
-            # Limit the x_data size
-            if len(self.x_data) > self.max_points:
-                self.x_data = self.x_data[-self.max_points:]
-
-            # Convert and append new y (pressure) points
-            for i in range(4):
-                pressure_values[i] = (
-                    float(pressure_values[i]) - 203.53) / 0.8248 / 100
-                p_data = getattr(self, f'p{i+1}_data')
-                p_data.append(pressure_values[i])
-
-                # Limit the p_data size
-                if len(p_data) > self.max_points:
-                    setattr(self, f'p{i+1}_data', p_data[-self.max_points:])
-
-            # check this for time lag
-            if self.parent.saving:
-                with open(self.parent.save_path, "a") as f:
-                    f.write(f"{time.strftime('%H:%M:%S')}, {pressure_values[0]}, {
-                            pressure_values[1]}, {pressure_values[2]}, {pressure_values[3]}\n")
-
-            # Check if venting is complete
-            if self.parent.vent_flag:
-                logging.info(f"Pressure 3: {pressure_values[2]}")
-                if pressure_values[2] < 0.1:
-                    logging.info("Venting complete")
-
-            # Update the plot's data without clearing
-            if self.parent.pressure1RadioButton.isChecked():
-                self.line1.set_data(self.x_data, self.p1_data)
-            else:
-                self.line1.set_data([], [])
-            if self.parent.pressure2RadioButton.isChecked():
-                self.line2.set_data(self.x_data, self.p2_data)
-            else:
-                self.line2.set_data([], [])
-            if self.parent.pressure3RadioButton.isChecked():
-                self.line3.set_data(self.x_data, self.p3_data)
-            else:
-                self.line3.set_data([], [])
-            if self.parent.pressure4RadioButton.isChecked():
-                self.line4.set_data(self.x_data, self.p4_data)
-            else:
-                self.line4.set_data([], [])
-
-            # Adjust limits if necessary
-            if len(self.x_data) >= self.max_points:
-                self.ax.set_xlim(self.x_data[0], self.x_data[-1])
-            # Ensure y lim
-            self.ax.set_ylim(0, 11)
-
-            # Redraw the canvas with the new data
-            self.draw()
-
-
 class ArduinoWorker(QtCore.QThread):
     # Signal to send data to the main thread
     data_signal = QtCore.pyqtSignal(list)
     command_signal = QtCore.pyqtSignal(str)
     set_valve_signal = QtCore.pyqtSignal(list)
     get_valve_signal = QtCore.pyqtSignal()
-    valve_states_updated = QtCore.pyqtSignal()
+    # Coil states read by get_valve_states, and states written by set_valve_states
+    valve_states_updated = QtCore.pyqtSignal(list)
+    valve_states_written = QtCore.pyqtSignal(list)
+    # Timestamp (perf_counter ms) and coil states of a timing readback
+    coil_readback_signal = QtCore.pyqtSignal(float, list)
 
     def __init__(self, parent, port, mode, verbose):
         super().__init__()
+        # The serial libraries load on the first connection, not at startup
+        from arduinoController import ArduinoController
         self.controller = ArduinoController(
             port=port, mode=mode, verbose=verbose)
         self.running = True
         self.parent = parent
         self.timer = QtCore.QTimer()
         self.timer.timeout.connect(self.poll_readings)
+        self.readback_thread = None
+        self.readback_stop = threading.Event()
         self.mutex = QtCore.QMutex()
 
     def run(self):
@@ -2785,8 +3385,47 @@ class ArduinoWorker(QtCore.QThread):
 
     def stop_timer(self):
         self.timer.stop()
+        self.stop_readback()
+
+    def start_readback(self, interval):
+        """
+        Read the valve coils every interval ms for sequence timing reports.
+
+        The reads run on their own thread, so they never block the GUI.
+        Each one holds the mutex for a single transaction, so valve writes
+        and pressure polls wait at most one coil read.
+
+        Args:
+            interval (int): Readback interval (ms)
+        """
+        self.stop_readback()
+        self.readback_stop = threading.Event()
+        self.readback_thread = threading.Thread(
+            target=self.read_coils, args=(interval / 1000, self.readback_stop),
+            name="CoilReadback", daemon=True)
+        self.readback_thread.start()
+
+    def stop_readback(self):
+        self.readback_stop.set()
+        if self.readback_thread is not None:
+            self.readback_thread.join(timeout=1.0)
+            self.readback_thread = None
+
+    def read_coils(self, interval, stop):
+        due = time.perf_counter()
+        while not stop.is_set() and self.controller.serial_connected:
+            with QtCore.QMutexLocker(self.mutex):
+                sent = time.perf_counter()
+                states = self.controller.get_valve_states()
+                # Take the middle of the transaction as the sample time
+                timestamp = (sent + time.perf_counter()) / 2 * 1000
+            self.coil_readback_signal.emit(timestamp, list(states))
+            # Keep to the interval, skipping reads missed behind a slow transaction
+            due = max(due + interval, time.perf_counter())
+            stop.wait(due - time.perf_counter())
 
     def stop(self):
+        self.stop_readback()
         with QtCore.QMutexLocker(self.mutex):
             """Stop the worker and the Arduino controller."""
             self.running = False
@@ -2803,14 +3442,16 @@ class ArduinoWorker(QtCore.QThread):
     @QtCore.pyqtSlot()
     def get_valve_states(self):
         with QtCore.QMutexLocker(self.mutex):
-            self.parent.valveStates = self.controller.get_valve_states()
-            self.valve_states_updated.emit()
+            states = list(self.controller.get_valve_states())
+        self.valve_states_updated.emit(states)
 
     def poll_readings(self):
         if self.controller.serial_connected:
             with QtCore.QMutexLocker(self.mutex):
                 if self.controller.get_readings():
-                    data = self.controller.readings  # Get new readings from Arduino
+                    # New readings from Arduino, followed by their perf_counter_ns() timestamp
+                    data = list(self.controller.readings) + \
+                        [self.controller.readings_time_ns]
                     # Emit signal with data to update the graph
                     self.data_signal.emit(data)
                 # mode = self.controller.get_mode()
@@ -2821,9 +3462,34 @@ class ArduinoWorker(QtCore.QThread):
         with QtCore.QMutexLocker(self.mutex):
             self.controller.send_depressurise()
 
+    def abort(self, safe_states, budget_ms):
+        """
+        Write the safe valve states directly, ahead of any queued commands.
+
+        Args:
+            safe_states (list[int]): Absolute states for valves 0-7
+            budget_ms (int): Time allowed for the bus and the three transactions
+
+        Returns:
+            bool: True if the readback confirmed the safe states
+        """
+        start = time.perf_counter()
+        if not self.mutex.tryLock(budget_ms):
+            logging.error("Abort: Arduino bus busy")
+            return False
+        try:
+            remaining = budget_ms - (time.perf_counter() - start) * 1000
+            # Share what is left of the budget between the transactions
+            return self.controller.abort(safe_states, max(remaining / 3000, 0.02))
+        finally:
+            self.mutex.unlock()
+
     def set_valve_states(self, states):
         with QtCore.QMutexLocker(self.mutex):
             self.controller.set_valves(states)
+            written = list(self.controller.valve_states)
+        self.parent.record_event("valves", written)
+        self.valve_states_written.emit(written)
 
     def send_command(self, command):
         with QtCore.QMutexLocker(self.mutex):
@@ -2850,6 +3516,7 @@ class MotorWorker(QtCore.QThread):
 
     def __init__(self, parent, port):
         super().__init__()
+        from motorController import MotorController
         self.motor = MotorController(port=port)
         self.parent = parent
         self.running = False
@@ -2865,6 +3532,17 @@ class MotorWorker(QtCore.QThread):
             if self.motor.serial_connected:
                 self.motor.shutdown()
 
+    def abort(self):
+        """Stop the motor directly, ahead of any queued commands."""
+        if not self.mutex.tryLock(100):
+            logging.error("Abort: motor bus busy")
+            return
+        try:
+            if self.motor.serial_connected:
+                self.motor.stop_motor()
+        finally:
+            self.mutex.unlock()
+
     @QtCore.pyqtSlot()
     def calibrate(self):
         """Handle command signals to control the Arduino (e.g., turn on/off valves)."""
@@ -2912,6 +3590,7 @@ class MotorWorker(QtCore.QThread):
         with QtCore.QMutexLocker(self.mutex):
             if self.motor.serial_connected:
                 logging.info(f"Moving motor to position {target}")
+                self.parent.record_event("motor", {"target": target})
                 target = self.mm_to_steps(target)
                 self.motor.move_to_position(target)
 
@@ -2927,6 +3606,7 @@ class MotorWorker(QtCore.QThread):
         with QtCore.QMutexLocker(self.mutex):
             if self.motor.serial_connected:
                 logging.info("Ascent")
+                self.parent.record_event("motor", {"command": "ascent"})
                 self.motor.ascent()
 
     @QtCore.pyqtSlot()
@@ -2934,6 +3614,7 @@ class MotorWorker(QtCore.QThread):
         with QtCore.QMutexLocker(self.mutex):
             if self.motor.serial_connected:
                 logging.info("To Top")
+                self.parent.record_event("motor", {"command": "to_top"})
                 self.motor.to_top()
 
     def steps_to_mm(self, steps):
@@ -2947,8 +3628,19 @@ class MotorWorker(QtCore.QThread):
 class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
     def __init__(self):
         super().__init__()
-        self.setupUi(self)
-        self.setup_logging()
+        with startup_profile.phase("Build window"):
+            self.setupUi(self)
+            self.setup_logging()
+        # Everything the window can be shown without waits for the event loop
+        QtCore.QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        """Create the plot and recover recordings once the window is up."""
+        with startup_profile.phase(f"Create {self.plot_backend} plot"):
+            self.init_plot()
+        with startup_profile.phase("Recover recordings"):
+            self.recover_recordings()
+        startup_profile.finish()
 
     def setup_logging(self):
         # Initialize the logger
@@ -2970,6 +3662,9 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
 
     def closeEvent(self, event):
 
+        # Finish writing any recording in progress
+        self.pressure_recorder.stop()
+        self.stop_replay()
         try:
             if self.arduino_worker:
                 self.arduino_worker.stop()
@@ -3019,10 +3714,12 @@ if __name__ == "__main__":
         }
         """
 
-    app = QtWidgets.QApplication(sys.argv)
+    with startup_profile.phase("Create application"):
+        app = QtWidgets.QApplication(sys.argv)
 
-    app.setStyleSheet(global_stylesheet)
+        app.setStyleSheet(global_stylesheet)
 
     window = MainWindow()
-    window.show()
+    with startup_profile.phase("Show window"):
+        window.show()
     sys.exit(app.exec())
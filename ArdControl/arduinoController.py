@@ -60,6 +60,8 @@ class ArduinoController:
         self.arduino = None
         self.valve_states = [0] * 8
         self.readings = [0] * 4
+        # perf_counter_ns() taken as the last readings arrived
+        self.readings_time_ns = 0
         
         self._configure_logging()
         self._validate_mode()
@@ -123,6 +125,7 @@ class ArduinoController:
         try:
             self.readings = self.arduino.read_registers(    # type: ignore
                 0, 4, 4)
+            self.readings_time_ns = time.perf_counter_ns()
             self.serial_connected = True
         except:
             logging.error("Failed to read pressure readings")
@@ -150,11 +153,44 @@ class ArduinoController:
             write_states = [self.valve_states[i] if valve_states[i]
                             == 2 else valve_states[i] for i in range(8)]
             self.arduino.write_bits(0, write_states)  # type: ignore
+            # Keep the cached states current for the next partial update
+            self.valve_states = write_states
             self.serial_connected = True
         except:
             logging.error("Failed to set valve states")
             self.serial_connected = False
 
+    def abort(self, safe_states, timeout):
+        """
+        Put the valves in a safe state as fast as the bus allows.
+
+        The safe pattern goes out in a single multi-coil write, followed by
+        the depressurise coil, then the valve coils are read back.
+
+        Args:
+            safe_states (list[int]): Absolute states for valves 0-7
+            timeout (float): Serial timeout for each transaction (s)
+
+        Returns:
+            bool: True if the readback confirmed the safe states
+        """
+        if self.arduino is None:
+            return False
+        serial_timeout = self.arduino.serial.timeout  # type: ignore
+        self.arduino.serial.timeout = timeout  # type: ignore
+        try:
+            self.arduino.write_bits(0, safe_states)  # type: ignore
+            self.arduino.write_bit(self.DEPRESSURIZE_ADDRESS, 1)  # type: ignore
+            self.valve_states = self.arduino.read_bits(0, 8, 1)  # type: ignore
+            self.serial_connected = True
+        except Exception as e:
+            logging.error(f"Failed to set safe valve states: {e}")
+            self.serial_connected = False
+            return False
+        finally:
+            self.arduino.serial.timeout = serial_timeout  # type: ignore
+        return list(self.valve_states) == list(safe_states)
+
     def send_reset(self):
         try:
             self.arduino.write_bit(self.RESET_ADDRESS, 1)  # type: ignore
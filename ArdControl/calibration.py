@@ -0,0 +1,251 @@
+"""
+File: calibration.py
+Description: Per-channel gauge calibrations, converting raw counts to pressure.
+"""
+
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+
+# Version of the calibration file layout
+CALIBRATION_VERSION = 1
+
+# Unit of the converted pressures, hundreds of millibar (real pressure / 100),
+# the scale the live plot labels mBar
+PRESSURE_UNIT = "mbar/100"
+
+# Gauge counts to pressure (PRESSURE_UNIT): pressure = (counts - offset) / gain
+DEFAULT_OFFSET = 203.53
+DEFAULT_GAIN = 82.48
+DEFAULT_CHANNELS = 4
+
+
+class Calibration:
+    """
+    Conversion from raw gauge counts to pressure, one model per channel.
+
+    A linear channel maps counts to (counts - offset) / gain. A piecewise
+    channel interpolates a table of counts and the pressures measured at
+    them, holding the end values outside the table. Linear channels are
+    converted together by broadcasting, so a block of samples costs one
+    array operation however many rows it has.
+
+    Every calibration has an ID, read from its file or derived from its
+    models, which is stored with each recording made with it.
+
+    Attributes:
+        channels (list[dict]): Model of each channel
+        unit (str): Unit of the converted pressures
+        id (str): Calibration ID
+        is_linear (bool): True if every channel is linear
+    """
+
+    def __init__(self, channels, unit=PRESSURE_UNIT, calibration_id=None):
+        """
+        Initialize the calibration.
+
+        Args:
+            channels (list[dict]): {"type": "linear", "offset", "gain"} or
+                {"type": "piecewise", "counts", "pressure"} per channel
+            unit (str): Unit of the converted pressures
+            calibration_id (str): ID, derived from the models if None
+
+        Raises:
+            ValueError: If a channel model is invalid
+        """
+        self.channels = [_check_model(model) for model in channels]
+        if not self.channels:
+            raise ValueError("Calibration has no channels")
+        self.unit = unit
+        self.id = calibration_id or self._derive_id()
+        self.is_linear = all(model["type"] == "linear" for model in self.channels)
+        self._offsets = np.array([model.get("offset", 0.0) for model in self.channels])
+        self._gains = np.array([model.get("gain", 1.0) for model in self.channels])
+        self._tables = {i: (np.array(model["counts"], dtype=np.float64),
+                            np.array(model["pressure"], dtype=np.float64))
+                        for i, model in enumerate(self.channels) if model["type"] == "piecewise"}
+
+    @classmethod
+    def linear(cls, offset=DEFAULT_OFFSET, gain=DEFAULT_GAIN, channel_count=DEFAULT_CHANNELS, unit=PRESSURE_UNIT):
+        """Calibration with the same linear model on every channel."""
+        return cls([{"type": "linear", "offset": offset, "gain": gain}] * channel_count, unit)
+
+    @classmethod
+    def from_dict(cls, data, channel_count=DEFAULT_CHANNELS):
+        """
+        Build a calibration from its file or recording header form.
+
+        The single {"offset", "gain", "unit"} form stored by older
+        recordings is applied to every channel. Those recordings labelled
+        the unit "bar", but their pressures are on the same scale as
+        PRESSURE_UNIT.
+
+        Args:
+            data (dict): Calibration, as written by to_dict()
+            channel_count (int): Channels of an older single-model calibration
+
+        Returns:
+            Calibration: The calibration
+
+        Raises:
+            ValueError: If the calibration is invalid or from a newer version
+        """
+        try:
+            if "channels" not in data:
+                return cls.linear(float(data["offset"]), float(data["gain"]), channel_count)
+            if int(data.get("version", CALIBRATION_VERSION)) > CALIBRATION_VERSION:
+                raise ValueError(
+                    f"Calibration version {data['version']} is newer than this program")
+            return cls(data["channels"], data.get("unit", PRESSURE_UNIT), data.get("id"))
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Invalid calibration: {e}") from e
+
+    def to_dict(self):
+        """Calibration as JSON-serialisable data, the form stored in files and recordings."""
+        return {"version": CALIBRATION_VERSION,
+                "id": self.id,
+                "unit": self.unit,
+                "channels": self.channels}
+
+    def convert(self, counts, channel=None):
+        """
+        Convert raw counts to pressure.
+
+        Args:
+            counts (array_like): Counts, with the channels along the last
+                axis, or all from one channel if channel is given
+            channel (int): Channel of every value in counts, from 0
+
+        Returns:
+            np.ndarray: Pressures, the same shape as counts
+
+        Raises:
+            ValueError: If the last axis does not match the channel count
+        """
+        values = np.asarray(counts, dtype=np.float64)
+        if channel is not None:
+            if channel in self._tables:
+                return np.interp(values, *self._tables[channel])
+            return (values - self._offsets[channel]) / self._gains[channel]
+        if values.ndim == 0 or values.shape[-1] != len(self.channels):
+            raise ValueError(
+                f"Expected {len(self.channels)} channels, got shape {values.shape}")
+        pressures = (values - self._offsets) / self._gains
+        for i, table in self._tables.items():
+            pressures[..., i] = np.interp(values[..., i], *table)
+        return pressures
+
+    def to_counts(self, pressures, channel=None):
+        """
+        Convert pressures back to raw counts, the inverse of convert().
+
+        Args:
+            pressures (array_like): Pressures, laid out as for convert()
+            channel (int): Channel of every value in pressures, from 0
+
+        Returns:
+            np.ndarray: Counts, the same shape as pressures
+        """
+        values = np.asarray(pressures, dtype=np.float64)
+        if channel is not None:
+            if channel in self._tables:
+                counts, pressure = self._tables[channel]
+                return np.interp(values, pressure, counts)
+            return values * self._gains[channel] + self._offsets[channel]
+        counts = values * self._gains + self._offsets
+        for i, (table_counts, table_pressure) in self._tables.items():
+            counts[..., i] = np.interp(values[..., i], table_pressure, table_counts)
+        return counts
+
+    def _derive_id(self):
+        text = json.dumps({"unit": self.unit, "channels": self.channels}, sort_keys=True)
+        return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def _check_model(model):
+    kind = model.get("type", "linear")
+    if kind == "linear":
+        gain = float(model["gain"])
+        if gain == 0:
+            raise ValueError("Linear calibration gain is zero")
+        return {"type": "linear", "offset": float(model["offset"]), "gain": gain}
+    if kind == "piecewise":
+        counts = [float(v) for v in model["counts"]]
+        pressure = [float(v) for v in model["pressure"]]
+        if len(counts) < 2 or len(counts) != len(pressure):
+            raise ValueError("Piecewise calibration needs matching tables of two or more points")
+        # Both must rise so the table can be interpolated either way
+        if np.any(np.diff(counts) <= 0) or np.any(np.diff(pressure) <= 0):
+            raise ValueError("Piecewise calibration tables must be increasing")
+        return {"type": "piecewise", "counts": counts, "pressure": pressure}
+    raise ValueError(f"Unknown calibration type {kind}")
+
+
+def default_calibration():
+    """Linear calibration shared by the gauges unless a calibration file is loaded."""
+    return Calibration.linear()
+
+
+def as_calibration(calibration):
+    """
+    Calibration from any of the forms it is passed around in.
+
+    Args:
+        calibration: Calibration, its dict form, or None for the default
+
+    Returns:
+        Calibration: The calibration
+    """
+    if calibration is None:
+        return default_calibration()
+    if isinstance(calibration, Calibration):
+        return calibration
+    return Calibration.from_dict(calibration)
+
+
+def load_calibration(path):
+    """
+    Read a calibration file.
+
+    Args:
+        path (str): Path of the calibration file
+
+    Returns:
+        Calibration: The calibration, or None if there is no usable file
+    """
+    try:
+        with open(path, "r") as f:
+            return Calibration.from_dict(json.load(f))
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError, ValueError) as e:
+        logging.error(f"Could not load calibration {path}: {e}")
+        return None
+
+
+def save_calibration(calibration, path):
+    """
+    Write a calibration file, via a temporary file so it is never left torn.
+
+    Args:
+        calibration (Calibration): Calibration to save
+        path (str): Path of the calibration file
+
+    Returns:
+        bool: True if the file was written
+    """
+    temp_path = f"{path}.tmp"
+    try:
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(temp_path, "w") as f:
+            json.dump(calibration.to_dict(), f, indent=1)
+        os.replace(temp_path, path)
+    except OSError as e:
+        logging.error(f"Could not save calibration {path}: {e}")
+        return False
+    return True
@@ -0,0 +1,206 @@
+"""
+File: livePlot.py
+Description: Sample handling and frame pacing shared by the live plot backends.
+"""
+
+import logging
+import time
+
+from PyQt6 import QtCore
+
+from plotHistory import MinMaxHistory
+
+
+class LivePlot:
+    """
+    Mixin holding everything the live plot backends share.
+
+    Samples only go into the history as they arrive. A render timer
+    draws at most MAX_FPS frames a second, and only when there is
+    something new, so the acquisition rate never sets the render rate.
+
+    The window shown runs from a minute to a day. Longer windows are drawn
+    from the min/max levels of the history, so every window costs about
+    max_points vertices per line and pressure spikes are never lost.
+
+    A backend names itself in BACKEND, calls init_live_plot() from its
+    constructor and implements draw_frame(), which draws line_data(), and
+    show_window(), which sets the x axis to the last `seconds`.
+    """
+
+    BACKEND = None
+    MAX_FPS = 25
+    COLORS = ("red", "blue", "green", "purple")
+    WINDOWS_S = (60, 600, 3600, 6 * 3600, 24 * 3600)
+
+    def init_live_plot(self, parent, history=None):
+        """
+        Set up the history, statistics and render timer.
+
+        Args:
+            parent: Main window, for the calibration, channel buttons and recorder
+            history (MinMaxHistory): History to carry on from, new if None
+        """
+        self.parent = parent
+        self.max_points = 500
+        self.window_s = self.WINDOWS_S[0]
+
+        # Raw counts of the four channels, at every resolution a window needs
+        if history is None:
+            history = MinMaxHistory(
+                4, self.max_points, self.window_samples(self.WINDOWS_S[-1]))
+        self.history = history
+
+        # Render statistics
+        self.frames = 0
+        self.dropped_frames = 0
+        self.render_time = 0        # Time spent rendering since the last stats() (s)
+        self.max_render_time = 0
+        self._stats_frames = 0
+        self._stats_time = time.perf_counter()
+        self._last_tick = None
+
+        self.dirty = True
+        self.frame_interval = 1000 // self.MAX_FPS
+        self.render_timer = QtCore.QTimer()
+        self.render_timer.timeout.connect(self.render_frame)
+        self.render_timer.start(self.frame_interval)
+
+    def latest_pressure(self, channel):
+        """Most recent reading of a pressure channel (1-4), calibrated."""
+        counts = self.history.latest(channel - 1)
+        return float(self.parent.pressure_calibration.convert(counts, channel - 1))
+
+    def clear(self):
+        """Empty the plot, ready for a new source of samples."""
+        self.history.clear()
+        self.redraw()
+
+    def append_samples(self, samples):
+        """
+        Add samples to the plotted window without drawing.
+
+        Args:
+            samples (list[list]): Raw counts of the four channels per sample
+        """
+        if not samples:
+            return
+        # The raw counts are kept, they are converted when drawn
+        if len(samples) == 1:
+            self.history.append(samples[0][:4])
+        else:
+            self.history.extend([sample[:4] for sample in samples])
+
+    def window_samples(self, seconds):
+        """Number of samples polled in a window of the given length."""
+        return int(seconds * 1000 / self.parent.valveCheckInterval)
+
+    def set_window(self, seconds):
+        """
+        Show the last `seconds` of samples.
+
+        Args:
+            seconds (float): Length of the window, one of WINDOWS_S
+        """
+        self.window_s = seconds
+        self.show_window(seconds)
+        self.redraw()
+
+    def redraw(self):
+        """Draw the current window of samples on the next frame."""
+        self.dirty = True
+
+    def line_data(self):
+        """
+        Points of each channel's line in the current window.
+
+        Returns:
+            list: (seconds before the newest sample, pressures) per
+                channel, None for channels that are switched off
+        """
+        calibration = self.parent.pressure_calibration
+        buttons = [self.parent.pressure1RadioButton, self.parent.pressure2RadioButton,
+                   self.parent.pressure3RadioButton, self.parent.pressure4RadioButton]
+        numbers, counts = self.history.window(self.window_samples(self.window_s))
+        x_data = (numbers - (self.history.total - 1)) * self.parent.valveCheckInterval / 1000
+        return [(x_data, calibration.convert(counts[i], i)) if button.isChecked() else None
+                for i, button in enumerate(buttons)]
+
+    def render_frame(self):
+        """Render timer slot, draws the lines if samples arrived since the last frame."""
+        now = time.perf_counter()
+        last_tick, self._last_tick = self._last_tick, now
+        if not self.dirty:
+            return
+        if last_tick is not None:
+            # Frames missed while the GUI thread was busy elsewhere
+            late = int((now - last_tick) * 1000 / self.frame_interval) - 1
+            if late > 0:
+                self.dropped_frames += late
+        self.dirty = False
+
+        self.draw_frame()
+
+        elapsed = time.perf_counter() - now
+        self.frames += 1
+        self._stats_frames += 1
+        self.render_time += elapsed
+        self.max_render_time = max(self.max_render_time, elapsed)
+
+    def create_toolbar(self, parent):
+        """Toolbar to show under the plot, None if the backend has its own mouse controls."""
+        return None
+
+    def stop_rendering(self):
+        """Stop the render timer, before the plot is replaced."""
+        self.render_timer.stop()
+
+    def stats(self):
+        """
+        Render statistics since the last call.
+
+        Returns:
+            dict: Frames per second, mean and longest render time (ms) and
+                total frames dropped
+        """
+        now = time.perf_counter()
+        frames = self._stats_frames
+        stats = {"fps": frames / (now - self._stats_time),
+                 "render_ms": self.render_time / frames * 1000 if frames else 0,
+                 "max_render_ms": self.max_render_time * 1000,
+                 "dropped": self.dropped_frames}
+        self._stats_frames = 0
+        self._stats_time = now
+        self.render_time = 0
+        self.max_render_time = 0
+        return stats
+
+    def update_plot(self, pressure_values):
+        """
+        Take one reading from the Arduino worker.
+
+        Args:
+            pressure_values (list): Raw counts of the four channels, then
+                the perf_counter_ns() time they were read
+        """
+        if pressure_values:
+            counts = pressure_values[:4]
+            self.append_samples([counts])
+
+            # Hand the sample to the background writer, never touch the disk here
+            if self.parent.saving:
+                if len(pressure_values) > 4:
+                    timestamp = pressure_values[4]
+                else:
+                    timestamp = time.perf_counter_ns()
+                self.parent.pressure_recorder.record(timestamp, counts)
+
+            # Check if venting is complete
+            if self.parent.vent_flag:
+                pressure3 = float(
+                    self.parent.pressure_calibration.convert(counts[2], 2))
+                logging.info(f"Pressure 3: {pressure3}")
+                if pressure3 < 0.1:
+                    logging.info("Venting complete")
+
+            self.redraw()
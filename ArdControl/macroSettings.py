@@ -0,0 +1,140 @@
+"""
+File: macroSettings.py
+Description: Reads the valve and motor macro files shared by the macro editors and the main window.
+"""
+
+import json
+import os
+
+MACRO_DIRECTORY = "C:\\ssbubble"
+VALVE_MACRO_PATH = os.path.join(MACRO_DIRECTORY, 'valve_macro_data.json')
+MOTOR_MACRO_PATH = os.path.join(MACRO_DIRECTORY, 'motor_macro_data.json')
+
+VALVE_MACRO_COUNT = 4
+MOTOR_MACRO_COUNT = 6
+VALVE_STATES = ("Open", "Closed", "Ignore")
+# Valve command for each state in the editor, 2 leaves the valve as it is
+VALVE_COMMANDS = {"Open": 1, "Closed": 0, "Ignore": 2}
+
+# Ranges of the editors' spin boxes
+TIMER_RANGE = (0.1, 3600)
+POSITION_RANGE = (0, 2500000)
+
+
+def default_valve_macro(number):
+    """Row of an unset valve macro, as written to the valve macro file."""
+    return {"Macro No.": f"Macro {number}",
+            "Label": "",
+            "Valves": ["Closed"] * 8,
+            "Timer": 1.0}
+
+
+def default_motor_macro(number):
+    """Row of an unset motor macro, as written to the motor macro file."""
+    return {"Macro No.": f"Macro {number}",
+            "Label": f"Motor Macro {number}",
+            "Position": 0}
+
+
+def _load_rows(path):
+    """Rows of a macro file, or an empty list if it is missing or unreadable."""
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return []
+    return data if isinstance(data, list) else []
+
+
+def read_valve_macros(path=VALVE_MACRO_PATH):
+    """
+    Read the valve macros, filling in any the file does not set.
+
+    A file with fewer rows than there are macros, or a row that cannot be
+    read, leaves the remaining macros at their defaults. Valve states the
+    editor does not offer read as "Open", and timers are held to the range
+    and precision of the editor's spin box.
+
+    Args:
+        path (str): Path of the valve macro file
+
+    Returns:
+        list[dict]: One row per macro, as written to the valve macro file
+    """
+    macros = [default_valve_macro(i+1) for i in range(VALVE_MACRO_COUNT)]
+    for i, row in enumerate(_load_rows(path)[:VALVE_MACRO_COUNT]):
+        try:
+            # Only V1 to V5 are set by a macro
+            valves = [state if state in VALVE_STATES else "Open"
+                      for state in row["Valves"][:5]]
+            valves += ["Closed"] * (5 - len(valves))
+            timer = round(min(max(float(row.get("Timer", 1.0)), TIMER_RANGE[0]),
+                              TIMER_RANGE[1]), 2)
+            macros[i] = {"Macro No.": f"Macro {i+1}",
+                         "Label": str(row.get("Label", "")),
+                         "Valves": valves + ["Closed", "Closed", "Closed"],
+                         "Timer": timer}
+        except (AttributeError, KeyError, TypeError, ValueError):
+            continue
+    return macros
+
+
+def read_motor_macros(path=MOTOR_MACRO_PATH):
+    """
+    Read the motor macros, filling in any the file does not set.
+
+    A file with fewer rows than there are macros, or a row that cannot be
+    read, leaves the remaining macros at their defaults. Positions are held
+    to the range of the editor's spin box.
+
+    Args:
+        path (str): Path of the motor macro file
+
+    Returns:
+        list[dict]: One row per macro, as written to the motor macro file
+    """
+    macros = [default_motor_macro(i+1) for i in range(MOTOR_MACRO_COUNT)]
+    for i, row in enumerate(_load_rows(path)[:MOTOR_MACRO_COUNT]):
+        try:
+            position = min(max(int(row.get("Position", 0)), POSITION_RANGE[0]),
+                           POSITION_RANGE[1])
+            macros[i] = {"Macro No.": f"Macro {i+1}",
+                         "Label": str(row.get("Label", "")),
+                         "Position": position}
+        except (AttributeError, KeyError, TypeError, ValueError):
+            continue
+    return macros
+
+
+def valve_macro_settings(macros):
+    """
+    Valve macro settings used by the main window.
+
+    Args:
+        macros (list[dict]): Rows from read_valve_macros()
+
+    Returns:
+        dict: Label, numeric valve states and timer of each macro, by macro number
+    """
+    return {macro["Macro No."][-1]: {
+        "Label": macro["Label"],
+        # Valves 6 to 8 are left as they are
+        "Valves": [VALVE_COMMANDS[state] for state in macro["Valves"][:5]] + [2, 2, 2],
+        "Timer": macro["Timer"]} for macro in macros}
+
+
+def motor_macro_settings(macros):
+    """
+    Motor macro settings used by the main window.
+
+    Args:
+        macros (list[dict]): Rows from read_motor_macros()
+
+    Returns:
+        dict: Label and position of each macro, by macro number
+    """
+    return {macro["Macro No."][-1]: {"Label": macro["Label"],
+                                     "Position": macro["Position"]}
+            for macro in macros}
@@ -0,0 +1,75 @@
+"""
+File: matplotlibPlot.py
+Description: Live plot drawn with matplotlib, the default plot backend.
+"""
+
+from matplotlib.backends.backend_qt import NavigationToolbar2QT as NavigationToolbar
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
+from matplotlib.figure import Figure
+
+from livePlot import LivePlot
+
+
+class RealTimePlot(LivePlot, FigureCanvasQTAgg):
+    """
+    Live plot drawn with matplotlib, see LivePlot.
+
+    The axes are fixed, so their background is cached after each full
+    draw and a frame only restores it and blits the four lines.
+    """
+
+    BACKEND = "matplotlib"
+
+    def __init__(self, parent, history=None):
+        # A bare Figure, pyplot is never needed for an embedded canvas
+        self.fig = Figure()
+        self.ax = self.fig.subplots()
+        FigureCanvasQTAgg.__init__(self, self.fig)
+        self.init_live_plot(parent, history)
+
+        # Lines are animated so full draws leave them out of the cached background
+        self.lines = [self.ax.plot([], [], lw=2, color=color, animated=True)[0]
+                      for color in self.COLORS]
+
+        # Set plot limits and labels once, they do not follow the data
+        self.ax.set_xlim(-self.window_s, 0)
+        self.ax.set_ylim(0, 11)
+        self.ax.set_xlabel('Time (s)')
+        self.ax.set_ylabel('mBar')
+
+        # Background of the axes, cached on every full draw (resize, zoom)
+        self.background = None
+        self.mpl_connect('draw_event', self.on_draw)
+
+    def create_toolbar(self, parent):
+        return NavigationToolbar(self, parent)
+
+    def show_window(self, seconds):
+        self.ax.set_xlim(-seconds, 0)
+        # The tick labels change, so the cached background is redrawn
+        self.background = None
+
+    def on_draw(self, event):
+        self.background = self.copy_from_bbox(self.ax.bbox)
+        self.update_lines()
+        for line in self.lines:
+            self.ax.draw_artist(line)
+
+    def update_lines(self):
+        for line, data in zip(self.lines, self.line_data()):
+            if data is None:
+                line.set_data([], [])
+            else:
+                line.set_data(*data)
+
+    def draw_frame(self):
+        """Blit the lines over the cached background."""
+        if self.background is None:
+            # First frame, or the canvas has not been drawn yet
+            self.draw()
+        else:
+            self.restore_region(self.background)
+            self.update_lines()
+            for line in self.lines:
+                self.ax.draw_artist(line)
+            self.blit(self.ax.bbox)
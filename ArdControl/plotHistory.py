@@ -0,0 +1,175 @@
+"""
+File: plotHistory.py
+Description: Multi-resolution min/max history of the pressure channels for the live plot.
+"""
+
+import numpy as np
+
+from ringBuffer import RingBuffer
+
+
+class MinMaxHistory:
+    """
+    Sample history kept at several resolutions, so any window draws a fixed number of vertices.
+
+    Level 0 holds the newest raw samples. Each level above it holds
+    buckets of FACTOR times as many samples as the level below, storing
+    the minimum and maximum of every channel. Buckets are aligned to the
+    sample count, and each level keeps a pending bucket that every new
+    sample is folded into and that is pushed once full, so updates are
+    incremental and never rescan the history.
+
+    A window is drawn from the finest level that fits it in the vertex
+    budget. Each bucket is drawn as its minimum then its maximum, so a
+    spike of a single sample still reaches its full height at every zoom
+    level.
+    """
+
+    FACTOR = 2
+
+    def __init__(self, channels, vertices, max_samples):
+        """
+        Initialize the history.
+
+        Args:
+            channels (int): Number of channels
+            vertices (int): Most points drawn per channel
+            max_samples (int): Longest window, in samples, that is drawn
+                within the vertex budget
+        """
+        self.channels = channels
+        self.vertices = vertices
+        # Levels needed for the longest window, at two vertices per bucket
+        levels = 1
+        while self.FACTOR ** (levels - 1) * (vertices // 2) < max_samples:
+            levels += 1
+        self.bucket_sizes = [self.FACTOR ** level for level in range(levels)]
+        # Raw samples, then the sample number of each
+        self.raw = RingBuffer(channels + 1, vertices)
+        # Minimum and maximum of each channel, then the first sample number of each bucket
+        self.levels = [RingBuffer(2 * channels + 1, vertices) for _ in range(1, levels)]
+        self._pending_min = np.empty((levels, channels))
+        self._pending_max = np.empty((levels, channels))
+        self.total = 0
+        self.clear()
+
+    def __len__(self):
+        return self.total
+
+    def clear(self):
+        self.raw.clear()
+        for level in self.levels:
+            level.clear()
+        self._pending_min.fill(np.inf)
+        self._pending_max.fill(-np.inf)
+        self.total = 0
+
+    def append(self, sample):
+        """
+        Add one sample.
+
+        Args:
+            sample (list): One value per channel
+        """
+        self.raw.append([*sample, self.total])
+        np.minimum(self._pending_min, sample, out=self._pending_min)
+        np.maximum(self._pending_max, sample, out=self._pending_max)
+        self.total += 1
+        # Bucket sizes are nested, so once a level is still filling the ones above are too
+        for level in range(1, len(self.bucket_sizes)):
+            size = self.bucket_sizes[level]
+            if self.total % size:
+                break
+            self._push(level, self.total - size)
+
+    def extend(self, samples):
+        """
+        Add many samples at once, vectorised per level.
+
+        Args:
+            samples (array_like): One row per sample, one column per channel
+        """
+        samples = np.asarray(samples, dtype=np.float64).reshape(-1, self.channels)
+        n = len(samples)
+        if not n:
+            return
+        numbers = np.arange(self.total, self.total + n, dtype=np.float64)
+        self.raw.extend(np.column_stack((samples, numbers)))
+
+        for level in range(1, len(self.bucket_sizes)):
+            size = self.bucket_sizes[level]
+            filled = self.total % size
+            # Finish the pending bucket
+            head = min(n, size - filled)
+            self._fold(level, samples[:head])
+            if filled + head < size:
+                continue
+            self._push(level, self.total - filled)
+            # Whole buckets, then start the next pending bucket
+            whole = (n - head) // size
+            if whole:
+                block = samples[head:head + whole * size].reshape(whole, size, self.channels)
+                starts = self.total + head + np.arange(whole, dtype=np.float64) * size
+                self.levels[level - 1].extend(np.column_stack(
+                    (block.min(axis=1), block.max(axis=1), starts)))
+            self._fold(level, samples[head + whole * size:])
+        self.total += n
+
+    def latest(self, channel):
+        """Newest value of one channel."""
+        return self.raw.latest(channel)
+
+    def window(self, samples):
+        """
+        Points to draw for the newest samples.
+
+        Args:
+            samples (int): Length of the window, in samples
+
+        Returns:
+            tuple: Sample numbers (n,) and values (channels, n) of the
+                points, at most about `vertices` of them
+        """
+        level = 0
+        while level + 1 < len(self.bucket_sizes) and (
+                samples > self.vertices if level == 0
+                else 2 * -(-samples // self.bucket_sizes[level]) > self.vertices):
+            level += 1
+        start = self.total - samples
+
+        if level == 0:
+            data = self.raw.view()
+            first = np.searchsorted(data[-1], start)
+            return data[-1, first:], data[:-1, first:]
+
+        size = self.bucket_sizes[level]
+        data = self.levels[level - 1].view()
+        first = np.searchsorted(data[-1], start - size + 1)
+        mins = data[:self.channels, first:]
+        maxs = data[self.channels:-1, first:]
+        starts = data[-1, first:]
+        filled = self.total % size
+        if filled:
+            # The bucket still filling, so the newest samples are always shown
+            mins = np.column_stack((mins, self._pending_min[level]))
+            maxs = np.column_stack((maxs, self._pending_max[level]))
+            starts = np.append(starts, self.total - filled)
+        # Minimum then maximum of each bucket
+        values = np.empty((self.channels, 2 * len(starts)))
+        values[:, 0::2] = mins
+        values[:, 1::2] = maxs
+        x = np.empty(2 * len(starts))
+        x[0::2] = starts
+        x[1::2] = starts + size / 2
+        return x, values
+
+    def _fold(self, level, samples):
+        if len(samples):
+            np.minimum(self._pending_min[level], samples.min(axis=0), out=self._pending_min[level])
+            np.maximum(self._pending_max[level], samples.max(axis=0), out=self._pending_max[level])
+
+    def _push(self, level, start):
+        self.levels[level - 1].append(
+            [*self._pending_min[level], *self._pending_max[level], start])
+        self._pending_min[level].fill(np.inf)
+        self._pending_max[level].fill(-np.inf)
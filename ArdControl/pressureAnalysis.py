@@ -1,8 +1,9 @@
 import pandas as pd
-import numpy as np
-import csv
 from sklearn.linear_model import LinearRegression
 
+from calibration import default_calibration
+from pressureLoader import load_stats
+
 
 data = {
     'number': [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17],
@@ -10,33 +11,43 @@ data = {
     'recorded pressure': [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
 }
 
-df = pd.DataFrame(data)
+# Files are loaded in parallel processes, which need the main guard on Windows
+if __name__ == "__main__":
+    df = pd.DataFrame(data)
+
+    paths = ['C:\\NMR Results\\pressure_data' + str(i) + '.csv' for i in range(0, 18)]
+    for i, stats in enumerate(load_stats(paths)):
+        if "error" in stats:
+            raise SystemExit(f"Could not load {stats['path']}: {stats['error']}")
+        # Mean of the first pressure column
+        df.loc[i, 'recorded pressure'] = stats['mean'][0]
 
-for i in range(0, 18):
-    temp_df = pd.read_csv('C:\\NMR Results\\pressure_data' + str(i) + '.csv')
-    temp_df = temp_df['Pressure1']
-    temp_df = temp_df.to_numpy()
-    avg = np.mean(temp_df)
-    df['recorded pressure'][i] = avg
+    #df.to_csv('C:\\NMR Results\\pressure_data_final.csv', index=False)
 
-#df.to_csv('C:\\NMR Results\\pressure_data_final.csv', index=False)
+    # Prepare the data for linear regression
+    X = df[['real pressure']][0:16]  # Independent variable
+    y = df['recorded pressure'][0:16]  # Dependent variable
 
-# Prepare the data for linear regression
-X = df[['real pressure']][0:16]  # Independent variable
-y = df['recorded pressure'][0:16]  # Dependent variable
+    # Create and fit the linear regression model
+    model = LinearRegression()
+    model.fit(X, y)
 
-# Create and fit the linear regression model
-model = LinearRegression()
-model.fit(X, y)
+    # Optionally, make predictions
+    predictions = model.predict(X)
 
-# Optionally, make predictions
-predictions = model.predict(X)
+    # Print the coefficients
+    print(f"Intercept: {model.intercept_}")
+    print(f"Coefficient: {model.coef_[0]}")
 
-# Print the coefficients
-print(f"Intercept: {model.intercept_}")
-print(f"Coefficient: {model.coef_[0]}")
+    # Compare with the gauge calibration used by the GUI, which works in real pressure / 100
+    calibration = default_calibration()
+    counts = calibration.to_counts(1000 / 100, channel=0)
+    pressure = calibration.convert(1023, channel=0) * 100
+    # Same figures as the constants this script used before the shared calibration
+    assert abs(counts - ((1000*0.8247) + 203.61)) < 0.1, counts
+    assert abs(pressure - (1023-203.61)/0.8247) < 0.1, pressure
 
-print(model.predict([[1000]]))  # Predict the pressure for a real pressure of 1000
-print((1000*0.8247) + 203.61)
+    print(model.predict([[1000]]))  # Predict the pressure for a real pressure of 1000
+    print(counts)
 
-print((1023-203.61)/0.8247)  # Predict the real pressure for a recorded pressure of 1023
+    print(pressure)  # Predict the real pressure for a recorded pressure of 1023
@@ -0,0 +1,215 @@
+"""
+File: pressureLoader.py
+Description: Loads pressure recordings straight into NumPy arrays for analysis.
+"""
+
+import concurrent.futures
+import csv
+import os
+
+import numpy as np
+
+from recordingFormat import BINARY_EXTENSION, RecordingReader, SegmentedRecording, manifest_path
+
+
+class PressureData:
+    """
+    Pressure readings of one recording.
+
+    Attributes:
+        path (str): Path of the recording
+        channels (list[str]): Channel names
+        pressures (np.ndarray): One row per sample, one column per channel
+        times (np.ndarray): Seconds since the first sample, or None if not loaded
+    """
+
+    def __init__(self, path, channels, pressures, times=None):
+        self.path = path
+        self.channels = channels
+        self.pressures = pressures
+        self.times = times
+
+    def __len__(self):
+        return len(self.pressures)
+
+    def column(self, channel):
+        """Readings of one channel, by name or index."""
+        if isinstance(channel, str):
+            channel = self.channels.index(channel)
+        return self.pressures[:, channel]
+
+
+def load(path, times=True):
+    """
+    Load a csv, binary or segmented recording.
+
+    csv files in the layout written by the GUI are parsed by np.loadtxt in
+    one pass; anything else falls back to the csv module. Binary
+    recordings are memory-mapped and converted with their own calibration.
+
+    Args:
+        path (str): Path of the recording, first segment or manifest
+        times (bool): Also load the sample times
+
+    Returns:
+        PressureData: The recording's readings
+    """
+    if os.path.exists(manifest_path(path)):
+        recording = SegmentedRecording(path)
+        readers = [recording.segment_reader(number)
+                   for number in range(1, len(recording.segments) + 1)]
+        return _from_readers(path, readers, times)
+    if path.endswith(BINARY_EXTENSION):
+        return _from_readers(path, [RecordingReader(path)], times)
+    return _load_csv(path, times)
+
+
+def column_stats(values):
+    """
+    Summary statistics of each column.
+
+    Args:
+        values (np.ndarray): One row per sample, one column per channel
+
+    Returns:
+        dict: Count, and per-column mean, std, min and max as lists
+    """
+    if not len(values):
+        return {"count": 0}
+    return {"count": len(values),
+            "mean": np.mean(values, axis=0).tolist(),
+            "std": np.std(values, axis=0).tolist(),
+            "min": np.min(values, axis=0).tolist(),
+            "max": np.max(values, axis=0).tolist()}
+
+
+def file_stats(path):
+    """
+    Column statistics of one recording, without keeping its readings.
+
+    Binary recordings with a linear calibration are summarised from the
+    raw counts in the memory map, which that calibration maps straight
+    onto pressure.
+
+    Args:
+        path (str): Path of the recording
+
+    Returns:
+        dict: Path, channel names and column_stats(), or path and error
+    """
+    try:
+        reader = None
+        if path.endswith(BINARY_EXTENSION) and not os.path.exists(manifest_path(path)):
+            reader = RecordingReader(path)
+        if reader is not None and reader.calibration.is_linear:
+            calibration = reader.calibration
+            stats = column_stats(reader.records["values"])
+            if stats["count"]:
+                gains = np.array([model["gain"] for model in calibration.channels])
+                stats["mean"] = calibration.convert(stats["mean"]).tolist()
+                # A negative gain swaps the ends of the range
+                ends = calibration.convert([stats["min"], stats["max"]])
+                stats["min"] = ends.min(axis=0).tolist()
+                stats["max"] = ends.max(axis=0).tolist()
+                stats["std"] = (np.array(stats["std"]) / np.abs(gains)).tolist()
+            channels = reader.header["channels"]
+        else:
+            data = load(path, times=False)
+            stats = column_stats(data.pressures)
+            channels = data.channels
+    except (OSError, ValueError, KeyError) as e:
+        return {"path": path, "error": str(e)}
+    stats.update({"path": path, "channels": channels})
+    return stats
+
+
+def load_stats(paths, workers=None):
+    """
+    Column statistics of many recordings, loaded in parallel processes.
+
+    Scripts calling this on Windows must do so under an
+    ``if __name__ == "__main__":`` guard.
+
+    Args:
+        paths (list[str]): Paths of the recordings
+        workers (int): Number of processes, 1 to load in this process
+
+    Returns:
+        list[dict]: file_stats() of each path, in the same order
+    """
+    paths = list(paths)
+    if workers == 1 or len(paths) < 2:
+        return [file_stats(path) for path in paths]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(file_stats, paths))
+
+
+def _from_readers(path, readers, times):
+    channels = readers[0].header["channels"]
+    pressures = [reader.pressures() for reader in readers if len(reader)]
+    pressures = np.concatenate(pressures) if pressures else np.empty((0, len(channels)))
+    sample_times = None
+    if times:
+        ns = [reader.records["time"] for reader in readers if len(reader)]
+        ns = np.concatenate(ns) if ns else np.empty(0, dtype=np.int64)
+        sample_times = (ns - ns[0]) / 1e9 if len(ns) else ns.astype(np.float64)
+    return PressureData(path, channels, pressures, sample_times)
+
+
+def _load_csv(path, times):
+    with open(path, "r") as f:
+        header = [name.strip() for name in f.readline().split(",")]
+    monotonic = header[-1].startswith("Monotonic")
+    channel_count = len(header) - 2 if monotonic else len(header) - 1
+    channels = header[1:1 + channel_count]
+
+    try:
+        # Fast path: "HH:MM:SS, p1, ..., pn[, monotonic ns]"
+        columns = list(range(1, 1 + channel_count))
+        pressures = np.loadtxt(path, delimiter=",", skiprows=1, usecols=columns,
+                               ndmin=2, dtype=np.float64)
+        sample_times = None
+        if times and monotonic:
+            ns = np.loadtxt(path, delimiter=",", skiprows=1, usecols=len(header) - 1,
+                            ndmin=1, dtype=np.int64)
+            sample_times = (ns - ns[0]) / 1e9 if len(ns) else ns.astype(np.float64)
+        elif times:
+            clock = np.loadtxt(path, delimiter=",", skiprows=1, usecols=0,
+                               ndmin=1, dtype="U8")
+            sample_times = _clock_seconds(clock)
+    except ValueError:
+        return _load_csv_slow(path, header, channels, times)
+    return PressureData(path, channels, pressures, sample_times)
+
+
+def _clock_seconds(clock):
+    # Vectorised HH:MM:SS parse, characters as a (n, 8) array of digits
+    if not len(clock):
+        return np.empty(0)
+    digits = clock.view("U1").reshape(-1, 8)[:, [0, 1, 3, 4, 6, 7]].astype(np.int64)
+    seconds = (digits[:, 0] * 10 + digits[:, 1]) * 3600 + \
+        (digits[:, 2] * 10 + digits[:, 3]) * 60 + digits[:, 4] * 10 + digits[:, 5]
+    # Past midnight
+    seconds += 86400 * np.cumsum(np.diff(seconds, prepend=seconds[0]) < 0)
+    return (seconds - seconds[0]).astype(np.float64)
+
+
+def _load_csv_slow(path, header, channels, times):
+    # Tolerates a torn last line, blank lines and stray spaces
+    rows = []
+    clock = []
+    with open(path, "r", newline="") as f:
+        reader = csv.reader(f, skipinitialspace=True)
+        next(reader, None)
+        for row in reader:
+            if len(row) != len(header):
+                continue
+            try:
+                rows.append([float(v) for v in row[1:1 + len(channels)]])
+            except ValueError:
+                continue
+            clock.append(row[0] if len(row[0]) == 8 else "00:00:00")
+    pressures = np.array(rows, dtype=np.float64).reshape(-1, len(channels))
+    sample_times = _clock_seconds(np.array(clock, dtype="U8")) if times else None
+    return PressureData(path, channels, pressures, sample_times)
+
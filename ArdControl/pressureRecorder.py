@@ -0,0 +1,320 @@
+"""
+File: pressureRecorder.py
+Description: Background writer for pressure recordings.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from recordingFormat import SEGMENT_BYTES, SEGMENT_SECONDS, is_event, open_writer
+
+
+class PressureRecorder:
+    """
+    Writes pressure samples to disk from a dedicated thread.
+
+    The GUI thread only puts samples on a bounded queue. The writer thread
+    takes them off in batches, writes each batch with one call, flushes
+    every FLUSH_INTERVAL_S and fsyncs every fsync_interval seconds, so a
+    slow disk (antivirus scans, network drives) never stalls plotting or
+    polling. Each fsync is preceded by a commit marker, so at most one
+    interval of data is at risk in a crash and the fsync cost is bounded.
+    If the queue fills, new samples are dropped and counted rather than
+    blocking the caller. Events (valve writes, steps, motor moves, macros)
+    travel through the same queue so they keep their order relative to
+    the samples. Long recordings roll over into segments listed in a
+    manifest, see recordingFormat.SegmentedRecordingWriter.
+
+    Open recordings are listed in a small journal file until they are
+    closed, so recordings interrupted by a crash can be found and
+    recovered on the next start.
+    """
+
+    QUEUE_SIZE = 20000          # Samples held while the disk is slow
+    BATCH_SIZE = 500            # Most samples written in one call
+    FLUSH_INTERVAL_S = 0.5
+    FSYNC_INTERVAL_S = 5.0
+
+    STOP_TIMEOUT_S = 5.0        # Longest wait for the writer to finish on stop
+
+    _STOP = object()            # Sentinel that wakes the writer thread to stop
+
+    def __init__(self, queue_size=QUEUE_SIZE, segment_bytes=SEGMENT_BYTES, segment_seconds=SEGMENT_SECONDS,
+                 fsync_interval=FSYNC_INTERVAL_S, journal_path=None):
+        """
+        Initialize the recorder.
+
+        Args:
+            queue_size (int): Maximum number of samples waiting to be written
+            segment_bytes (int): Segment size limit, None for no limit
+            segment_seconds (float): Segment duration limit, None for no limit
+            fsync_interval (float): Seconds between commits, None to leave syncing to the OS
+            journal_path (str): Journal of open recordings, None for no journal
+        """
+        self.queue_size = queue_size
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.fsync_interval = fsync_interval
+        self.journal_path = journal_path
+        self.commits = 0
+        self.path = None
+        self.samples_written = 0
+        self.samples_dropped = 0
+        self.events_written = 0
+        self.events_dropped = 0
+        self.queue_high_water = 0
+        self.write_errors = 0
+        self.writer_error = None    # Exception that ended the writer thread, if any
+        self._queue = None
+        self._thread = None
+        self._stop_event = None
+
+    @property
+    def recording(self):
+        return self._thread is not None
+
+    def start(self, path, channels, calibration=None):
+        """
+        Create the recording file and start the writer thread.
+
+        The file format follows the extension, .prec for the binary format
+        and csv otherwise.
+
+        Args:
+            path (str): Path of the recording file to create
+            channels (list[str]): Channel names
+            calibration (Calibration): Conversion from counts to pressure
+
+        Returns:
+            bool: True if the file was created
+        """
+        if self.recording:
+            self.stop()
+        try:
+            writer = open_writer(path, channels, calibration,
+                                 self.segment_bytes, self.segment_seconds)
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not open save file: {e}")
+            return False
+        self.path = path
+        self._update_journal(add=path)
+        self.samples_written = 0
+        self.samples_dropped = 0
+        self.events_written = 0
+        self.events_dropped = 0
+        self.queue_high_water = 0
+        self.write_errors = 0
+        self.writer_error = None
+        self.commits = 0
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(writer, self._queue, self._stop_event),
+            name="PressureRecorder", daemon=True)
+        self._thread.start()
+        return True
+
+    def record(self, timestamp, values):
+        """
+        Queue one sample for writing, never blocking.
+
+        Args:
+            timestamp (int): perf_counter_ns() time the sample was read
+            values (list[int]): Raw register counts
+
+        Returns:
+            bool: False if the sample was dropped
+        """
+        if not self.recording:
+            return False
+        try:
+            self._queue.put_nowait((timestamp, values))
+        except queue.Full:
+            self.samples_dropped += 1
+            return False
+        depth = self._queue.qsize()
+        if depth > self.queue_high_water:
+            self.queue_high_water = depth
+        return True
+
+    def record_event(self, timestamp, kind, data):
+        """
+        Queue one event for writing, never blocking.
+
+        Args:
+            timestamp (int): perf_counter_ns() time of the event
+            kind (str): Event kind, one of recordingFormat.EVENT_KINDS
+            data: JSON-serialisable details of the event
+
+        Returns:
+            bool: False if the event was dropped
+        """
+        if not self.recording:
+            return False
+        try:
+            self._queue.put_nowait((timestamp, kind, data))
+        except queue.Full:
+            self.events_dropped += 1
+            return False
+        return True
+
+    def stop(self):
+        """
+        Write everything still queued, close the file and stop the writer thread.
+
+        A writer that has not finished within STOP_TIMEOUT_S is left to
+        close the file on its own, and the recording stays in the journal
+        so it is checked for recovery on the next start.
+        """
+        if not self.recording:
+            return
+        self._stop_event.set()
+        if self._thread.is_alive():
+            # Wake a writer waiting on an empty queue, a full one is already busy
+            try:
+                self._queue.put_nowait(self._STOP)
+            except queue.Full:
+                pass
+            self._thread.join(timeout=self.STOP_TIMEOUT_S)
+        finished = not self._thread.is_alive()
+        self._thread = None
+        self._queue = None
+        self._stop_event = None
+        if not finished:
+            logging.error(
+                f"Recording writer not responding, {self.path} left to finish in the background and kept for recovery")
+            return
+        self._update_journal(remove=self.path)
+        logging.info(
+            f"Recording saved: {self.samples_written} samples, {self.samples_dropped} dropped, {self.events_written} events, peak queue {self.queue_high_water}")
+        if self.events_dropped:
+            logging.warning(
+                f"{self.events_dropped} events dropped while saving {self.path}")
+        if self.write_errors:
+            logging.error(
+                f"{self.write_errors} write errors while saving {self.path}")
+        if self.writer_error is not None:
+            logging.error(
+                f"Recording writer failed while saving {self.path}: {self.writer_error}")
+
+    def stats(self):
+        """
+        Recording counters.
+
+        Returns:
+            dict: Samples written and dropped, events written and dropped,
+                items queued now and queue high water mark
+        """
+        return {"written": self.samples_written,
+                "dropped": self.samples_dropped,
+                "events": self.events_written,
+                "events_dropped": self.events_dropped,
+                "commits": self.commits,
+                "queued": self._queue.qsize() if self.recording else 0,
+                "high_water": self.queue_high_water}
+
+    def _run(self, writer, samples, stop):
+        try:
+            self._write_loop(writer, samples, stop)
+        except Exception as e:
+            self._write_failed(e)
+        try:
+            writer.close()
+        except Exception as e:
+            self._write_failed(e)
+
+    def _write_failed(self, error):
+        self.write_errors += 1
+        # Anything but a disk error is a bug, keep the first for stop() to report
+        if self.writer_error is None and not isinstance(error, OSError):
+            self.writer_error = error
+
+    def _write_loop(self, writer, samples, stop):
+        last_flush = time.monotonic()
+        last_fsync = last_flush
+        stopping = False
+        while not stopping:
+            try:
+                batch = [samples.get(timeout=self.FLUSH_INTERVAL_S)]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(samples.get_nowait())
+                except queue.Empty:
+                    break
+            batch = [item for item in batch if item is not self._STOP]
+            # Once asked to stop, write what is still queued and finish
+            stopping = stop.is_set() and samples.empty()
+
+            if batch:
+                try:
+                    writer.write(batch)
+                    events = sum(1 for item in batch if is_event(item))
+                    self.events_written += events
+                    self.samples_written += len(batch) - events
+                except Exception as e:
+                    self._write_failed(e)
+
+            now = time.monotonic()
+            try:
+                if self.fsync_interval and (stopping or now - last_fsync >= self.fsync_interval):
+                    writer.commit()
+                    writer.flush()
+                    os.fsync(writer.fileno())
+                    self.commits += 1
+                    last_flush = last_fsync = now
+                elif stopping or now - last_flush >= self.FLUSH_INTERVAL_S:
+                    writer.flush()
+                    last_flush = now
+            except Exception as e:
+                self._write_failed(e)
+
+    def unfinished_recordings(self):
+        """
+        Recordings left open by an earlier run that did not stop cleanly.
+
+        Returns:
+            list[str]: Paths from the journal, excluding the current recording
+        """
+        return [path for path in self._read_journal()
+                if not (self.recording and path == self.path)]
+
+    def forget(self, path):
+        """Remove a recovered recording from the journal."""
+        self._update_journal(remove=path)
+
+    def _read_journal(self):
+        if not self.journal_path:
+            return []
+        try:
+            with open(self.journal_path, "r") as f:
+                return list(json.load(f))
+        except FileNotFoundError:
+            return []
+        except (OSError, json.JSONDecodeError, TypeError):
+            logging.error("Discarding unreadable recording journal")
+            return []
+
+    def _update_journal(self, add=None, remove=None):
+        if not self.journal_path:
+            return
+        paths = [path for path in self._read_journal() if path != remove]
+        if add is not None and add not in paths:
+            paths.append(add)
+        temp_path = f"{self.journal_path}.tmp"
+        try:
+            directory = os.path.dirname(self.journal_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            with open(temp_path, "w") as f:
+                json.dump(paths, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.journal_path)
+        except OSError as e:
+            logging.error(f"Could not update recording journal: {e}")
@@ -0,0 +1,46 @@
+"""
+File: pyqtgraphPlot.py
+Description: Live plot drawn with pyqtgraph, the fast alternative to the matplotlib plot.
+"""
+
+import pyqtgraph as pg
+
+from livePlot import LivePlot
+
+# Software rendering, no OpenGL needed
+pg.setConfigOptions(useOpenGL=False, antialias=False)
+
+
+class PyqtgraphPlot(LivePlot, pg.PlotWidget):
+    """
+    Live plot drawn with pyqtgraph, see LivePlot.
+
+    pyqtgraph paints the lines straight through Qt instead of rasterising
+    the whole figure through Agg, so a frame costs little more than
+    handing each line its points. Axis auto-ranging is off, the axes only
+    change with the window.
+    """
+
+    BACKEND = "pyqtgraph"
+
+    def __init__(self, parent, history=None):
+        pg.PlotWidget.__init__(self, background="w")
+        self.init_live_plot(parent, history)
+
+        self.lines = [self.plot(pen=pg.mkPen(color, width=2), skipFiniteCheck=True)
+                      for color in self.COLORS]
+        self.setLabel("bottom", "Time (s)")
+        self.setLabel("left", "mBar")
+        self.disableAutoRange()
+        self.setYRange(0, 11, padding=0)
+        self.show_window(self.window_s)
+
+    def show_window(self, seconds):
+        self.setXRange(-seconds, 0, padding=0)
+
+    def draw_frame(self):
+        for line, data in zip(self.lines, self.line_data()):
+            if data is None:
+                line.setData([], [])
+            else:
+                line.setData(*data)
@@ -0,0 +1,1051 @@
+"""
+File: recordingFormat.py
+Description: Writers for pressure recordings and the compact binary recording format.
+
+Binary recordings (.prec) are laid out as:
+
+    b"PREC", version (u16), header length (u32), JSON header, padding to 8 bytes
+    blocks of tag (4 bytes), payload length (u32), payload CRC-32 (u32),
+    payload padded to 8 bytes
+
+The JSON header describes the channels, calibration (with its ID) and record
+layout, and anchors the recording's monotonic clock to the wall clock.
+Samples hold the raw uint16 register counts, converted with the header's
+calibration when they are read, so a run can be re-calibrated later. Sample times are
+perf_counter_ns() readings taken as the Modbus reply arrived, stored as ns
+since the anchor. Samples are gathered into blocks of up to BLOCK_RECORDS
+records or BLOCK_SECONDS, and each batch of events from the writer thread
+becomes one block:
+
+    b"SMPL"  fixed-width sample records, memory-mapped by the reader
+    b"EVNT"  JSON list of [time, kind, data] events: valve writes, sequence
+             steps, motor moves and macros
+    b"CMIT"  commit marker, written just before each fsync
+    b"INDX"  first time, last time, first record and file offset of every
+             sample block, then the offset of every event block
+    b"PEND"  sample and event counts and the offset of the index block,
+             always the last block of a closed recording
+
+Samples and events share one clock, so a run can be rebuilt from the one
+file. A closed recording is opened from its index block, found through the
+end block, so a time range is found without scanning. A recording that was
+never closed has no end block and is read up to its last valid block,
+checking every block against its checksum, since a power cut can leave a
+commit marker on disk while the blocks before it are torn. recover() closes
+such a recording off with a "recovery" event marking the gap, so a
+recovered file cannot be mistaken for a complete one.
+
+Long recordings roll over into numbered segments that share one clock
+anchor. A JSON manifest next to the first segment lists every segment and
+the time range it covers, so a reader opens only the segments it needs.
+"""
+
+import collections
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+
+from calibration import Calibration, as_calibration, default_calibration
+
+MAGIC = b"PREC"
+VERSION = 6
+# Version 5 files have no index block and are read by walking their blocks
+READABLE_VERSIONS = (5, 6)
+
+SAMPLE_BLOCK = b"SMPL"
+EVENT_BLOCK = b"EVNT"
+COMMIT_BLOCK = b"CMIT"
+INDEX_BLOCK = b"INDX"
+END_BLOCK = b"PEND"
+
+_PREAMBLE = struct.Struct("<4sHI")
+_BLOCK = struct.Struct("<4sII")
+_END = struct.Struct("<QQQ")
+_COMMIT = struct.Struct("<QQq")
+_INDEX = struct.Struct("<QQ")
+INDEX_DTYPE = np.dtype([("first", "<i8"), ("last", "<i8"), ("start", "<u8")])
+# Index entries as stored in the index block, with the payload offset of each sample block
+_BLOCK_INDEX_DTYPE = np.dtype(INDEX_DTYPE.descr + [("offset", "<u8")])
+_BLOCK_TAGS = (SAMPLE_BLOCK, EVENT_BLOCK, COMMIT_BLOCK, INDEX_BLOCK, END_BLOCK)
+
+BINARY_EXTENSION = ".prec"
+CSV_EXTENSION = ".csv"
+MANIFEST_SUFFIX = ".manifest.json"
+CALIBRATION_SUFFIX = ".calibration.json"
+
+# Most records, and longest span, gathered into one sample block
+BLOCK_RECORDS = 4096
+BLOCK_SECONDS = 2.0
+
+# Default segment limits
+SEGMENT_BYTES = 256 * 1024 * 1024
+SEGMENT_SECONDS = 3600
+
+# Calibration of recordings made without one, see calibration.py
+DEFAULT_CALIBRATION = default_calibration().to_dict()
+
+# Event kinds written by the GUI, and by recover()
+EVENT_KINDS = ("sequence", "step", "valves", "motor", "macro", "recovery")
+
+# One event, time in ns since the clock anchor
+RecordingEvent = collections.namedtuple(
+    "RecordingEvent", ["time", "kind", "data"])
+
+
+def record_dtype(channel_count):
+    """
+    Record layout for a recording.
+
+    Args:
+        channel_count (int): Number of pressure channels
+
+    Returns:
+        np.dtype: Time in ns since the clock anchor, then one uint16 count per channel
+    """
+    return np.dtype([("time", "<i8"), ("values", "<u2", (channel_count,))])
+
+
+def to_pressure(counts, calibration=DEFAULT_CALIBRATION, channel=None):
+    """
+    Convert raw gauge counts to pressure.
+
+    Args:
+        counts (array_like): Register counts, one channel per column, or
+            all from one channel if channel is given
+        calibration: Calibration, or its dict form
+        channel (int): Channel of every count, from 0
+
+    Returns:
+        np.ndarray: Pressures, the same shape as counts
+    """
+    return as_calibration(calibration).convert(counts, channel)
+
+
+def is_recording_path(path):
+    """True if the path names a csv or binary recording file."""
+    return path.endswith(CSV_EXTENSION) or path.endswith(BINARY_EXTENSION)
+
+
+def is_event(item):
+    """True if a queued item is an event (time, kind, data) rather than a sample (time, values)."""
+    return len(item) == 3
+
+
+def clock_anchor():
+    """
+    Pair a wall-clock reading with a monotonic one.
+
+    Returns:
+        dict: time.time_ns() and time.perf_counter_ns() taken together
+    """
+    return {"wall_ns": time.time_ns(), "monotonic_ns": time.perf_counter_ns()}
+
+
+def sample_timing(times_ns):
+    """
+    Sample rate and gap statistics for a run of sample times.
+
+    Args:
+        times_ns (np.ndarray): Monotonic sample times (ns)
+
+    Returns:
+        dict: Sample count, duration, mean rate, interval statistics and gaps,
+            where a gap is an interval over twice the median interval
+    """
+    times_ns = np.asarray(times_ns, dtype=np.int64)
+    stats = {"samples": len(times_ns)}
+    if len(times_ns) < 2:
+        return stats
+    intervals = np.diff(times_ns) / 1e6
+    median = float(np.median(intervals))
+    gaps = intervals > 2 * median
+    duration = float(times_ns[-1] - times_ns[0]) / 1e9
+    stats.update({"duration_s": duration,
+                  "rate_hz": (len(times_ns) - 1) / duration if duration else 0.0,
+                  "median_interval_ms": median,
+                  "jitter_ms": float(np.std(intervals)),
+                  "max_interval_ms": float(np.max(intervals)),
+                  "gaps": int(np.count_nonzero(gaps)),
+                  "gap_time_s": float(np.sum(intervals[gaps])) / 1000})
+    return stats
+
+
+def _pack_block(tag, payload):
+    padding = b" " * (-len(payload) % 8)
+    return _BLOCK.pack(tag, len(payload), zlib.crc32(payload)) + payload + padding
+
+
+def _pack_index(index, sample_offsets, event_offsets):
+    entries = np.empty(len(index), dtype=_BLOCK_INDEX_DTYPE)
+    for field in INDEX_DTYPE.names:
+        entries[field] = index[field]
+    entries["offset"] = sample_offsets
+    return _INDEX.pack(len(index), len(event_offsets)) + entries.tobytes() + \
+        np.asarray(event_offsets, dtype="<u8").tobytes()
+
+
+def _write_json(path, data):
+    # Write via a temporary file so a crash never leaves a torn file
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(data, f, indent=1)
+    os.replace(temp_path, path)
+
+
+def manifest_path(path):
+    """Path of the manifest of a segmented recording, given its first segment or the manifest itself."""
+    if path.endswith(MANIFEST_SUFFIX):
+        return path
+    return os.path.splitext(path)[0] + MANIFEST_SUFFIX
+
+
+def calibration_path(path):
+    """Path of the calibration saved next to a csv recording, which has no header to hold it."""
+    return os.path.splitext(path)[0] + CALIBRATION_SUFFIX
+
+
+def segment_path(path, number):
+    """
+    Path of one segment of a recording.
+
+    Args:
+        path (str): Path of the recording, which is also its first segment
+        number (int): Segment number, from 1
+
+    Returns:
+        str: Path of the segment
+    """
+    if number == 1:
+        return path
+    stem, extension = os.path.splitext(path)
+    return f"{stem}_{number:03d}{extension}"
+
+
+def open_writer(path, channels, calibration=None, segment_bytes=None, segment_seconds=None):
+    """
+    Create the writer matching a recording file's extension.
+
+    Args:
+        path (str): Path of the recording file
+        channels (list[str]): Channel names
+        calibration (Calibration): Conversion from counts to pressure, default if None
+        segment_bytes (int): Start a new segment at this size, None for no limit
+        segment_seconds (float): Start a new segment after this long, None for no limit
+
+    Returns:
+        The open writer, segmented if either limit is set
+    """
+    calibration = as_calibration(calibration)
+    if len(calibration.channels) != len(channels):
+        raise ValueError(
+            f"Calibration {calibration.id} has {len(calibration.channels)} channels, recording has {len(channels)}")
+    if segment_bytes or segment_seconds:
+        return SegmentedRecordingWriter(path, channels, calibration,
+                                        segment_bytes, segment_seconds)
+    return _open_file_writer(path, channels, calibration)
+
+
+def _open_file_writer(path, channels, calibration, anchor=None):
+    if path.endswith(BINARY_EXTENSION):
+        return BinaryRecordingWriter(path, channels, calibration, anchor)
+    return CsvRecordingWriter(path, channels, anchor, calibration)
+
+
+class CsvRecordingWriter:
+    """
+    Writes the original ``HH:MM:SS, p1, p2, p3, p4`` text layout.
+
+    Counts are converted to pressure as they are written. A trailing
+    column carries each sample's monotonic timestamp in ns, so existing
+    readers that pick columns by name are unaffected. Events are not
+    written, the csv layout only has room for samples, and the
+    calibration is saved next to the file, see calibration_path().
+    """
+
+    def __init__(self, path, channels, anchor=None, calibration=None):
+        self.path = path
+        self.anchor = anchor or clock_anchor()
+        self.calibration = as_calibration(calibration)
+        _write_json(calibration_path(path), self.calibration.to_dict())
+        self._file = open(path, "w")
+        self._file.write(
+            ",".join(["Time"] + list(channels) + ["Monotonic (ns)"]) + "\n")
+
+    def write(self, batch):
+        """
+        Write a batch of samples.
+
+        Args:
+            batch (list[tuple]): (perf_counter_ns() time, counts) per sample,
+                events are skipped
+        """
+        samples = [item for item in batch if not is_event(item)]
+        if not samples:
+            return
+        wall_offset = self.anchor["wall_ns"] - self.anchor["monotonic_ns"]
+        pressures = self.calibration.convert([counts for _, counts in samples]).tolist()
+        self._file.writelines(
+            f"{time.strftime('%H:%M:%S', time.localtime((timestamp + wall_offset) / 1e9))}, {', '.join(str(v) for v in values)}, {timestamp}\n"
+            for (timestamp, _), values in zip(samples, pressures))
+
+    def flush(self):
+        self._file.flush()
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def tell(self):
+        return self._file.tell()
+
+    def commit(self):
+        """Nothing to mark, whole lines are the only framing in a csv file."""
+
+    def close(self):
+        self._file.close()
+
+
+class BinaryRecordingWriter:
+    """
+    Writes sample and event blocks to a .prec file.
+
+    Samples are held back until they fill a block of block_records or span
+    block_seconds, and a commit or close writes whatever is held, so
+    commits still cover every sample written before them. The index of the
+    blocks is written when the file is closed.
+    """
+
+    def __init__(self, path, channels, calibration, anchor=None,
+                 block_records=BLOCK_RECORDS, block_seconds=BLOCK_SECONDS):
+        """
+        Create the file and write its header.
+
+        Args:
+            path (str): Path of the .prec file
+            channels (list[str]): Channel names
+            calibration (Calibration): Conversion from counts to pressure
+            anchor (dict): Clock anchor shared with earlier segments, new if None
+            block_records (int): Most records in one sample block
+            block_seconds (float): Longest span of one sample block
+        """
+        self.path = path
+        self.dtype = record_dtype(len(channels))
+        self.anchor = anchor or clock_anchor()
+        self.block_records = block_records
+        self.block_ns = int(block_seconds * 1e9)
+        self.records = 0
+        self.events = 0
+        self._pending = []          # Record arrays not yet written
+        self._pending_records = 0
+        self._index = []            # (first, last, start) of each sample block
+        self._sample_offsets = []
+        self._event_offsets = []
+
+        header = {"channels": list(channels),
+                  "calibration": calibration.to_dict(),
+                  "anchor": self.anchor,
+                  "start_time_text": time.strftime("%Y-%m-%d %H:%M:%S",
+                                                   time.localtime(self.anchor["wall_ns"] / 1e9)),
+                  "record": {"time": "int64 ns since anchor monotonic_ns",
+                             "values": f"uint16 counts x {len(channels)}"},
+                  "record_size": self.dtype.itemsize,
+                  "event_kinds": list(EVENT_KINDS)}
+        header_bytes = json.dumps(header).encode()
+        # Pad so the blocks start on an 8 byte boundary
+        header_bytes += b" " * (-(_PREAMBLE.size + len(header_bytes)) % 8)
+
+        self._file = open(path, "wb")
+        self._file.write(_PREAMBLE.pack(MAGIC, VERSION, len(header_bytes)))
+        self._file.write(header_bytes)
+
+    def write(self, batch):
+        """
+        Write a batch of samples and events.
+
+        Args:
+            batch (list[tuple]): (perf_counter_ns() time, counts) per sample
+                and (perf_counter_ns() time, kind, data) per event
+        """
+        origin = self.anchor["monotonic_ns"]
+        samples = [item for item in batch if not is_event(item)]
+        events = [[item[0] - origin, item[1], item[2]]
+                  for item in batch if is_event(item)]
+        if samples:
+            records = np.empty(len(samples), dtype=self.dtype)
+            records["time"] = [timestamp - origin for timestamp, _ in samples]
+            records["values"] = [counts for _, counts in samples]
+            self._pending.append(records)
+            self._pending_records += len(records)
+            if self._pending_records >= self.block_records or \
+                    records["time"][-1] - self._pending[0]["time"][0] >= self.block_ns:
+                self._write_samples()
+        if events:
+            self._event_offsets.append(self._file.tell() + _BLOCK.size)
+            self._write_block(EVENT_BLOCK, json.dumps(events).encode())
+            self.events += len(events)
+
+    def flush(self):
+        """Write the held samples if they have waited block_seconds, then flush the file."""
+        if self._pending and time.perf_counter_ns() - self.anchor["monotonic_ns"] - \
+                self._pending[0]["time"][0] >= self.block_ns:
+            self._write_samples()
+        self._file.flush()
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def tell(self):
+        return self._file.tell()
+
+    def commit(self):
+        """Write the held samples and a commit marker, to be followed by a flush and fsync."""
+        self._write_samples()
+        self._write_block(COMMIT_BLOCK, _COMMIT.pack(
+            self.records, self.events, time.perf_counter_ns() - self.anchor["monotonic_ns"]))
+
+    def close(self):
+        """Write the held samples, the index and the end block, then close the file."""
+        self._write_samples()
+        index_offset = self._file.tell()
+        self._write_block(INDEX_BLOCK, _pack_index(
+            np.array(self._index, dtype=INDEX_DTYPE), self._sample_offsets, self._event_offsets))
+        self._write_block(END_BLOCK, _END.pack(self.records, self.events, index_offset))
+        self._file.close()
+
+    def _write_samples(self):
+        if not self._pending:
+            return
+        records = self._pending[0] if len(self._pending) == 1 else np.concatenate(self._pending)
+        self._pending = []
+        self._pending_records = 0
+        self._index.append((records["time"][0], records["time"][-1], self.records))
+        self._sample_offsets.append(self._file.tell() + _BLOCK.size)
+        self._write_block(SAMPLE_BLOCK, records.tobytes())
+        self.records += len(records)
+
+    def _write_block(self, tag, payload):
+        self._file.write(_pack_block(tag, payload))
+
+
+class SegmentedRecordingWriter:
+    """
+    Rolls a recording over into numbered segments.
+
+    A new segment starts between batches once the current one reaches
+    max_bytes or spans max_seconds. Every segment shares the first one's
+    clock anchor. The manifest is rewritten, via a temporary file, whenever
+    a segment opens or closes, so the segment being written is always
+    listed and marked incomplete until it is closed.
+    """
+
+    def __init__(self, path, channels, calibration, max_bytes=SEGMENT_BYTES, max_seconds=SEGMENT_SECONDS):
+        """
+        Open the first segment and write the manifest.
+
+        Args:
+            path (str): Path of the recording, used for the first segment
+            channels (list[str]): Channel names
+            calibration (Calibration): Conversion from counts to pressure
+            max_bytes (int): Segment size limit, None for no limit
+            max_seconds (float): Segment duration limit, None for no limit
+        """
+        self.path = path
+        self.channels = list(channels)
+        self.calibration = calibration
+        self.max_bytes = max_bytes
+        self.max_ns = int(max_seconds * 1e9) if max_seconds else None
+        self.anchor = clock_anchor()
+        self.segments = []
+        self._writer = None
+        self._open_segment()
+
+    def write(self, batch):
+        """Write a batch to the current segment, then roll over if it is full."""
+        self._writer.write(batch)
+        segment = self.segments[-1]
+        times = [item[0] - self.anchor["monotonic_ns"]
+                 for item in batch if not is_event(item)]
+        if times:
+            if segment["first"] is None:
+                segment["first"] = times[0]
+            segment["last"] = times[-1]
+            segment["samples"] += len(times)
+
+        full = self.max_bytes and self._writer.tell() >= self.max_bytes
+        if self.max_ns and segment["first"] is not None:
+            full = full or segment["last"] - segment["first"] >= self.max_ns
+        if full:
+            self._close_segment()
+            self._open_segment()
+            logging.info(
+                f"Recording continues in {self.segments[-1]['file']}")
+
+    def flush(self):
+        self._writer.flush()
+
+    def fileno(self):
+        return self._writer.fileno()
+
+    def tell(self):
+        return self._writer.tell()
+
+    def commit(self):
+        self._writer.commit()
+
+    def close(self):
+        """Close the last segment and mark it complete in the manifest."""
+        self._close_segment()
+
+    def _open_segment(self):
+        path = segment_path(self.path, len(self.segments) + 1)
+        self._writer = _open_file_writer(
+            path, self.channels, self.calibration, self.anchor)
+        self.segments.append({"file": os.path.basename(path),
+                              "samples": 0,
+                              "first": None,
+                              "last": None,
+                              "complete": False})
+        self._write_manifest()
+
+    def _close_segment(self):
+        self._writer.close()
+        self.segments[-1]["complete"] = True
+        self._write_manifest()
+
+    def _write_manifest(self):
+        _write_json(manifest_path(self.path), {"channels": self.channels,
+                                               "calibration": self.calibration.to_dict(),
+                                               "anchor": self.anchor,
+                                               "segments": self.segments})
+
+
+class RecordingReader:
+    """
+    Memory-mapped access to a .prec recording.
+
+    Attributes:
+        header (dict): JSON header of the recording
+        chunks (list[np.ndarray]): Structured views of each sample block (time, values)
+        index (np.ndarray): First time, last time and first record of each sample block
+        events (list[RecordingEvent]): Every event, in time order
+        event_index (dict): Positions in events of each event kind
+        complete (bool): False if the recording was not closed cleanly
+        committed (int): Records written before the last valid commit marker
+        valid_bytes (int): Length of the file up to the end of its last valid block
+        damaged (bool): True if a torn or corrupt block follows the valid ones
+    """
+
+    def __init__(self, path):
+        """
+        Open a recording.
+
+        Args:
+            path (str): Path of the .prec file
+
+        Raises:
+            ValueError: If the file is not a pressure recording
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, header_length = _PREAMBLE.unpack(
+                f.read(_PREAMBLE.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a pressure recording")
+            if version not in READABLE_VERSIONS:
+                raise ValueError(
+                    f"{path} uses recording format version {version}")
+            self.header = json.loads(f.read(header_length))
+        self.dtype = record_dtype(len(self.header["channels"]))
+        self.chunks = []
+        self.events = []
+        self.complete = False
+        self.committed = 0
+        self._records = None
+        self._calibration = None
+        # Payload offsets of the sample and event blocks, for rewriting the index
+        self._sample_offsets = []
+        self._event_offsets = []
+
+        size = os.path.getsize(path)
+        start = _PREAMBLE.size + header_length
+        data = np.memmap(path, dtype=np.uint8, mode="r") if size > start else b""
+        if not self._open_index(data, start, size):
+            self._scan(data, start, size)
+        self.events.sort(key=lambda event: event.time)
+        self.event_index = collections.defaultdict(list)
+        for position, event in enumerate(self.events):
+            self.event_index[event.kind].append(position)
+
+    def __len__(self):
+        return int(sum(len(chunk) for chunk in self.chunks))
+
+    @property
+    def records(self):
+        """Every record as one array, joined from the sample blocks on first use."""
+        if self._records is None:
+            if len(self.chunks) == 1:
+                self._records = self.chunks[0]
+            elif self.chunks:
+                self._records = np.concatenate(self.chunks)
+            else:
+                self._records = np.empty(0, dtype=self.dtype)
+        return self._records
+
+    @property
+    def anchor(self):
+        """Wall-clock and monotonic times (ns) taken together when recording began."""
+        return self.header["anchor"]
+
+    @property
+    def calibration(self):
+        """Calibration that was active while recording."""
+        if self._calibration is None:
+            self._calibration = Calibration.from_dict(
+                self.header["calibration"], len(self.header["channels"]))
+        return self._calibration
+
+    def pressures(self, records=None, calibration=None):
+        """
+        Pressures of the given records (all records by default).
+
+        Args:
+            records (np.ndarray): Structured records from this recording
+            calibration (Calibration): Calibration to apply instead of the recorded one
+
+        Returns:
+            np.ndarray: Pressures, one column per channel
+        """
+        if records is None:
+            records = self.records
+        return to_pressure(records["values"], calibration or self.calibration)
+
+    def monotonic_ns(self, records=None):
+        """perf_counter_ns() times of the given records (all records by default)."""
+        if records is None:
+            records = self.records
+        return records["time"] + self.anchor["monotonic_ns"]
+
+    def wall_time(self, records=None):
+        """Wall-clock times (s since the epoch) of the given records (all records by default)."""
+        if records is None:
+            records = self.records
+        return (records["time"] + self.anchor["wall_ns"]) / 1e9
+
+    def timing_stats(self):
+        """Sample rate and gap statistics of the whole recording, see sample_timing()."""
+        return sample_timing(self.records["time"])
+
+    def time_range(self, start, end):
+        """
+        Records with start <= time < end.
+
+        Only the sample blocks that overlap the range are searched.
+
+        Args:
+            start (float): Range start (s since the clock anchor)
+            end (float): Range end (s since the clock anchor)
+
+        Returns:
+            np.ndarray: Structured records in the range
+        """
+        return self._range_ns(int(start * 1e9), int(end * 1e9))
+
+    def iter_chunks(self):
+        """Yield the records block by block, so large files are never loaded whole."""
+        yield from self.chunks
+
+    def events_of(self, kind):
+        """
+        Events of one kind, in time order.
+
+        Args:
+            kind (str): Event kind, one of EVENT_KINDS
+
+        Returns:
+            list[RecordingEvent]: The events
+        """
+        return [self.events[position] for position in self.event_index.get(kind, [])]
+
+    def steps(self):
+        """
+        Time span of every recorded sequence step.
+
+        A step ends where the next step starts, at the end of its sequence,
+        or at the last sample.
+
+        Returns:
+            list[tuple]: (step index, step type, start ns, end ns) per step
+        """
+        bounds = [event for event in self.events
+                  if event.kind == "step" or event.kind == "sequence"]
+        last = int(self.index["last"][-1]) + 1 if len(self.index) else 0
+        spans = []
+        for i, event in enumerate(bounds):
+            if event.kind != "step":
+                continue
+            end = bounds[i + 1].time if i + 1 < len(bounds) else max(last, event.time)
+            spans.append((event.data["index"], event.data["type"], event.time, end))
+        return spans
+
+    def samples_during_step(self, step_index):
+        """
+        Records taken while a sequence step was running.
+
+        Args:
+            step_index (int): Index of the step in its sequence
+
+        Returns:
+            np.ndarray: Structured records of the first run of that step,
+                empty if the step was not recorded
+        """
+        for index, _, start, end in self.steps():
+            if index == step_index:
+                return self._range_ns(start, end)
+        return self.records[:0]
+
+    def _range_ns(self, start, end):
+        if not len(self.index):
+            return self.records[:0]
+        first = np.searchsorted(self.index["last"], start, side="left")
+        last = np.searchsorted(self.index["first"], end, side="left")
+        if first >= last:
+            return self.records[:0]
+        if last - first == 1:
+            records = self.chunks[first]
+        else:
+            records = np.concatenate(self.chunks[first:last])
+        times = records["time"]
+        return records[np.searchsorted(times, start, side="left"):
+                       np.searchsorted(times, end, side="left")]
+
+    def _open_index(self, data, start, size):
+        # A closed recording ends with its end block, which points at the index block
+        end = size - _BLOCK.size - _END.size
+        if end < start:
+            return False
+        try:
+            tag, length, crc = _BLOCK.unpack_from(data, end)
+            if tag != END_BLOCK or length != _END.size or \
+                    zlib.crc32(data[end + _BLOCK.size:size]) != crc:
+                return False
+            records, _, index_offset = _END.unpack_from(data, end + _BLOCK.size)
+            if not start <= index_offset < end:
+                return False
+            tag, length, crc = _BLOCK.unpack_from(data, index_offset)
+            payload = index_offset + _BLOCK.size
+            if tag != INDEX_BLOCK or payload + length > end or \
+                    zlib.crc32(data[payload:payload + length]) != crc:
+                return False
+            sample_count, event_count = _INDEX.unpack_from(data, payload)
+            entries = np.frombuffer(data, dtype=_BLOCK_INDEX_DTYPE, count=sample_count,
+                                    offset=payload + _INDEX.size)
+            event_offsets = np.frombuffer(data, dtype="<u8", count=event_count,
+                                          offset=payload + _INDEX.size + entries.nbytes)
+            counts = np.diff(entries["start"], append=records)
+            chunks = [np.frombuffer(data, dtype=self.dtype, count=int(count), offset=int(offset))
+                      for offset, count in zip(entries["offset"], counts)]
+            events = []
+            for offset in event_offsets.tolist():
+                tag, length, crc = _BLOCK.unpack_from(data, offset - _BLOCK.size)
+                block = bytes(data[offset:offset + length])
+                if tag != EVENT_BLOCK or zlib.crc32(block) != crc:
+                    return False
+                events.extend(RecordingEvent(*event) for event in json.loads(block))
+        except (struct.error, ValueError):
+            return False
+
+        self.chunks = chunks
+        self.events = events
+        self.index = np.empty(len(entries), dtype=INDEX_DTYPE)
+        for field in INDEX_DTYPE.names:
+            self.index[field] = entries[field]
+        self._sample_offsets = entries["offset"].tolist()
+        self._event_offsets = event_offsets.tolist()
+        self.complete = True
+        self.committed = records
+        self.valid_bytes = size
+        self.damaged = False
+        return True
+
+    def _scan(self, data, start, size):
+        # Walk the blocks of a recording that was not closed, or has no index,
+        # stopping at a block cut short by a crash
+        blocks = []
+        offset = start
+        while offset + _BLOCK.size <= size:
+            tag, length, crc = _BLOCK.unpack_from(data, offset)
+            payload = offset + _BLOCK.size
+            if payload + length > size or tag not in _BLOCK_TAGS:
+                break
+            blocks.append((tag, payload, length, crc))
+            offset = payload + length + (-length % 8)
+            if tag == END_BLOCK:
+                break
+        offset = start
+        records = 0
+        for tag, payload, length, crc in blocks:
+            # Stop at a block garbled by a crash
+            if zlib.crc32(data[payload:payload + length]) != crc:
+                break
+            if tag == SAMPLE_BLOCK:
+                chunk = np.frombuffer(
+                    data, dtype=self.dtype, count=length // self.dtype.itemsize, offset=payload)
+                if len(chunk):
+                    self.chunks.append(chunk)
+                    self._sample_offsets.append(payload)
+                    records += len(chunk)
+            elif tag == EVENT_BLOCK:
+                self.events.extend(RecordingEvent(*event) for event in json.loads(
+                    bytes(data[payload:payload + length])))
+                self._event_offsets.append(payload)
+            elif tag == COMMIT_BLOCK:
+                self.committed = records
+            elif tag == END_BLOCK:
+                self.complete = True
+                self.committed = records
+            offset = payload + length + (-length % 8)
+        self.valid_bytes = offset
+        self.damaged = not self.complete and offset < size
+        self.index = self._build_index()
+
+    def _build_index(self):
+        index = np.zeros(len(self.chunks), dtype=INDEX_DTYPE)
+        for i, chunk in enumerate(self.chunks):
+            index[i] = (chunk["time"][0], chunk["time"][-1],
+                        index["start"][i - 1] + len(self.chunks[i - 1]) if i else 0)
+        return index
+
+
+class SegmentedRecording:
+    """
+    Reads a binary recording split into segments.
+
+    Segments are opened only when a request touches their time range. A
+    segment still marked incomplete has no known end, so it is included in
+    every range after its start and read up to its last whole block.
+
+    Attributes:
+        manifest (dict): Channels, calibration, clock anchor and segment list
+        segments (list[dict]): File, sample count, first and last time (ns
+            since the anchor) and complete flag of each segment
+    """
+
+    def __init__(self, path):
+        """
+        Open a segmented recording.
+
+        Args:
+            path (str): Path of the manifest or of the first segment
+        """
+        self.path = manifest_path(path)
+        with open(self.path, "r") as f:
+            self.manifest = json.load(f)
+        self.segments = self.manifest["segments"]
+        self._readers = {}
+
+    def __len__(self):
+        return int(sum(segment["samples"] for segment in self.segments))
+
+    @property
+    def anchor(self):
+        """Clock anchor shared by every segment."""
+        return self.manifest["anchor"]
+
+    def segment_reader(self, number):
+        """
+        Reader for one segment, opened on first use.
+
+        Args:
+            number (int): Segment number, from 1
+
+        Returns:
+            RecordingReader: The segment's reader
+        """
+        if number not in self._readers:
+            self._readers[number] = RecordingReader(os.path.join(
+                os.path.dirname(self.path), self.segments[number - 1]["file"]))
+        return self._readers[number]
+
+    def release(self, number):
+        """Close a segment's reader once it is no longer needed."""
+        self._readers.pop(number, None)
+
+    def segments_for(self, start, end):
+        """
+        Segments that may hold records with start <= time < end.
+
+        Args:
+            start (float): Range start (s since the clock anchor)
+            end (float): Range end (s since the clock anchor)
+
+        Returns:
+            list[int]: Segment numbers, from 1
+        """
+        start = int(start * 1e9)
+        end = int(end * 1e9)
+        numbers = []
+        for number, segment in enumerate(self.segments, 1):
+            if segment["first"] is None:
+                # Nothing flushed to the manifest yet, only an open segment
+                if not segment["complete"]:
+                    numbers.append(number)
+                continue
+            last = segment["last"] if segment["complete"] else None
+            if segment["first"] < end and (last is None or last >= start):
+                numbers.append(number)
+        return numbers
+
+    def time_range(self, start, end):
+        """
+        Records with start <= time < end, across segments.
+
+        Args:
+            start (float): Range start (s since the clock anchor)
+            end (float): Range end (s since the clock anchor)
+
+        Returns:
+            np.ndarray: Structured records in the range
+        """
+        parts = [self.segment_reader(number).time_range(start, end)
+                 for number in self.segments_for(start, end)]
+        if not parts:
+            return np.empty(0, dtype=record_dtype(len(self.manifest["channels"])))
+        return np.concatenate(parts) if len(parts) > 1 else parts[0]
+
+
+def recover(path):
+    """
+    Close off a recording left unfinished by a crash.
+
+    Binary files are cut back to their last valid block, then given a
+    "recovery" event at the time of the last record, which marks the gap
+    to whatever was recorded next, an index and an end block. A csv file
+    is cut back to its last whole line and the gap noted under "recovery"
+    in the calibration saved next to it. For a segmented recording every
+    unfinished segment is recovered and the manifest updated.
+
+    Args:
+        path (str): Path of the recording or its first segment
+
+    Returns:
+        dict: Records kept and bytes discarded, or None if the recording
+            was already complete
+
+    Raises:
+        OSError: If the recording cannot be read or rewritten
+        ValueError: If a binary segment is not a pressure recording
+    """
+    manifest = manifest_path(path)
+    if not os.path.exists(manifest):
+        return _recover_file(path)
+
+    with open(manifest, "r") as f:
+        data = json.load(f)
+    summary = None
+    for number, segment in enumerate(data["segments"], 1):
+        if segment["complete"]:
+            continue
+        segment_file = os.path.join(os.path.dirname(manifest), segment["file"])
+        result = _recover_file(segment_file) if os.path.exists(segment_file) else None
+        if result is not None:
+            segment.update({"samples": result["samples"],
+                            "first": result["first"],
+                            "last": result["last"]})
+            summary = {"samples": (summary or {}).get("samples", 0) + result["samples"],
+                       "lost_bytes": (summary or {}).get("lost_bytes", 0) + result["lost_bytes"]}
+        segment["complete"] = True
+        segment["recovered"] = True
+    _write_json(manifest, data)
+    return summary or {"samples": 0, "lost_bytes": 0}
+
+
+def _recover_file(path):
+    if not path.endswith(BINARY_EXTENSION):
+        return _recover_csv(path)
+
+    reader = RecordingReader(path)
+    if reader.complete:
+        return None
+    valid_bytes = reader.valid_bytes
+    lost_bytes = os.path.getsize(path) - valid_bytes
+    records = len(reader)
+    events = len(reader.events) + 1
+    index = reader.index.copy()
+    sample_offsets = list(reader._sample_offsets)
+    event_offsets = list(reader._event_offsets)
+    first = int(reader.index["first"][0]) if records else None
+    last = int(reader.index["last"][-1]) if records else None
+    gap_time = max([last or 0] + [event.time for event in reader.events[-1:]])
+    event = [[gap_time, "recovery",
+              {"committed": reader.committed, "records": records,
+               "lost_bytes": lost_bytes, "recovered": time.time()}]]
+    # Release the memory map, Windows cannot truncate a mapped file
+    del reader
+    recovery_block = _pack_block(EVENT_BLOCK, json.dumps(event).encode())
+    event_offsets.append(valid_bytes + _BLOCK.size)
+    index_offset = valid_bytes + len(recovery_block)
+    with open(path, "rb+") as f:
+        f.truncate(valid_bytes)
+        f.seek(valid_bytes)
+        f.write(recovery_block)
+        f.write(_pack_block(INDEX_BLOCK, _pack_index(index, sample_offsets, event_offsets)))
+        f.write(_pack_block(END_BLOCK, _END.pack(records, events, index_offset)))
+    return {"samples": records, "lost_bytes": lost_bytes, "first": first, "last": last}
+
+
+def _recover_csv(path):
+    with open(path, "rb+") as f:
+        text = f.read()
+        end = text.rfind(b"\n") + 1
+        f.truncate(end)
+    samples = max(text.count(b"\n", 0, end) - 1, 0)
+    lost_bytes = len(text) - end
+    # The csv layout has no room for events, so the gap is noted in the
+    # calibration file beside it, written with the default for older files
+    sidecar = calibration_path(path)
+    try:
+        with open(sidecar, "r") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        data = default_calibration().to_dict()
+    lines = text[:end].splitlines()
+    gap_time = None
+    if samples and lines[0].rstrip().endswith(b"Monotonic (ns)"):
+        # Monotonic time of the last sample kept, where the gap starts
+        try:
+            gap_time = int(lines[-1].rsplit(b",", 1)[-1])
+        except ValueError:
+            pass
+    data["recovery"] = {"time": gap_time, "records": samples,
+                        "lost_bytes": lost_bytes, "recovered": time.time()}
+    _write_json(sidecar, data)
+    return {"samples": samples, "lost_bytes": lost_bytes, "first": None, "last": None}
+
+
+def export_csv(source, destination=None):
+    """
+    Stream the samples of a binary recording to the csv layout written by the GUI.
+
+    Args:
+        source (str): Path of the .prec file
+        destination (str): Path of the csv file, defaults to the source with a .csv extension
+
+    Returns:
+        str: Path of the csv file
+    """
+    reader = RecordingReader(source)
+    if destination is None:
+        destination = os.path.splitext(source)[0] + CSV_EXTENSION
+    writer = CsvRecordingWriter(
+        destination, reader.header["channels"], reader.anchor, reader.calibration)
+    try:
+        for chunk in reader.iter_chunks():
+            writer.write(zip(reader.monotonic_ns(chunk).tolist(),
+                             chunk["values"].tolist()))
+    finally:
+        writer.close()
+    return destination
@@ -0,0 +1,233 @@
+"""
+File: recordingReplay.py
+Description: Plays a recorded run back through the live plot and step display.
+"""
+
+import csv
+import logging
+import os
+import time
+
+from PyQt6 import QtCore
+
+from calibration import default_calibration, load_calibration
+from recordingFormat import (BINARY_EXTENSION, RecordingReader,
+                             SegmentedRecording, calibration_path, is_event, manifest_path)
+
+
+def iter_recording(path):
+    """
+    Stream the samples and events of a recording in time order.
+
+    Binary recordings are read block by block from their memory map, one
+    segment at a time, and csv recordings line by line, so no file is
+    loaded whole. Items use the recorder's layout: (time, counts) for a
+    sample and (time, kind, data) for an event, times in ns.
+
+    Args:
+        path (str): Recording, first segment or manifest
+
+    Yields:
+        tuple: The next sample or event
+    """
+    if os.path.exists(manifest_path(path)):
+        recording = SegmentedRecording(path)
+        for number in range(1, len(recording.segments) + 1):
+            try:
+                reader = recording.segment_reader(number)
+            except FileNotFoundError:
+                logging.warning(
+                    f"Replay: segment {recording.segments[number - 1]['file']} is missing")
+                continue
+            yield from _iter_binary(reader)
+            # Release each segment once it has been played
+            recording.release(number)
+    elif path.endswith(BINARY_EXTENSION):
+        yield from _iter_binary(RecordingReader(path))
+    else:
+        yield from _iter_csv(path)
+
+
+def _iter_binary(reader):
+    events = reader.events
+    e = 0
+    for chunk in reader.iter_chunks():
+        times = chunk["time"].tolist()
+        counts = chunk["values"].tolist()
+        for sample in zip(times, counts):
+            while e < len(events) and events[e].time <= sample[0]:
+                yield tuple(events[e])
+                e += 1
+            yield sample
+    for event in events[e:]:
+        yield tuple(event)
+
+
+def _iter_csv(path):
+    # csv recordings hold pressures, turned back into counts for the plot with
+    # the calibration saved next to them, or the default for older files
+    calibration = load_calibration(calibration_path(path)) or default_calibration()
+    with open(path, "r", newline="") as f:
+        rows = csv.reader(f, skipinitialspace=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        monotonic = header[-1].startswith("Monotonic")
+        channels = slice(1, len(header) - 1 if monotonic else len(header))
+
+        if monotonic:
+            for row in rows:
+                if len(row) == len(header):
+                    yield (int(row[-1]), calibration.to_counts(
+                        [float(v) for v in row[channels]]).tolist())
+            return
+
+        # Older files only have whole seconds, spread each second's samples evenly
+        second, day, pending = None, 0, []
+        for row in rows:
+            if len(row) != len(header):
+                continue
+            h, m, s = (int(part) for part in row[0].split(":"))
+            now = h * 3600 + m * 60 + s + day
+            if second is not None and now < second:
+                # Past midnight
+                day += 86400
+                now += 86400
+            if now != second and pending:
+                yield from _spread(second, pending)
+                pending = []
+            second = now
+            pending.append(calibration.to_counts([float(v) for v in row[channels]]).tolist())
+        if pending:
+            yield from _spread(second, pending)
+
+
+def _spread(second, samples):
+    step = 1_000_000_000 // len(samples)
+    for i, counts in enumerate(samples):
+        yield (second * 1_000_000_000 + i * step, counts)
+
+
+class RecordingReplay(QtCore.QObject):
+    """
+    Replays a recording at a chosen speed, or one sample at a time.
+
+    A frame timer advances a virtual clock by the elapsed time times the
+    speed, then emits every sample up to it as one batch, so a fast replay
+    costs one redraw per frame rather than one per sample. Events between
+    samples are emitted in order.
+    """
+
+    samples_ready = QtCore.pyqtSignal(list)         # Counts of each sample
+    event_ready = QtCore.pyqtSignal(str, object)    # Event kind and data
+    position_changed = QtCore.pyqtSignal(float)     # Seconds into the recording
+    finished = QtCore.pyqtSignal()
+
+    FRAME_MS = 33
+    MIN_SPEED = 1
+    MAX_SPEED = 1000
+
+    def __init__(self, path, parent=None):
+        """
+        Open a recording for replay.
+
+        Args:
+            path (str): Recording, first segment or manifest
+            parent (QObject): Qt parent
+        """
+        super().__init__(parent)
+        self.path = path
+        self.speed = 1
+        self._items = iter_recording(path)
+        self._next = None
+        self._origin = None
+        self._position = 0
+        self._last_tick = None
+        self._timer = QtCore.QTimer(self)
+        self._timer.timeout.connect(self._tick)
+
+    @property
+    def playing(self):
+        return self._timer.isActive()
+
+    @property
+    def position(self):
+        """Seconds replayed so far."""
+        return self._position / 1e9
+
+    def set_speed(self, speed):
+        """Set the replay speed, clamped to MIN_SPEED..MAX_SPEED times real time."""
+        self.speed = min(max(speed, self.MIN_SPEED), self.MAX_SPEED)
+
+    def play(self):
+        """Start or resume the replay."""
+        self._last_tick = time.perf_counter()
+        self._timer.start(self.FRAME_MS)
+
+    def pause(self):
+        self._timer.stop()
+
+    def step_frame(self):
+        """Pause and emit the next sample, with any events before it."""
+        self.pause()
+        item = self._peek()
+        if item is None:
+            self._finish()
+            return
+        while item is not None and is_event(item):
+            self._emit_until(item[0] - self._origin)
+            item = self._peek()
+        if item is not None:
+            self._emit_until(item[0] - self._origin)
+
+    def stop(self):
+        """Stop the replay and close the recording."""
+        self._timer.stop()
+        self._items.close()
+        self._next = None
+
+    def _tick(self):
+        now = time.perf_counter()
+        self._position += int((now - self._last_tick) * 1e9 * self.speed)
+        self._last_tick = now
+        self._emit_until(self._position)
+
+    def _peek(self):
+        if self._next is None:
+            try:
+                self._next = next(self._items)
+            except (StopIteration, ValueError, OSError) as e:
+                if not isinstance(e, StopIteration):
+                    logging.error(f"Replay stopped: {e}")
+                return None
+            if self._origin is None:
+                self._origin = self._next[0]
+        return self._next
+
+    def _emit_until(self, position):
+        batch = []
+        while True:
+            item = self._peek()
+            if item is None:
+                if batch:
+                    self.samples_ready.emit(batch)
+                self._finish()
+                return
+            if item[0] - self._origin > position:
+                break
+            self._next = None
+            if is_event(item):
+                if batch:
+                    self.samples_ready.emit(batch)
+                    batch = []
+                self.event_ready.emit(item[1], item[2])
+            else:
+                batch.append(item[1])
+        if batch:
+            self.samples_ready.emit(batch)
+        self._position = max(self._position, position)
+        self.position_changed.emit(self.position)
+
+    def _finish(self):
+        self._timer.stop()
+        self.finished.emit()
@@ -0,0 +1,107 @@
+"""
+File: ringBuffer.py
+Description: Fixed size NumPy ring buffer for the live plot.
+"""
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Preallocated ring of samples with one row per channel.
+
+    Every sample is written twice, at its slot and one capacity further on,
+    so the newest `capacity` samples always sit in one contiguous run of
+    the storage. view() returns that run in time order as a slice, without
+    copying, and appending never allocates.
+    """
+
+    def __init__(self, channels, capacity, dtype=np.float64):
+        """
+        Initialize the buffer.
+
+        Args:
+            channels (int): Number of rows
+            capacity (int): Number of samples kept
+            dtype: NumPy type of the samples
+        """
+        self.channels = channels
+        self.capacity = capacity
+        self._data = np.zeros((channels, 2 * capacity), dtype=dtype)
+        self._head = 0      # Slot the next sample is written to
+        self._count = 0     # Samples held, at most capacity
+        self.total = 0      # Samples appended since the last clear
+
+    def __len__(self):
+        return self._count
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
+        self.total = 0
+
+    def append(self, sample):
+        """
+        Add one sample, overwriting the oldest once full.
+
+        Args:
+            sample (list): One value per channel
+        """
+        head = self._head
+        self._data[:, head] = sample
+        self._data[:, head + self.capacity] = sample
+        self._head = head + 1 if head + 1 < self.capacity else 0
+        if self._count < self.capacity:
+            self._count += 1
+        self.total += 1
+
+    def extend(self, samples):
+        """
+        Add many samples at once.
+
+        Args:
+            samples (array_like): One row per sample, one column per channel
+        """
+        samples = np.asarray(samples, dtype=self._data.dtype).reshape(-1, self.channels)
+        if len(samples) > self.capacity:
+            # Only the newest fit, count the rest as passed through
+            self.total += len(samples) - self.capacity
+            samples = samples[-self.capacity:]
+        n = len(samples)
+        if not n:
+            return
+        head = self._head
+        first = min(n, self.capacity - head)
+        for start, width, offset in ((head, first, 0), (0, n - first, first)):
+            if width:
+                block = samples[offset:offset + width].T
+                self._data[:, start:start + width] = block
+                self._data[:, start + self.capacity:start + self.capacity + width] = block
+        self._head = (head + n) % self.capacity
+        self._count = min(self._count + n, self.capacity)
+        self.total += n
+
+    def view(self, row=None):
+        """
+        Samples held, oldest first, as a view into the buffer.
+
+        The view is only valid until the next append.
+
+        Args:
+            row (int): Channel to return, or None for all of them
+
+        Returns:
+            np.ndarray: (channels, len) array, or (len,) for one row
+        """
+        end = self._head + self.capacity if self._count == self.capacity else self._head
+        start = end - self._count
+        if row is None:
+            return self._data[:, start:end]
+        return self._data[row, start:end]
+
+    def latest(self, row):
+        """Newest value of one channel."""
+        if not self._count:
+            raise IndexError("ring buffer is empty")
+        # At head 0 this wraps to the last slot, the copy of the newest sample
+        return self._data[row, self._head - 1]
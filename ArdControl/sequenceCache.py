@@ -0,0 +1,202 @@
+"""
+File: sequenceCache.py
+Description: LRU cache of compiled sequences keyed by a hash of the sequence text.
+"""
+
+import collections
+import copy
+import hashlib
+import json
+import logging
+import os
+
+from sequenceCompiler import CompiledSequence, Step
+
+
+class SequenceCache:
+    """
+    In-memory and on-disk LRU cache in front of a SequenceCompiler.
+
+    Entries are keyed by a SHA-256 of the sequence text together with the
+    valve settings, so an edited valve table never reuses stale patterns.
+    Hits skip parsing and validation entirely. The in-memory tier holds
+    CompiledSequence objects, the on-disk tier holds small JSON files whose
+    modification time records their last use.
+    """
+
+    MEMORY_ENTRIES = 32
+    DISK_ENTRIES = 256
+
+    def __init__(self, compiler, directory, memory_entries=MEMORY_ENTRIES, disk_entries=DISK_ENTRIES):
+        """
+        Initialize the cache.
+
+        Args:
+            compiler (SequenceCompiler): Compiler used on a cache miss
+            directory (str): Directory holding the on-disk entries
+            memory_entries (int): Maximum number of entries kept in memory
+            disk_entries (int): Maximum number of entries kept on disk
+        """
+        self.compiler = compiler
+        self.directory = directory
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = collections.OrderedDict()
+        self._settings_key = json.dumps(
+            compiler.valve_settings, sort_keys=True)
+
+    def key(self, text):
+        """
+        Cache key for a sequence.
+
+        Args:
+            text (str): Full text of the sequence file
+
+        Returns:
+            str: Hex digest identifying the sequence
+        """
+        digest = hashlib.sha256(self._settings_key.encode())
+        digest.update(text.encode())
+        return digest.hexdigest()
+
+    def compile_file(self, path):
+        """
+        Read a sequence file and return its compiled form, from the cache if possible.
+
+        Args:
+            path (str): Path of the sequence file
+
+        Returns:
+            CompiledSequence: The compiled sequence, or None if it is invalid
+        """
+        try:
+            with open(path, "r") as f:
+                text = f.read()
+        except FileNotFoundError:
+            logging.error("Sequence file not found")
+            return None
+        except IOError as e:
+            logging.error(f"Error reading sequence file: {e}")
+            return None
+        return self.compile_text(text)
+
+    def compile_text(self, text):
+        """
+        Return the compiled form of a sequence, from the cache if possible.
+
+        Args:
+            text (str): Full text of the sequence file
+
+        Returns:
+            CompiledSequence: The compiled sequence, or None if it is invalid
+        """
+        key = self.key(text)
+        compiled = self.get(key)
+        if compiled is not None:
+            self.hits += 1
+            return compiled
+
+        self.misses += 1
+        compiled = self.compiler.compile_lines(text.splitlines(keepends=True))
+        if compiled is None:
+            return None
+        self._remember(key, compiled)
+        self._store(key, compiled)
+        return copy.copy(compiled)
+
+    def get(self, key):
+        """
+        Look up a compiled sequence by its cache key.
+
+        Args:
+            key (str): Key returned by key()
+
+        Returns:
+            CompiledSequence: A copy of the cached sequence, or None if not cached
+        """
+        compiled = self._memory.get(key)
+        if compiled is not None:
+            self._memory.move_to_end(key)
+        else:
+            compiled = self._load(key)
+            if compiled is None:
+                return None
+            self._remember(key, compiled)
+        # Each run resolves its own valve states, so hand out a copy
+        return copy.copy(compiled)
+
+    def clear(self):
+        """Drop every entry from memory and disk."""
+        self._memory.clear()
+        for path in self._disk_entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _remember(self, key, compiled):
+        compiled.key = key
+        self._memory[key] = compiled
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _disk_entries(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.directory, name) for name in names if name.endswith(".json")]
+
+    def _load(self, key):
+        path = self._entry_path(key)
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            steps = [Step(step_type, time_length, motor_position,
+                          [tuple(event) for event in motor_events])
+                     for step_type, time_length, motor_position, motor_events in data["steps"]]
+        except FileNotFoundError:
+            return None
+        except (IOError, json.JSONDecodeError, KeyError, ValueError, TypeError):
+            logging.warning("Discarding unreadable sequence cache entry")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        # Mark as recently used for eviction
+        os.utime(path)
+        return CompiledSequence(steps, data["motor_flag"], data["save_path"],
+                                self.compiler.valve_settings)
+
+    def _store(self, key, compiled):
+        data = {"steps": [[step.step_type, step.time_length, step.motor_position, step.motor_events]
+                          for step in compiled.steps],
+                "motor_flag": compiled.motor_flag,
+                "save_path": compiled.save_path}
+        try:
+            if not os.path.exists(self.directory):
+                os.makedirs(self.directory)
+            with open(self._entry_path(key), "w") as f:
+                json.dump(data, f)
+        except IOError as e:
+            logging.warning(f"Could not write sequence cache entry: {e}")
+            return
+        self._evict()
+
+    def _evict(self):
+        entries = self._disk_entries()
+        if len(entries) <= self.disk_entries:
+            return
+        entries.sort(key=lambda path: os.path.getmtime(path))
+        for path in entries[:len(entries) - self.disk_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
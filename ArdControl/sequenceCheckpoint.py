@@ -0,0 +1,106 @@
+"""
+File: sequenceCheckpoint.py
+Description: Records the position of a running sequence so it can be resumed.
+"""
+
+import json
+import logging
+import os
+import time
+
+
+class SequenceCheckpoint:
+    """
+    Small JSON checkpoint of the running sequence.
+
+    The runner records the sequence's cache key, the step in progress and
+    the time spent in it. Writes are throttled to one per WRITE_INTERVAL_MS
+    and only happen once the step has moved on, so a long step costs a
+    single write. Each write goes to a temporary file which then replaces
+    the checkpoint, so a crash mid-write never leaves a torn checkpoint.
+    """
+
+    WRITE_INTERVAL_MS = 1000    # Minimum time between checkpoint writes
+    MAX_AGE_S = 3600            # Older checkpoints are not resumed
+
+    def __init__(self, path: str):
+        """
+        Initialize the checkpoint.
+
+        Args:
+            path (str): Path of the checkpoint file
+        """
+        self.path = path
+        self._last_write = None
+        self._last_position = None
+
+    def update(self, now, key, step_index, step_elapsed, save_path):
+        """
+        Record the sequence position if the step has changed and a write is due.
+
+        Args:
+            now (float): Current time (ms)
+            key (str): Cache key of the running sequence
+            step_index (int): Index of the step in progress
+            step_elapsed (float): Time spent in the step so far (ms)
+            save_path (str): Pressure file the sequence is recorded to
+        """
+        if (key, step_index) == self._last_position:
+            return
+        if self._last_write is not None and now - self._last_write < self.WRITE_INTERVAL_MS:
+            return
+        data = {"key": key,
+                "step": step_index,
+                "step_elapsed": step_elapsed,
+                "save_path": save_path,
+                "saved": time.time()}
+        directory = os.path.dirname(self.path)
+        temp_path = f"{self.path}.tmp"
+        try:
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            with open(temp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logging.error(f"Could not write sequence checkpoint: {e}")
+            return
+        self._last_write = now
+        self._last_position = (key, step_index)
+
+    def load(self):
+        """
+        Read the checkpoint left by an interrupted sequence.
+
+        Returns:
+            dict: Checkpoint data, or None if there is none or it is too old
+        """
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            age = time.time() - float(data["saved"])
+            data["step"] = int(data["step"])
+            data["key"] = str(data["key"])
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError, KeyError, TypeError, ValueError):
+            logging.error("Discarding unreadable sequence checkpoint")
+            self.clear()
+            return None
+        if age > self.MAX_AGE_S:
+            logging.info(
+                f"Discarding sequence checkpoint from {age / 60:.0f} minutes ago")
+            self.clear()
+            return None
+        return data
+
+    def clear(self):
+        """Remove the checkpoint once the sequence has finished or been abandoned."""
+        self._last_write = None
+        self._last_position = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.error(f"Could not remove sequence checkpoint: {e}")
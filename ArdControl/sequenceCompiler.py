@@ -0,0 +1,260 @@
+"""
+File: sequenceCompiler.py
+Description: Parses Prospa sequence files into steps for the sequence runner.
+"""
+
+import logging
+
+
+class Step:
+    def __init__(self, step_type, time_length, motor_position=0, motor_events=None):
+        self.step_type = step_type
+        self.time_length = time_length
+        self.motor_position = motor_position
+        # (offset in ms, position in mm) motor moves within the step
+        if motor_events is None:
+            motor_events = [(0, motor_position)]
+        self.motor_events = motor_events
+
+
+class CompiledSequence:
+    """
+    A parsed and validated sequence, ready to be run.
+
+    Attributes:
+        steps (list[Step]): Steps in execution order
+        motor_flag (bool): True if the sequence drives the motor
+        save_path (str): Save path from the second line of the file (may be empty)
+        total_time (int): Total sequence length (ms)
+        initial_valves (list[int]): Coil states the resolution started from
+        valve_states (list[list[int]]): Absolute coil states for each step
+        valve_changes (list): Coil states to write at each step, None if unchanged
+        motor_events (list[tuple]): (time in ms, step index, position in mm) motor
+            track events, independent of the step boundaries
+        key (str): Cache key of the sequence text, set by SequenceCache
+    """
+
+    # Coil states after connecting or resetting the valve Arduino
+    DEFAULT_VALVES = [0, 0, 0, 0, 0, 0, 0, 0]
+
+    def __init__(self, steps, motor_flag, save_path, valve_settings):
+        self.steps = steps
+        self.motor_flag = motor_flag
+        self.save_path = save_path
+        self.key = None
+        self.total_time = sum(step.time_length for step in steps)
+        self.motor_events = self._motor_track()
+        self.valve_settings = valve_settings
+        self.initial_valves = None
+        self.valve_states = []
+        self.valve_changes = []
+        self.resolve_valves(self.DEFAULT_VALVES)
+
+    def _motor_track(self):
+        events = []
+        if not self.motor_flag:
+            return events
+        start = 0
+        for index, step in enumerate(self.steps):
+            for offset, position in step.motor_events:
+                # Negative positions leave the motor where it is
+                if position >= 0:
+                    events.append((start + offset, index, position))
+            start += step.time_length
+        return events
+
+    @property
+    def final_valves(self):
+        """Coil states left once the last step has run."""
+        return self.valve_states[-1] if self.valve_states else self.initial_valves
+
+    @property
+    def valve_writes(self):
+        """
+        Every valve write the run requires.
+
+        Returns:
+            list[tuple[int, list[int]]]: (start time in ms, coil states) per write
+        """
+        writes = []
+        start = 0
+        for step, change in zip(self.steps, self.valve_changes):
+            if change is not None:
+                writes.append((start, change))
+            start += step.time_length
+        return writes
+
+    def resolve_valves(self, initial):
+        """
+        Resolve the absolute coil states of every step ahead of time.
+
+        Ignore (2) entries take the state left by the previous step, and a
+        step that leaves every coil as it was needs no write at all.
+
+        Args:
+            initial (list[int]): Coil states before the first step
+        """
+        initial = [int(state) for state in initial]
+        if initial == self.initial_valves:
+            return
+        self.initial_valves = initial
+        self.valve_states = []
+        self.valve_changes = []
+        current = initial
+        for step in self.steps:
+            pattern = self.valve_settings[step.step_type]
+            resolved = [current[i] if pattern[i] == 2 else pattern[i]
+                        for i in range(len(current))]
+            self.valve_states.append(resolved)
+            self.valve_changes.append(resolved if resolved != current else None)
+            current = resolved
+
+
+class SequenceCompiler:
+    """
+    Turns the text Prospa writes into a CompiledSequence.
+
+    The sequence format is a single line of steps such as ``d100e200b400``,
+    optionally containing a capital ``M`` to enable the motor, in which case
+    each step may carry ``m<pos>`` suffixes. A plain ``m<pos>`` moves the motor
+    at the start of the step, ``m<pos>@<ms>`` moves it that many ms into the
+    step, so motion can overlap a long valve step without splitting it, e.g.
+    ``Mb5000m10m40@2000``. A step without a suffix moves the motor to 0 at its
+    start. The second line holds the save path for the pressure recording.
+    """
+
+    def __init__(self, step_types, valve_settings):
+        """
+        Initialize the compiler.
+
+        Args:
+            step_types (dict): Recognised step type characters
+            valve_settings (dict): Valve pattern for each step type
+        """
+        self.step_types = step_types
+        self.valve_settings = valve_settings
+
+    def compile_file(self, path):
+        """
+        Read and compile a sequence file.
+
+        Args:
+            path (str): Path of the sequence file
+
+        Returns:
+            CompiledSequence: The compiled sequence, or None if it is invalid
+        """
+        try:
+            with open(path, "r") as f:
+                raw_sequence = f.readlines()
+        except FileNotFoundError:
+            logging.error("Sequence file not found")
+            return None
+        except IOError as e:
+            logging.error(f"Error reading sequence file: {e}")
+            return None
+        return self.compile_lines(raw_sequence)
+
+    def compile_lines(self, raw_sequence):
+        """
+        Compile the lines of a sequence file.
+
+        Args:
+            raw_sequence (list[str]): Lines of the sequence file
+
+        Returns:
+            CompiledSequence: The compiled sequence, or None if it is invalid
+        """
+        # Check if the sequence file is empty
+        if not raw_sequence:
+            logging.error("Sequence file is empty")
+            return None
+
+        # Get the save path from the second line of the sequence file
+        seq_save_path = raw_sequence[1].strip() if len(raw_sequence) > 1 else ""
+        sequence_string = raw_sequence[0].strip()
+
+        # Check for capital 'M' in the sequence string
+        motor_flag = False
+        if 'M' in sequence_string:
+            motor_flag = True
+            sequence_string = sequence_string.replace(
+                'M', '')  # Remove 'M' from the sequence string
+
+        steps = []
+        i = 0
+        # Parse the sequence string
+        while i < len(sequence_string):
+            # Check for valid step types
+            if sequence_string[i] in self.step_types.keys():
+                step_type = sequence_string[i]
+            else:
+                logging.error("Invalid step type in sequence file")
+                return None
+
+            # Get the time length of the step
+            i += 1
+            time_length = ""
+            while i < len(sequence_string) and sequence_string[i].isdigit():
+                time_length += sequence_string[i]
+                i += 1
+            try:
+                time_length = int(time_length)
+            except ValueError:
+                logging.error("Invalid time length in sequence file")
+                return None
+            if time_length <= 0:
+                logging.error("Invalid time length in sequence file")
+                return None
+
+            # Get motor positions if motor_flag is True
+            motor_events = []
+            while motor_flag and i < len(sequence_string) and sequence_string[i] == 'm':
+                i += 1
+                motor_position_str = ""
+                # Check for negative sign
+                if i < len(sequence_string) and sequence_string[i] == '-':
+                    motor_position_str += sequence_string[i]
+                    i += 1
+                # Collect digits
+                while i < len(sequence_string) and sequence_string[i].isdigit():
+                    motor_position_str += sequence_string[i]
+                    i += 1
+                try:
+                    motor_position = int(motor_position_str)
+                except ValueError:
+                    logging.error("Invalid motor position in sequence file")
+                    return None
+
+                # Optional offset into the step
+                offset = 0
+                if i < len(sequence_string) and sequence_string[i] == '@':
+                    i += 1
+                    offset_str = ""
+                    while i < len(sequence_string) and sequence_string[i].isdigit():
+                        offset_str += sequence_string[i]
+                        i += 1
+                    try:
+                        offset = int(offset_str)
+                    except ValueError:
+                        logging.error("Invalid motor offset in sequence file")
+                        return None
+                    if offset >= time_length:
+                        logging.error(
+                            "Motor offset is beyond the end of its step in sequence file")
+                        return None
+                motor_events.append((offset, motor_position))
+
+            if motor_events:
+                motor_events.sort(key=lambda event: event[0])
+                motor_position = motor_events[0][1] if motor_events[0][0] == 0 else -1
+                steps.append(Step(step_type, time_length,
+                             motor_position, motor_events))
+            else:
+                steps.append(Step(step_type, time_length))
+
+        if not steps:
+            logging.error("Sequence file contains no steps")
+            return None
+
+        return CompiledSequence(steps, motor_flag, seq_save_path, self.valve_settings)
@@ -0,0 +1,356 @@
+"""
+File: sequenceEngine.py
+Description: Step engine shared by live sequence runs and dry-run simulation.
+"""
+
+from PyQt6 import QtCore
+
+
+class StepTransition:
+    """
+    A step boundary produced by the engine (the valve track).
+
+    Attributes:
+        index (int): Index of the step that starts
+        time (float): Scheduled start time (ms since sequence start)
+        step (Step): The step that starts
+        valves (list[int]): Coil states to write, or None if nothing changes
+    """
+
+    track = "valves"
+
+    def __init__(self, index, time, step, valves):
+        self.index = index
+        self.time = time
+        self.step = step
+        self.valves = valves
+
+
+class TrackEvent:
+    """
+    An event on a track that runs independently of the step boundaries.
+
+    Attributes:
+        track (str): Device the event is for, e.g. "motor"
+        index (int): Index of the step the event falls in
+        time (float): Scheduled time (ms since sequence start)
+        step (Step): The step the event falls in
+        value: Device specific value, the target position (mm) for the motor
+    """
+
+    def __init__(self, track, index, time, step, value):
+        self.track = track
+        self.index = index
+        self.time = time
+        self.step = step
+        self.value = value
+
+
+class SequenceEngine:
+    """
+    Advances a compiled sequence against a millisecond clock.
+
+    The engine does no I/O. Callers feed it the current time and act on the
+    events it returns, so the live runner (real clock, Arduino and motor
+    workers) and the dry run (virtual clock) share the same stepping logic.
+    Step boundaries (the valve track) and the motor track are merged into one
+    schedule ordered by time, with a step boundary ahead of any track event
+    at the same time. Event times are absolute from the sequence start, so
+    late timer ticks do not accumulate into drift.
+    """
+
+    def __init__(self, compiled):
+        """
+        Initialize the engine.
+
+        Args:
+            compiled (CompiledSequence): Sequence to run, with its valves resolved
+        """
+        self.compiled = compiled
+        self.steps = compiled.steps
+        self.index = -1
+        self.start_time = None
+        self.finished = False
+
+        # Start of every step relative to the sequence start (ms)
+        self.step_starts = []
+        elapsed = 0
+        for step in self.steps:
+            self.step_starts.append(elapsed)
+            elapsed += step.time_length
+
+        schedule = [StepTransition(index, self.step_starts[index], step,
+                                   compiled.valve_changes[index])
+                    for index, step in enumerate(self.steps)]
+        schedule += [TrackEvent("motor", index, time, self.steps[index], position)
+                     for time, index, position in compiled.motor_events]
+        # Stable sort keeps step boundaries ahead of track events at the same time
+        self.schedule = sorted(schedule, key=lambda event: event.time)
+        self._next = 0
+
+    @property
+    def started(self):
+        return self.start_time is not None
+
+    @property
+    def end_time(self):
+        """Scheduled end of the sequence on the caller's clock (ms)."""
+        return self.start_time + self.compiled.total_time
+
+    @property
+    def current_step(self):
+        if 0 <= self.index < len(self.steps):
+            return self.steps[self.index]
+        return None
+
+    @property
+    def steps_remaining(self):
+        """Number of steps left, including the current one."""
+        return max(len(self.steps) - max(self.index, 0), 0)
+
+    def start(self, now, from_step=0):
+        """
+        Start the sequence, or resume it at the start of a later step.
+
+        Args:
+            now (float): Current time (ms)
+            from_step (int): Step to start from
+
+        Returns:
+            list: Events due at the start of the sequence
+        """
+        offset = self.step_starts[from_step]
+        self.start_time = now - offset
+        self.index = from_step
+        self.finished = False
+        self._next = 0
+        while self.schedule[self._next].time < offset:
+            self._next += 1
+        if from_step == 0:
+            return self.advance(now)
+
+        # The coils may have been reset and the motor moved since the step
+        # last ran, so restate the step's full valve states and the last
+        # motor target before it
+        resumed = self.schedule[self._next]
+        self._next += 1
+        events = [StepTransition(from_step, offset, resumed.step,
+                                 self.compiled.valve_states[from_step])]
+        earlier_moves = [event for event in self.schedule[:self._next - 1]
+                         if event.track == "motor"]
+        if earlier_moves:
+            events.append(earlier_moves[-1])
+        return events + self.advance(now)
+
+    def advance(self, now):
+        """
+        Move the sequence forward to the given time.
+
+        Args:
+            now (float): Current time (ms)
+
+        Returns:
+            list: Every StepTransition and TrackEvent now due, in schedule order
+        """
+        if self.finished:
+            return []
+        elapsed = now - self.start_time
+        events = []
+        while self._next < len(self.schedule) and self.schedule[self._next].time <= elapsed:
+            event = self.schedule[self._next]
+            self._next += 1
+            if event.track == StepTransition.track:
+                self.index = event.index
+            events.append(event)
+        if elapsed >= self.compiled.total_time:
+            self.index = len(self.steps)
+            self.finished = True
+        return events
+
+    def next_boundary(self):
+        """Time (ms) of the next event or of the sequence end, or None once finished."""
+        if self.finished or not self.started:
+            return None
+        if self._next < len(self.schedule):
+            return self.start_time + self.schedule[self._next].time
+        return self.end_time
+
+    def step_remaining(self, now):
+        """Time left in the current step (ms)."""
+        if self.finished or not self.started:
+            return 0
+        return self.start_time + self.step_starts[self.index] + self.current_step.time_length - now
+
+    def sequence_remaining(self, now):
+        """Time left in the whole sequence (ms)."""
+        if self.finished or not self.started:
+            return 0
+        return self.end_time - now
+
+
+class VirtualClock:
+    """Millisecond clock that only moves when told to."""
+
+    def __init__(self, start=0.0):
+        self.time = start
+
+    def now(self):
+        return self.time
+
+    def advance_to(self, time):
+        self.time = max(self.time, time)
+
+
+class DryRunReport:
+    """
+    Result of simulating a sequence without touching hardware.
+
+    Attributes:
+        timeline (list[tuple]): (time_ms, device, value) for every valve and motor command
+        total_time (float): Sequence length (ms)
+        valve_writes (int): Valve coil write transactions the run will cost
+        elided_writes (int): Steps that need no valve write
+        motor_writes (int): Motor Modbus transactions the run will cost
+        violations (list[str]): Motor travel problems found
+    """
+
+    # Modbus transactions issued by MotorController.move_to_position:
+    # calibration check, high word, low word, command register, command flag
+    MOTOR_TRANSACTIONS_PER_MOVE = 5
+
+    def __init__(self):
+        self.timeline = []
+        self.total_time = 0
+        self.valve_writes = 0
+        self.elided_writes = 0
+        self.motor_writes = 0
+        self.violations = []
+
+    @property
+    def bus_writes(self):
+        return self.valve_writes + self.motor_writes
+
+    def summary(self):
+        """
+        Human readable summary of the dry run.
+
+        Returns:
+            list[str]: Lines suitable for the log window
+        """
+        lines = [f"Dry run: {len(self.timeline)} commands over {self.total_time / 1000:.2f} s",
+                 f"Bus transactions: {self.bus_writes} ({self.valve_writes} valve, {self.motor_writes} motor)",
+                 f"Valve writes elided: {self.elided_writes}"]
+        if self.violations:
+            lines.append(f"{len(self.violations)} motor travel violation(s):")
+            lines.extend(self.violations)
+        else:
+            lines.append("No motor travel violations")
+        return lines
+
+
+class SequenceSimulator(QtCore.QObject):
+    """
+    Runs a compiled sequence through SequenceEngine on a virtual clock.
+
+    With speedup=None the run completes instantly by jumping the virtual clock
+    from one boundary to the next. Otherwise a Qt timer ticks at the live
+    runner's 10 ms interval and advances the virtual clock by 10 ms * speedup
+    per tick, emitting each transition as it happens.
+
+    Signals:
+        transition (object): StepTransition or TrackEvent as it is reached
+        finished (object): DryRunReport once the sequence ends
+    """
+
+    transition = QtCore.pyqtSignal(object)
+    finished = QtCore.pyqtSignal(object)
+
+    TICK_MS = 10                # Same tick as the live step timer
+    MOTOR_SPEED_MM_S = 50 / 60 * 4  # 50 RPM (TNMotorControl maxRPM) at 4 mm/rev
+
+    def __init__(self, compiled, motor_start=0, max_travel_mm=None, parent=None):
+        """
+        Initialize the simulator.
+
+        Args:
+            compiled (CompiledSequence): Sequence to simulate
+            motor_start (float): Assumed motor position at sequence start (mm)
+            max_travel_mm (float): Travel limit to check targets against, or None
+            parent (QObject): Optional Qt parent
+        """
+        super().__init__(parent)
+        self.engine = SequenceEngine(compiled)
+        self.clock = VirtualClock()
+        self.report = DryRunReport()
+        self.report.total_time = compiled.total_time
+        self.max_travel_mm = max_travel_mm
+        self.speedup = None
+        self._motor_position = motor_start
+        self._motor_arrival = 0.0
+        self._timer = QtCore.QTimer(self)
+        self._timer.timeout.connect(self._tick)
+
+    def run(self, speedup=None):
+        """
+        Run the simulation.
+
+        Args:
+            speedup (float): Virtual ms per real ms, or None to finish instantly
+
+        Returns:
+            DryRunReport: The report if run instantly, otherwise None
+        """
+        self.speedup = speedup
+        self._record(self.engine.start(self.clock.now()))
+        if speedup is None:
+            while not self.engine.finished:
+                self.clock.advance_to(self.engine.next_boundary())
+                self._record(self.engine.advance(self.clock.now()))
+            self._finish()
+            return self.report
+        self._timer.start(self.TICK_MS)
+        return None
+
+    def stop(self):
+        self._timer.stop()
+
+    def _tick(self):
+        self.clock.advance_to(self.clock.now() + self.TICK_MS * self.speedup)
+        self._record(self.engine.advance(self.clock.now()))
+        if self.engine.finished:
+            self._timer.stop()
+            self._finish()
+
+    def _record(self, events):
+        for event in events:
+            if event.track == "motor":
+                self._check_motor(event)
+                self.report.timeline.append((event.time, "motor", event.value))
+                self.report.motor_writes += DryRunReport.MOTOR_TRANSACTIONS_PER_MOVE
+            elif event.valves is not None:
+                self.report.timeline.append(
+                    (event.time, "valves", event.valves))
+                self.report.valve_writes += 1
+            else:
+                self.report.elided_writes += 1
+            self.transition.emit(event)
+
+    def _check_motor(self, tr):
+        target = tr.value
+        if self.max_travel_mm is not None and target > self.max_travel_mm:
+            self.report.violations.append(
+                f"Step {tr.index + 1} at {tr.time / 1000:.2f} s: target {target} mm beyond travel limit {self.max_travel_mm} mm")
+        if tr.time < self._motor_arrival:
+            self.report.violations.append(
+                f"Step {tr.index + 1} at {tr.time / 1000:.2f} s: motor still travelling, arrives at {self._motor_arrival / 1000:.2f} s")
+        travel_ms = abs(target - self._motor_position) / \
+            self.MOTOR_SPEED_MM_S * 1000
+        self._motor_arrival = max(tr.time, self._motor_arrival) + travel_ms
+        step_end = self.engine.step_starts[tr.index] + tr.step.time_length
+        if self._motor_arrival > step_end:
+            self.report.violations.append(
+                f"Step {tr.index + 1} at {tr.time / 1000:.2f} s: {travel_ms / 1000:.2f} s move to {target} mm overruns the step by {(self._motor_arrival - step_end) / 1000:.2f} s")
+        self._motor_position = target
+
+    def _finish(self):
+        self.finished.emit(self.report)
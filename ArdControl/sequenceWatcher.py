@@ -0,0 +1,246 @@
+"""
+File: sequenceWatcher.py
+Description: Event-driven pickup of the sequence files written by Prospa.
+"""
+
+import logging
+import os
+import re
+
+from PyQt6 import QtCore
+
+
+class SequenceFileWatcher(QtCore.QObject):
+    """
+    Watches the Prospa hand-off directory for a sequence file.
+
+    QFileSystemWatcher is backed by inotify on Linux and by directory change
+    notifications on Windows, so a new file is seen as soon as it is created.
+    A slow polling timer runs alongside it as a fallback for file systems
+    that do not deliver notifications (e.g. network drives). A file is only
+    reported once its size and modification time have stopped changing, so
+    a half-written sequence is never parsed.
+
+    Signals:
+        sequence_ready (str): Path of a sequence file that has finished writing
+    """
+
+    sequence_ready = QtCore.pyqtSignal(str)
+
+    STABLE_MS = 25              # File must be unchanged for this long
+    FALLBACK_POLL_MS = 2000     # Polling interval used alongside the watcher
+
+    def __init__(self, path: str, parent=None):
+        """
+        Initialize the watcher.
+
+        Args:
+            path (str): Full path of the sequence file to wait for
+            parent (QObject): Optional Qt parent
+        """
+        super().__init__(parent)
+        self.path = path
+        self.directory = os.path.dirname(path)
+        self.active = False
+        self._last_stat = None
+
+        self._watcher = QtCore.QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_changed)
+        self._watcher.fileChanged.connect(self._on_changed)
+
+        # Debounce timer, re-armed until the file stops changing
+        self._stable_timer = QtCore.QTimer(self)
+        self._stable_timer.setSingleShot(True)
+        self._stable_timer.timeout.connect(self._check_stable)
+
+        self._poll_timer = QtCore.QTimer(self)
+        self._poll_timer.timeout.connect(self._on_changed)
+
+    def start(self):
+        """Begin watching; a file that already exists is picked up immediately."""
+        if self.active:
+            return
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        if not self._watcher.addPath(self.directory):
+            logging.warning(
+                f"Could not watch {self.directory}, falling back to polling")
+        self._last_stat = None
+        self.active = True
+        self._poll_timer.start(self.FALLBACK_POLL_MS)
+        self._on_changed()
+
+    def stop(self):
+        """Stop watching and cancel any pending stability check."""
+        self.active = False
+        self._poll_timer.stop()
+        self._stable_timer.stop()
+        watched = self._watcher.files() + self._watcher.directories()
+        if watched:
+            self._watcher.removePaths(watched)
+
+    def _on_changed(self, _path=None):
+        if not self.active:
+            return
+        if os.path.exists(self.path):
+            # Watch the file itself so further writes restart the debounce
+            if self.path not in self._watcher.files():
+                self._watcher.addPath(self.path)
+            self._stable_timer.start(self.STABLE_MS)
+
+    def _check_stable(self):
+        if not self.active:
+            return
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._last_stat = None
+            return
+        stat = (st.st_size, st.st_mtime_ns)
+        if stat != self._last_stat:
+            # Still being written, check again shortly
+            self._last_stat = stat
+            self._stable_timer.start(self.STABLE_MS)
+            return
+        self.stop()
+        self.sequence_ready.emit(self.path)
+
+
+class SequenceSpool(QtCore.QObject):
+    """
+    Watches a spool directory for numbered sequence files.
+
+    Prospa (or a script) may queue several experiments by writing
+    ``sequence_<n>.txt`` files into the spool directory. Files are reported
+    in ascending number order once they have finished writing, so the
+    runner can preload and validate the next sequence while the current one
+    runs. Each file is acknowledged individually by writing
+    ``prospa_<n>.txt`` containing 1 (started) or 0 (rejected), after which
+    the sequence file is removed from the spool.
+
+    Signals:
+        sequence_ready (str): Path of the next complete spooled sequence
+    """
+
+    sequence_ready = QtCore.pyqtSignal(str)
+
+    FILE_PATTERN = re.compile(r"^sequence_(\d+)\.txt$")
+    STABLE_MS = 25              # Files must be unchanged for this long
+    FALLBACK_POLL_MS = 2000     # Polling interval used alongside the watcher
+
+    def __init__(self, directory: str, parent=None):
+        """
+        Initialize the spool.
+
+        Args:
+            directory (str): Spool directory to watch
+            parent (QObject): Optional Qt parent
+        """
+        super().__init__(parent)
+        self.directory = directory
+        self.active = False
+        self._stats = {}        # Last seen (size, mtime) of pending files
+        self._reported = set()  # Files handed out but not yet acknowledged
+
+        self._watcher = QtCore.QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_changed)
+        self._watcher.fileChanged.connect(self._on_changed)
+
+        self._stable_timer = QtCore.QTimer(self)
+        self._stable_timer.setSingleShot(True)
+        self._stable_timer.timeout.connect(self._scan)
+
+        self._poll_timer = QtCore.QTimer(self)
+        self._poll_timer.timeout.connect(self._on_changed)
+
+    def start(self):
+        """Begin watching; files already in the spool are picked up immediately."""
+        if self.active:
+            return
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        if not self._watcher.addPath(self.directory):
+            logging.warning(
+                f"Could not watch {self.directory}, falling back to polling")
+        self._stats = {}
+        self._reported = set()
+        self.active = True
+        self._poll_timer.start(self.FALLBACK_POLL_MS)
+        self._scan()
+
+    def stop(self):
+        """Stop watching; unacknowledged files stay in the spool."""
+        self.active = False
+        self._poll_timer.stop()
+        self._stable_timer.stop()
+        watched = self._watcher.files() + self._watcher.directories()
+        if watched:
+            self._watcher.removePaths(watched)
+
+    def acknowledge(self, path, success):
+        """
+        Acknowledge a spooled sequence and remove it from the spool.
+
+        Args:
+            path (str): Path previously emitted by sequence_ready
+            success (bool): True if the sequence was started
+        """
+        match = self.FILE_PATTERN.match(os.path.basename(path))
+        if match is None:
+            return
+        ack_path = os.path.join(
+            self.directory, f"prospa_{match.group(1)}.txt")
+        with open(ack_path, "w") as f:
+            f.write("1" if success else "0")
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        self._reported.discard(path)
+        self._stats.pop(path, None)
+
+    def pending(self):
+        """
+        List spooled sequence files that have not been handed out yet.
+
+        Returns:
+            list[str]: Paths in ascending sequence number order
+        """
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        numbered = []
+        for name in names:
+            match = self.FILE_PATTERN.match(name)
+            if match is not None:
+                path = os.path.join(self.directory, name)
+                if path not in self._reported:
+                    numbered.append((int(match.group(1)), path))
+        return [path for _, path in sorted(numbered)]
+
+    def _on_changed(self, _path=None):
+        if self.active:
+            self._stable_timer.start(self.STABLE_MS)
+
+    def _scan(self):
+        if not self.active:
+            return
+        for path in self.pending():
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                self._stats.pop(path, None)
+                continue
+            stat = (st.st_size, st.st_mtime_ns)
+            if self._stats.get(path) != stat:
+                # Still being written; keep later files queued behind it
+                self._stats[path] = stat
+                if path not in self._watcher.files():
+                    self._watcher.addPath(path)
+                self._stable_timer.start(self.STABLE_MS)
+                return
+            self._reported.add(path)
+            if path in self._watcher.files():
+                self._watcher.removePath(path)
+            self.sequence_ready.emit(path)
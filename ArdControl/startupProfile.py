@@ -0,0 +1,102 @@
+"""
+File: startupProfile.py
+Description: Times the imports and initialisation steps of the GUI for --profile-startup.
+"""
+
+import builtins
+import contextlib
+import logging
+import sys
+import time
+
+
+class StartupProfile:
+    """
+    Breakdown of where the time goes between launch and a usable window.
+
+    While enabled, every import statement that loads new modules is timed,
+    including the modules it imports in turn. Only the outermost import is
+    listed, so the times of the listed imports add up to the time spent
+    importing. Initialisation steps are timed with phase(); an import made
+    during a step counts towards both.
+
+    When disabled nothing is hooked and phase() costs a function call.
+    """
+
+    def __init__(self, enabled=False):
+        """
+        Initialize the profile, hooking imports if enabled.
+
+        Args:
+            enabled (bool): Record timings
+        """
+        self.enabled = enabled
+        self.start = time.perf_counter()
+        self.imports = []       # (statement, seconds) of each outermost import
+        self.phases = []        # (name, seconds) of each phase
+        self._depth = 0
+        self._import = builtins.__import__
+        if enabled:
+            builtins.__import__ = self._timed_import
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if self._depth:
+            return self._import(name, globals, locals, fromlist, level)
+        loaded = len(sys.modules)
+        start = time.perf_counter()
+        self._depth += 1
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            self._depth -= 1
+            # Modules already loaded cost nothing worth listing
+            if len(sys.modules) != loaded:
+                statement = f"from {'.' * level}{name} import {', '.join(fromlist)}" \
+                    if fromlist else f"import {name}"
+                self.imports.append((statement, time.perf_counter() - start))
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time the body of the with statement as one initialisation step."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def finish(self):
+        """Stop timing imports and report, once the window is usable."""
+        if not self.enabled:
+            return
+        self.enabled = False
+        if builtins.__import__ == self._timed_import:
+            builtins.__import__ = self._import
+        report = self.report()
+        print(report)
+        for line in report.splitlines():
+            logging.info(line)
+
+    def report(self, limit=15):
+        """
+        Startup report.
+
+        Args:
+            limit (int): Most imports listed, slowest first
+
+        Returns:
+            str: Total time, then the imports and the initialisation steps
+        """
+        total = time.perf_counter() - self.start
+        import_time = sum(seconds for _, seconds in self.imports)
+        lines = [f"Startup took {total * 1000:.0f} ms after the profile started",
+                 f"Imports: {import_time * 1000:.0f} ms in {len(self.imports)} statements"]
+        for statement, seconds in sorted(self.imports, key=lambda item: -item[1])[:limit]:
+            lines.append(f"  {seconds * 1000:8.1f} ms  {statement}")
+        lines.append(
+            f"Initialisation: {sum(seconds for _, seconds in self.phases) * 1000:.0f} ms")
+        for name, seconds in self.phases:
+            lines.append(f"  {seconds * 1000:8.1f} ms  {name}")
+        return "\n".join(lines)
@@ -0,0 +1,156 @@
+"""
+File: timingReport.py
+Description: Measures how closely valve switching follows the sequence schedule.
+"""
+
+import csv
+import logging
+import os
+
+import numpy as np
+
+
+class StepTiming:
+    """
+    Timing of one commanded valve change.
+
+    Attributes:
+        index (int): Step index in the sequence
+        step_type (str): Step type character
+        offset (float): Step start relative to the sequence start (ms)
+        scheduled (float): Scheduled step boundary (ms)
+        issued (float): Time the valve write was issued (ms)
+        observed (float): Time the new states were first read back (ms), or None
+        states (list[int]): Commanded coil states
+    """
+
+    def __init__(self, index, step_type, offset, scheduled, issued, states):
+        self.index = index
+        self.step_type = step_type
+        self.offset = offset
+        self.scheduled = scheduled
+        self.issued = issued
+        self.observed = None
+        self.states = states
+
+    @property
+    def dispatch_latency(self):
+        """Delay between the scheduled boundary and the write being issued (ms)."""
+        return self.issued - self.scheduled
+
+    @property
+    def latency(self):
+        """Delay between the scheduled boundary and the readback (ms), or None."""
+        if self.observed is None:
+            return None
+        return self.observed - self.scheduled
+
+
+class SequenceTimingRecorder:
+    """
+    Matches coil readbacks to the commanded step boundaries of one sequence.
+
+    The runner reports every valve write it issues with command(), and the
+    Arduino worker reports every coil readback with observe(). A commanded
+    change counts as observed at the first readback, taken after it was
+    issued, that shows exactly the commanded states. All times share the
+    runner's perf_counter millisecond clock. Latencies are quantised by the
+    readback interval, which is written into the report.
+    """
+
+    def __init__(self, readback_interval):
+        """
+        Initialize the recorder.
+
+        Args:
+            readback_interval (int): Coil readback interval (ms)
+        """
+        self.readback_interval = readback_interval
+        self.commands = []
+        self.readbacks = 0
+        self._pending = []
+
+    def command(self, index, step_type, offset, scheduled, issued, states):
+        """
+        Record a valve write issued by the runner.
+
+        Args:
+            index (int): Step index in the sequence
+            step_type (str): Step type character
+            offset (float): Step start relative to the sequence start (ms)
+            scheduled (float): Scheduled step boundary (ms)
+            issued (float): Time the write was issued (ms)
+            states (list[int]): Commanded coil states
+        """
+        timing = StepTiming(index, step_type, offset,
+                            scheduled, issued, list(states))
+        self.commands.append(timing)
+        # A newer write supersedes any change that was never seen
+        self._pending = [timing]
+
+    def observe(self, timestamp, states):
+        """
+        Record a coil readback.
+
+        Args:
+            timestamp (float): Time of the readback (ms)
+            states (list[int]): Coil states read from the Arduino
+        """
+        self.readbacks += 1
+        states = [int(state) for state in states]
+        for timing in self._pending:
+            if timestamp >= timing.issued and states == timing.states:
+                timing.observed = timestamp
+        self._pending = [t for t in self._pending if t.observed is None]
+
+    def summary(self):
+        """
+        Latency statistics over every observed change.
+
+        Returns:
+            dict: Counts plus mean, p99 and max latency and max jitter (ms)
+        """
+        latencies = np.array([t.latency for t in self.commands
+                              if t.latency is not None])
+        stats = {"commanded": len(self.commands),
+                 "observed": len(latencies),
+                 "readbacks": self.readbacks,
+                 "readback_interval_ms": self.readback_interval}
+        if len(latencies):
+            mean = float(np.mean(latencies))
+            stats.update({"mean_ms": mean,
+                          "p99_ms": float(np.percentile(latencies, 99)),
+                          "max_ms": float(np.max(latencies)),
+                          "max_jitter_ms": float(np.max(np.abs(latencies - mean)))})
+        return stats
+
+    def write_report(self, pressure_path):
+        """
+        Write the per-step timings and summary next to the pressure file.
+
+        Args:
+            pressure_path (str): Path of the pressure recording for the sequence
+
+        Returns:
+            str: Path of the report, or None if it could not be written
+        """
+        report_path = f"{os.path.splitext(pressure_path)[0]}_timing.csv"
+        stats = self.summary()
+        try:
+            with open(report_path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["Step", "Type", "Scheduled (ms)", "Dispatch latency (ms)",
+                                 "Observed latency (ms)"])
+                for t in self.commands:
+                    writer.writerow([t.index + 1, t.step_type,
+                                     f"{t.offset:.1f}",
+                                     f"{t.dispatch_latency:.2f}",
+                                     "" if t.latency is None else f"{t.latency:.2f}"])
+                writer.writerow([])
+                for key, value in stats.items():
+                    writer.writerow(
+                        [key, f"{value:.2f}" if isinstance(value, float) else value])
+        except IOError as e:
+            logging.error(f"Could not write timing report: {e}")
+            return None
+        return report_path